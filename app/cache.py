@@ -0,0 +1,248 @@
+import json
+import time
+from collections import OrderedDict
+
+import orjson
+
+from app.serialization import dumps
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # optional shared backend
+    redis_asyncio = None
+
+# Caches for listing queries.
+# TTLCache is a synchronous in-process LRU with per-entry expiry, used directly for
+# listing counts. Query results go through a QueryCache backend chosen by
+# QUERY_CACHE_BACKEND: an in-process MemoryCache (default), a RedisCache shared by
+# all workers, or NullCache. Entries carry tags such as "wheels:coach:ch001" so
+# writes can drop everything that may include the coach they touched.
+
+
+class TTLCache:
+    def __init__(self, ttl: float, max_entries: int = 1024, on_evict=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def pop(self, key) -> bool:
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        return True
+
+    def clear(self):
+        self._entries.clear()
+
+    def _remove(self, key):
+        del self._entries[key]
+        if self.on_evict:
+            self.on_evict(key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class QueryCache:
+    backend = "none"
+
+    def __init__(self):
+        self.invalidations = 0
+
+    async def get(self, key):
+        return None
+
+    async def set(self, key, value, tags=()):
+        pass
+
+    async def invalidate_tags(self, tags):
+        pass
+
+    async def clear(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "invalidations": self.invalidations}
+
+
+# Caching disabled
+class NullCache(QueryCache):
+    pass
+
+
+class MemoryCache(QueryCache):
+    backend = "memory"
+
+    def __init__(self, ttl: float, max_entries: int):
+        super().__init__()
+        self._tags = {}
+        self._key_tags = {}
+        self._entries = TTLCache(ttl, max_entries, on_evict=self._forget)
+
+    def _forget(self, key):
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key):
+        return self._entries.get(key)
+
+    async def set(self, key, value, tags=()):
+        self._entries.set(key, value)
+        self._key_tags[key] = tuple(tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+    async def invalidate_tags(self, tags):
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                if self._entries.pop(key):
+                    self.invalidations += 1
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+
+    def stats(self) -> dict:
+        return {**super().stats(), **self._entries.stats()}
+
+
+# Entries are stored as JSON (the listing pages are JSON-shaped anyway), never
+# pickled: whoever can write to a shared Redis must not be able to run code here
+class RedisCache(QueryCache):
+    backend = "redis"
+
+    def __init__(self, url: str, ttl: float, prefix: str = "kpa:cache:"):
+        if redis_asyncio is None:
+            raise RuntimeError("QUERY_CACHE_BACKEND=redis requires the 'redis' package")
+        super().__init__()
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._redis = redis_asyncio.from_url(url)
+
+    # A Redis outage degrades to cache misses instead of failing requests
+    async def get(self, key):
+        try:
+            raw = await self._redis.get(self.prefix + key)
+        except redis_asyncio.RedisError:
+            self.errors += 1
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return orjson.loads(raw)
+
+    async def set(self, key, value, tags=()):
+        ttl_ms = int(self.ttl * 1000)
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.set(self.prefix + key, dumps(value), px=ttl_ms)
+                for tag in tags:
+                    pipe.sadd(self.prefix + "tag:" + tag, key)
+                    pipe.pexpire(self.prefix + "tag:" + tag, ttl_ms)
+                await pipe.execute()
+        except redis_asyncio.RedisError:
+            self.errors += 1
+
+    async def invalidate_tags(self, tags):
+        try:
+            for tag in tags:
+                tag_key = self.prefix + "tag:" + tag
+                keys = await self._redis.smembers(tag_key)
+                if keys:
+                    removed = await self._redis.delete(*(self.prefix + k.decode() for k in keys))
+                    self.invalidations += removed
+                await self._redis.delete(tag_key)
+        except redis_asyncio.RedisError:
+            # Entries still expire after QUERY_CACHE_TTL_SECONDS
+            self.errors += 1
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(match=self.prefix + "*"):
+            await self._redis.delete(key)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def create_query_cache(backend: str, ttl: float, max_entries: int, redis_url: str = None) -> QueryCache:
+    if backend == "memory":
+        return MemoryCache(ttl, max_entries)
+    if backend == "redis":
+        return RedisCache(redis_url, ttl)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown QUERY_CACHE_BACKEND: {backend}")
+
+
+# Normalize a Mongo filter into a stable cache key
+def filter_key(filters: dict) -> str:
+    return json.dumps(filters, sort_keys=True, default=str)
+
+
+# Cache key for one listing page: namespace plus normalized filter and page parameters
+def query_key(namespace: str, filters: dict, **params) -> str:
+    return f"{namespace}:{filter_key(filters)}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+# Tags for a listing filtered (or not) by coach. Only exact coach filters get a
+# per-coach tag; prefix/contains/unfiltered pages can include any coach.
+def coach_query_tags(namespace: str, coach_number: str = None, exact: bool = False):
+    if coach_number and exact:
+        return (f"{namespace}:coach:{coach_number.lower()}",)
+    return (f"{namespace}:coach:*",)
+
+
+# Tags to drop after a write touching `coach_number`
+def coach_write_tags(namespace: str, coach_number: str):
+    return (f"{namespace}:coach:{coach_number.lower()}", f"{namespace}:coach:*")
@@ -0,0 +1,231 @@
+import logging
+import zlib
+from typing import Optional
+from fastapi import Response
+from starlette.datastructures import Headers, MutableHeaders
+from app.config import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_ENABLED,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_ZSTD_LEVEL,
+)
+
+try:
+    import brotli
+except ImportError:  # optional "br" coding
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional "zstd" coding
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Negotiated HTTP response compression.
+# CompressionMiddleware picks the client's preferred coding from Accept-Encoding
+# (ties go to COMPRESSION_ENCODINGS order) and compresses JSON, NDJSON and CSV
+# bodies of at least COMPRESSION_MIN_SIZE bytes. Streamed bodies such as exports
+# are compressed chunk by chunk, flushing after each so clients still receive
+# rows as they are read. Responses that already carry a Content-Encoding are left
+# alone, and so are Server-Sent Events, which never reach a content type below.
+# PrecompressedBody serves a fixed document (the OpenAPI schema) from bytes
+# compressed once, at the highest level of each coding.
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+# Levels for PrecompressedBody, which pays the cost once
+BEST_LEVELS = {"gzip": 9, "br": 11, "zstd": 19}
+
+CODING_MODULES = {"gzip": zlib, "br": brotli, "zstd": zstandard}
+CODING_PACKAGES = {"br": "brotli", "zstd": "zstandard"}
+
+
+def available_codings(requested: str) -> tuple:
+    codings = []
+    for name in (c.strip().lower() for c in requested.split(",") if c.strip()):
+        if name not in CODING_MODULES:
+            logger.warning("Ignoring unknown response coding %r", name)
+            continue
+        if CODING_MODULES[name] is None:
+            logger.info("Response coding %s unavailable (pip install %s)", name, CODING_PACKAGES[name])
+            continue
+        codings.append(name)
+    return tuple(codings)
+
+
+CODINGS = available_codings(COMPRESSION_ENCODINGS) if COMPRESSION_ENABLED else ()
+
+
+# Helper function to pick a coding from an Accept-Encoding header, or None
+def negotiate(accept_encoding: str, codings: tuple = CODINGS):
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for coding in codings:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+# Returns (compress, flush, finish) for one stream: flush ends the current block
+# so the bytes so far can be decoded, finish ends the stream
+def new_encoder(coding: str, level: Optional[int] = None):
+    if coding == "br":
+        encoder = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY if level is None else level)
+        return encoder.process, encoder.flush, encoder.finish
+    if coding == "zstd":
+        encoder = zstandard.ZstdCompressor(
+            level=COMPRESSION_ZSTD_LEVEL if level is None else level
+        ).compressobj()
+        return encoder.compress, lambda: encoder.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), encoder.flush
+    encoder = zlib.compressobj(COMPRESSION_GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    return encoder.compress, lambda: encoder.flush(zlib.Z_SYNC_FLUSH), encoder.flush
+
+
+def compress(body: bytes, coding: str, level: Optional[int] = None) -> bytes:
+    compress_chunk, _, finish = new_encoder(coding, level)
+    return compress_chunk(body) + finish()
+
+
+def compressible(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+class CompressionStats:
+    def __init__(self):
+        self.responses = 0
+        self.skipped_small = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def stats(self) -> dict:
+        return {
+            "responses": self.responses,
+            "skipped_small": self.skipped_small,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": self.bytes_in / self.bytes_out if self.bytes_out else 0.0,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not CODINGS:
+            await self.app(scope, receive, send)
+            return
+        # Without a coding, CompressingSend only adds Vary to compressible responses
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        await self.app(scope, receive, CompressingSend(send, coding, self.minimum_size))
+
+
+# send() wrapper for one response: holds http.response.start until the first
+# body message shows whether the response is worth compressing. Every response
+# with a compressible content type gets Vary: Accept-Encoding, compressed or not,
+# since another client's request for the same URL may be answered compressed.
+class CompressingSend:
+    def __init__(self, send, coding: Optional[str], minimum_size: int):
+        self.send = send
+        self.coding = coding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.passthrough = False
+        self.encoder = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or not compressible(headers.get("content-type", "")):
+                self.passthrough = True
+                await self.send(message)
+            elif self.coding is None:
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                compression_stats.skipped_small += 1
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.encoder = new_encoder(self.coding)
+            compression_stats.responses += 1
+            headers["Content-Encoding"] = self.coding
+            if not more_body:
+                body = self._encode(body, more_body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            # Streamed: the compressed length is not known up front
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.send(start)
+
+        await self.send({
+            "type": "http.response.body",
+            "body": self._encode(body, more_body),
+            "more_body": more_body,
+        })
+
+    def _encode(self, body: bytes, more_body: bool) -> bytes:
+        compress_chunk, flush, finish = self.encoder
+        encoded = compress_chunk(body) + (flush() if more_body else finish())
+        compression_stats.bytes_in += len(body)
+        compression_stats.bytes_out += len(encoded)
+        return encoded
+
+
+# A fixed document kept as identity bytes plus one compressed copy per coding
+class PrecompressedBody:
+    def __init__(self, body: bytes, media_type: str):
+        self.media_type = media_type
+        self.bodies = {None: body}
+        if len(body) >= COMPRESSION_MIN_SIZE:
+            for coding in CODINGS:
+                self.bodies[coding] = compress(body, coding, BEST_LEVELS[coding])
+
+    def response(self, accept_encoding: str) -> Response:
+        coding = negotiate(accept_encoding, tuple(c for c in self.bodies if c))
+        headers = {"Vary": "Accept-Encoding"}
+        if coding:
+            headers["Content-Encoding"] = coding
+        return Response(self.bodies[coding], media_type=self.media_type, headers=headers)
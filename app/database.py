@@ -1,19 +1,364 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+import time
+from collections.abc import Mapping
 import motor.motor_asyncio
-import os
-from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel, monitoring
+from pymongo.errors import OperationFailure
+from app.config import (
+    METRICS_ENABLED,
+    MONGO_COMPRESSORS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_DB_NAME,
+    MONGO_MAX_CONNECTING,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_READ_PREFERENCE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_URI,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_WARMUP_CONNECTIONS,
+)
+from app.metrics import command_metrics
+from app.search import SEARCH_FIELDS, shadow_field
 
-# Load environment variables from .env file
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# MongoDB Atlas URI from environment
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 
-# Create MongoDB client
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
+# Connection pool events from pymongo's CMAP listeners.
+# Callbacks run on Motor's executor threads, so updates are guarded by a lock.
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections_open = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = {}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pool_clears = 0
 
-# Access your MongoDB database
-db = client.kpa_db
+    def pool_created(self, event):
+        pass
 
-# Collections
-forms_collection = db.forms
-responses_collection = db.responses
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+            self.connections_open -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        reason = str(event.reason)
+        with self._lock:
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        # pymongo >= 4.7 reports the wait itself; older versions use our own timer
+        wait = getattr(event, "duration", None)
+        if wait is None:
+            wait = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "min_pool_size": MONGO_MIN_POOL_SIZE,
+                "connections_open": self.connections_open,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_mean": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+                "pool_clears": self.pool_clears,
+            }
+
+
+pool_metrics = PoolMetricsListener()
+
+# Wire compressors need their optional packages; zlib is always available
+COMPRESSOR_MODULES = {
+    "zstd": ("zstandard", "zstandard"),
+    "snappy": ("snappy", "python-snappy"),
+    "zlib": (None, None),
+}
+
+
+def available_compressors(requested: str):
+    compressors = []
+    for name in (c.strip().lower() for c in requested.split(",") if c.strip()):
+        if name not in COMPRESSOR_MODULES:
+            logger.warning("Ignoring unknown Mongo compressor %r", name)
+            continue
+        module, package = COMPRESSOR_MODULES[name]
+        if module and importlib.util.find_spec(module) is None:
+            logger.info("Mongo compressor %s unavailable (pip install %s)", name, package)
+            continue
+        compressors.append(name)
+    return compressors
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "maxConnecting": MONGO_MAX_CONNECTING,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "event_listeners": [pool_metrics],
+    }
+    if METRICS_ENABLED:
+        options["event_listeners"].append(command_metrics)
+    compressors = available_compressors(MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+# Client and collections are created by connect() inside the app lifespan, so the
+# client is bound to the serving event loop; routes read them as database.<name>.
+client = None
+db = None
+forms_collection = None
+responses_collection = None
+idempotency_collection = None
+versions_collection = None
+due_rollup_collection = None
+summary_collection = None
+stream_state_collection = None
+
+
+async def connect():
+    return bind(motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI, **client_options()))
+
+
+# Point the module-level handles at a client; connect() and test stand-ins share it
+def bind(new_client):
+    global client, db, forms_collection, responses_collection, idempotency_collection
+    global versions_collection, due_rollup_collection, summary_collection, stream_state_collection
+    client = new_client
+    db = client[MONGO_DB_NAME]
+    forms_collection = db.forms
+    responses_collection = db.responses
+    idempotency_collection = db.idempotency_keys
+    versions_collection = db.collection_versions
+    due_rollup_collection = db.inspection_due_rollup
+    summary_collection = db.coach_summary
+    stream_state_collection = db.change_stream_state
+    return client
+
+
+# Pay the handshake (TLS, auth, compression negotiation) before the first request.
+# Concurrent pings make the pool open several connections instead of one.
+async def warm_up(connections: int = MONGO_WARMUP_CONNECTIONS):
+    started = time.perf_counter()
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(connections, 1))))
+    logger.info(
+        "Mongo pool warmed with %d connections in %.0f ms",
+        pool_metrics.connections_open, (time.perf_counter() - started) * 1000
+    )
+
+
+def close():
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+
+# Indexes the API relies on, keyed by collection name.
+# ensure_indexes() creates missing ones at startup and reports (or repairs) drift.
+INDEXES = {
+    "responses": [
+        IndexModel([("wheel_number", ASCENDING)], name="wheel_number_unique", unique=True),
+        # Lowercase shadow fields serve exact and prefix text filters
+        IndexModel([("wheel_number_lc", ASCENDING)], name="wheel_number_lc"),
+        IndexModel(
+            [("coach_number_lc", ASCENDING), ("status", ASCENDING), ("condition", ASCENDING)],
+            name="coach_lc_status_condition"
+        ),
+        IndexModel([("status", ASCENDING), ("condition", ASCENDING)], name="status_condition"),
+        # Batch lookups by axle (wheel_number lookups use the unique index)
+        IndexModel([("axle_number", ASCENDING)], name="axle_number"),
+        IndexModel([("manufacturer_lc", ASCENDING), ("status", ASCENDING)], name="manufacturer_lc_status"),
+        # Sort key for listing and keyset pagination
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+        # Inspection-due query; only ACTIVE wheels are scheduled
+        IndexModel(
+            [("next_inspection_due", ASCENDING), ("_id", ASCENDING)],
+            name="due_active", partialFilterExpression={"status": "ACTIVE"}
+        ),
+        IndexModel(
+            [("coach_number", ASCENDING), ("next_inspection_due", ASCENDING), ("_id", ASCENDING)],
+            name="coach_number_due_active", partialFilterExpression={"status": "ACTIVE"}
+        ),
+    ],
+    "forms": [
+        IndexModel(
+            [("bogie_details.bogie_number", ASCENDING), ("created_at", DESCENDING)],
+            name="bogie_number_created_at"
+        ),
+        # Checksheet listing filters, in the listing's full sort order (newest
+        # inspection, then _id) so a filtered page is read from the index without a
+        # sort stage; the bogie index also serves the {bogie_number, inspection_date,
+        # _id} $sort of the "latest per bogie" aggregation
+        IndexModel(
+            [
+                ("bogie_details.bogie_number", ASCENDING),
+                ("bogie_details.inspection_date", DESCENDING),
+                ("_id", DESCENDING),
+            ],
+            name="bogie_number_inspection_date_id"
+        ),
+        IndexModel(
+            [
+                ("bogie_details.coach_number", ASCENDING),
+                ("bogie_details.inspection_date", DESCENDING),
+                ("_id", DESCENDING),
+            ],
+            name="coach_number_inspection_date_id"
+        ),
+        IndexModel(
+            [
+                ("bogie_details.inspector_name", ASCENDING),
+                ("bogie_details.inspection_date", DESCENDING),
+                ("_id", DESCENDING),
+            ],
+            name="inspector_name_inspection_date_id"
+        ),
+        IndexModel(
+            [("bogie_details.inspection_date", DESCENDING), ("_id", DESCENDING)],
+            name="inspection_date_id"
+        ),
+    ],
+    # Stored responses for Idempotency-Key retries, removed by the TTL monitor
+    "idempotency_keys": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Index options that make two indexes with the same keys behave differently
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds", "collation")
+
+
+def _index_spec(info: dict) -> dict:
+    # index_information() returns key pairs, IndexModel.document holds a SON mapping
+    keys = info["key"].items() if isinstance(info["key"], Mapping) else info["key"]
+    spec = {"key": [
+        (field, int(direction) if isinstance(direction, (int, float)) else direction)
+        for field, direction in keys
+    ]}
+    for option in INDEX_OPTIONS:
+        if option in info:
+            spec[option] = info[option]
+    return spec
+
+
+async def ensure_indexes(repair: bool = False) -> dict:
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        wanted = {model.document["name"]: model for model in models}
+        result = {"created": [], "drifted": [], "repaired": [], "unmanaged": [], "errors": []}
+
+        missing = []
+        for name, model in wanted.items():
+            if name not in existing:
+                missing.append(model)
+                continue
+            if _index_spec(existing[name]) != _index_spec(model.document):
+                result["drifted"].append(name)
+                if repair:
+                    await collection.drop_index(name)
+                    missing.append(model)
+                    result["repaired"].append(name)
+
+        for name in existing:
+            if name == "_id_" or name in wanted:
+                continue
+            result["unmanaged"].append(name)
+            if repair:
+                await collection.drop_index(name)
+                result["repaired"].append(name)
+
+        for model in missing:
+            name = model.document["name"]
+            try:
+                await collection.create_indexes([model])
+                if name not in result["repaired"]:
+                    result["created"].append(name)
+            except OperationFailure as e:
+                # e.g. duplicate wheel numbers blocking the unique index
+                result["errors"].append({"index": name, "error": str(e)})
+
+        if result["drifted"] and not repair:
+            logger.warning("Index drift on %s: %s", collection_name, result["drifted"])
+        if result["unmanaged"] and not repair:
+            logger.warning("Unmanaged indexes on %s: %s", collection_name, result["unmanaged"])
+        for error in result["errors"]:
+            logger.error("Could not build index %s on %s: %s", error["index"], collection_name, error["error"])
+        report[collection_name] = result
+    return report
+
+
+# Fill the lowercase search fields on wheels written before they existed.
+# wheel_number is required, so a missing wheel_number_lc marks a document that
+# still needs all of its shadow fields; the filter is served by its index.
+async def backfill_search_fields() -> int:
+    result = await responses_collection.update_many(
+        {"wheel_number_lc": None},
+        [{"$set": {
+            shadow_field(field): {"$cond": [
+                {"$eq": [{"$type": f"${field}"}, "string"]},
+                {"$toLower": f"${field}"},
+                "$$REMOVE"
+            ]}
+            for field in SEARCH_FIELDS
+        }}]
+    )
+    if result.modified_count:
+        logger.info("Backfilled search fields on %d wheel specifications", result.modified_count)
+    return result.modified_count
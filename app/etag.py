@@ -0,0 +1,32 @@
+import hashlib
+from typing import Optional
+from fastapi import Response
+
+# Conditional GET support for listings and record reads.
+# An ETag combines the namespace's write counter (bumped by every API write, see
+# Repository.collection_version) with the request's cache key, so it is known
+# before any query runs: a poll whose If-None-Match still matches costs one
+# version lookup and gets 304. The tags are weak because they identify a
+# version of the data, not the exact bytes (estimated totals can drift).
+
+
+def make_etag(version: int, key: str) -> str:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+# Weak comparison, as required for If-None-Match
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,142 @@
+import asyncio
+from collections import deque
+from typing import Optional
+from app.config import EVENTS_BUFFER_SIZE, EVENTS_KEEPALIVE_SECONDS, EVENTS_MAX_SUBSCRIBERS
+from app.repository import coach_number_of
+from app.search import SEARCH_FIELDS_PROJECTION
+from app.serialization import dumps
+
+# Live feed of newly written wheel specifications and bogie checksheets, served as
+# Server-Sent Events by GET /api/api/events/inspections.
+# Each worker has one Broadcaster. It is fed once per write, either by the change
+# stream follower in app/summary.py or by the routes' write hook, and copies each
+# event into the buffer of every subscriber whose filters match. Buffers are
+# bounded deques: a subscriber that falls behind loses its oldest events (and is
+# told how many) instead of slowing publication or the other subscribers.
+
+# SSE event name per write namespace
+EVENT_TYPES = {"wheels": "wheel", "checksheets": "checksheet"}
+
+
+class SubscriberLimitReached(Exception):
+    pass
+
+
+# Helper function to keep internal fields out of published documents
+def event_doc(doc: dict) -> dict:
+    doc = {key: value for key, value in doc.items() if key not in SEARCH_FIELDS_PROJECTION}
+    doc_id = doc.pop("_id", None)
+    if "id" not in doc:
+        doc["id"] = doc_id
+    return doc
+
+
+def format_event(event_id: Optional[int], event: str, data) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: ".encode("utf-8") + dumps(data) + b"\n\n"
+
+
+class Subscription:
+    def __init__(self, event_type: Optional[str], coach_number: Optional[str], condition: Optional[str]):
+        self.event_type = event_type
+        self.coach_number = coach_number
+        self.condition = condition
+        self.buffer = deque(maxlen=EVENTS_BUFFER_SIZE)
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    # A condition filter only matches wheels; checksheets carry no wheel condition
+    def matches(self, event_type: str, coach_number: Optional[str], doc: dict) -> bool:
+        if self.event_type is not None and event_type != self.event_type:
+            return False
+        if self.coach_number is not None and coach_number != self.coach_number:
+            return False
+        if self.condition is not None and (event_type != "wheel" or doc.get("condition") != self.condition):
+            return False
+        return True
+
+    # Returns True when the buffer was full and its oldest event was dropped
+    def push(self, event: bytes) -> bool:
+        full = len(self.buffer) == self.buffer.maxlen
+        if full:
+            self.dropped += 1
+        self.buffer.append(event)
+        self.ready.set()
+        return full
+
+    # SSE chunks for the client: buffered events, a notice after drops, and a
+    # keep-alive comment when nothing arrived for EVENTS_KEEPALIVE_SECONDS
+    async def stream(self):
+        yield b"retry: 3000\n\n"
+        reported = 0
+        while not self.closed:
+            try:
+                await asyncio.wait_for(self.ready.wait(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            self.ready.clear()
+            if self.dropped > reported:
+                yield format_event(None, "dropped", {"dropped": self.dropped - reported})
+                reported = self.dropped
+            while self.buffer:
+                yield self.buffer.popleft()
+
+
+class Broadcaster:
+    def __init__(self):
+        self.subscriptions = set()
+        self.sequence = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    # Raises SubscriberLimitReached at EVENTS_MAX_SUBSCRIBERS
+    def subscribe(self, event_type=None, coach_number=None, condition=None) -> Subscription:
+        if len(self.subscriptions) >= EVENTS_MAX_SUBSCRIBERS:
+            self.rejected += 1
+            raise SubscriberLimitReached()
+        subscription = Subscription(event_type, coach_number, condition)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    # Never blocks: each event is encoded once and appended to matching buffers
+    def publish(self, namespace: str, docs):
+        event_type = EVENT_TYPES[namespace]
+        for doc in docs:
+            self.sequence += 1
+            self.published += 1
+            if not self.subscriptions:
+                continue
+            doc = event_doc(doc)
+            coach_number = coach_number_of(namespace, doc)
+            event = None
+            for subscription in self.subscriptions:
+                if not subscription.matches(event_type, coach_number, doc):
+                    continue
+                if event is None:
+                    event = format_event(self.sequence, event_type, doc)
+                if subscription.push(event):
+                    self.dropped += 1
+                self.delivered += 1
+
+    # End every open stream, e.g. at shutdown
+    def close(self):
+        for subscription in self.subscriptions:
+            subscription.closed = True
+            subscription.ready.set()
+        self.subscriptions.clear()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
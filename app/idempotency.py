@@ -0,0 +1,89 @@
+import hashlib
+from typing import Optional
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from app.repository import repository
+from app.serialization import dumps
+
+# Idempotency-Key support for create endpoints.
+# The first request with a key stores its response; retries with the same key and
+# body get that response back (marked Idempotent-Replayed: true) without touching
+# the form collections. A retry that arrives while the first request is still
+# running gets 409, and reusing a key for a different body gets 422. Server errors
+# release the key so the client can retry for real.
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+def request_hash(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, BaseModel):
+            part = dumps(part.model_dump(mode="json"))
+        elif not isinstance(part, bytes):
+            part = str(part).encode("utf-8")
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+def replay(record: dict) -> Response:
+    return Response(
+        content=record["body"],
+        status_code=record["status_code"],
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+# Run handler() once per (scope, key); without a key it just runs
+async def run_idempotent(scope: str, key: Optional[str], fingerprint: str, handler):
+    if key is None:
+        return await handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters"
+        )
+
+    record_key = f"{scope}:{key}"
+    try:
+        record = await repository.claim_idempotency_key(record_key, fingerprint)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to check idempotency key: {str(e)}")
+    if record is not None:
+        if record["request_hash"] != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail=f"{IDEMPOTENCY_HEADER} was already used with a different request"
+            )
+        if record["status_code"] is None:
+            raise HTTPException(
+                status_code=409,
+                detail=f"A request with this {IDEMPOTENCY_HEADER} is still in progress"
+            )
+        return replay(record)
+
+    try:
+        result = await handler()
+    except HTTPException as e:
+        # Client errors are as final as a success; server errors may be retried
+        if e.status_code < 500:
+            await repository.complete_idempotency_key(
+                record_key, e.status_code, dumps({"detail": e.detail}).decode("utf-8")
+            )
+        else:
+            await repository.release_idempotency_key(record_key)
+        raise
+    except BaseException:
+        await repository.release_idempotency_key(record_key)
+        raise
+
+    if isinstance(result, Response):
+        status_code, body = result.status_code, result.body
+    else:
+        status_code = 200
+        body = dumps(result.model_dump(mode="json") if isinstance(result, BaseModel) else result)
+    await repository.complete_idempotency_key(record_key, status_code, body.decode("utf-8"))
+    return result
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from app.config import (
+    CHECKSHEET_DRAIN_TIMEOUT_SECONDS,
+    CHECKSHEET_FLUSH_BATCH_SIZE,
+    CHECKSHEET_FLUSH_INTERVAL_MS,
+    CHECKSHEET_QUEUE_MAX,
+)
+from app.metrics import checksheet_flush_duration, checksheet_flush_size
+from app.repository import repository
+
+logger = logging.getLogger(__name__)
+
+# Write-behind ingestion for checksheet submissions (CHECKSHEET_WRITE_BEHIND).
+# The route validates a checksheet, gives it an id from the repository and queues
+# it; a single flusher task writes the queue in batches of up to
+# CHECKSHEET_FLUSH_BATCH_SIZE, or whatever arrived within
+# CHECKSHEET_FLUSH_INTERVAL_MS of the first item. The queue is bounded, so a
+# backed-up database turns into QueueFull (503) instead of unbounded memory.
+# Ids are assigned before the write, which makes a retried batch safe: rows that
+# already landed are skipped by the repository. Every queued checksheet has been
+# answered 202, so a failed batch is retried (with capped exponential backoff)
+# until it is written or the app shuts down; meanwhile the queue fills and new
+# submissions get 503 instead of being accepted and lost.
+
+FLUSH_RETRY_DELAY_SECONDS = 0.5
+FLUSH_RETRY_MAX_DELAY_SECONDS = 30
+
+
+class ChecksheetWriter:
+    def __init__(self, on_flush=None):
+        # Awaited with each written batch, e.g. to invalidate cached listings
+        self.on_flush = on_flush
+        self.queue = None
+        self.task = None
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.in_flight = 0
+        self.retrying = False
+        self.batches = 0
+        self.retries = 0
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=CHECKSHEET_QUEUE_MAX)
+        self.task = asyncio.create_task(self._run())
+
+    # Raises asyncio.QueueFull when the buffer is at capacity
+    def submit(self, doc: dict):
+        try:
+            self.queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self.accepted += 1
+
+    # Wait for queued checksheets to be written, then stop the flusher
+    async def stop(self):
+        if self.task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), CHECKSHEET_DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.error(
+                "Checksheet queue not drained after %ss; %d checksheets not written",
+                CHECKSHEET_DRAIN_TIMEOUT_SECONDS, self.queue.qsize() + self.in_flight
+            )
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            self.in_flight = len(batch)
+            try:
+                await self._flush(batch)
+            finally:
+                self.in_flight = 0
+                for _ in batch:
+                    self.queue.task_done()
+
+    # Block for the first item, then take more until the batch is full or the
+    # flush interval has passed
+    async def _next_batch(self) -> list:
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CHECKSHEET_FLUSH_INTERVAL_MS / 1000
+        while len(batch) < CHECKSHEET_FLUSH_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch: list):
+        started = time.perf_counter()
+        delay = FLUSH_RETRY_DELAY_SECONDS
+        while True:
+            try:
+                await repository.insert_checksheets(batch)
+                break
+            except Exception as e:
+                self.retries += 1
+                self.retrying = True
+                logger.error(
+                    "Writing %d queued checksheets failed, retrying in %.1fs: %s",
+                    len(batch), delay, e
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, FLUSH_RETRY_MAX_DELAY_SECONDS)
+        self.retrying = False
+
+        checksheet_flush_duration.observe((), time.perf_counter() - started)
+        checksheet_flush_size.observe((), len(batch))
+        self.batches += 1
+        self.written += len(batch)
+        if self.on_flush is not None:
+            try:
+                await self.on_flush(batch)
+            except Exception as e:
+                logger.error("Checksheet flush hook failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_max": CHECKSHEET_QUEUE_MAX,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "in_flight": self.in_flight,
+            "retrying": int(self.retrying),
+            "batches": self.batches,
+            "retries": self.retries,
+        }
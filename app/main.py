@@ -1,16 +1,74 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.config import (
+    CHECKSHEET_WRITE_BEHIND,
+    COMPRESSION_ENABLED,
+    ENSURE_INDEXES_ON_STARTUP,
+    INDEX_REPAIR,
+    METRICS_ENABLED,
+)
+from app.compression import CompressionMiddleware, PrecompressedBody, compression_stats
+from app.metrics import MetricsMiddleware, render_metrics, render_stats
+from app.repository import repository
+from app.routes import (
+    checksheet_writer,
+    coach_summaries,
+    count_cache,
+    inspection_events,
+    listing_flights,
+    query_cache,
+    router,
+)
+from app.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Startup/shutdown hooks
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema only changes with the code: serialize and compress it once
+    app.state.openapi = PrecompressedBody(dumps(app.openapi()), "application/json")
+
+    await repository.connect()
+    try:
+        await repository.warm_up()
+    except repository.errors as e:
+        logger.error("%s warm-up failed: %s", repository.label, e)
 
-from app.routes import router
+    app.state.index_report = None
+    if ENSURE_INDEXES_ON_STARTUP:
+        try:
+            app.state.index_report = await repository.ensure_indexes(repair=INDEX_REPAIR)
+        except repository.errors as e:
+            # Serve requests anyway; writes still surface errors per request
+            logger.error("Index setup failed at startup: %s", e)
+
+    coach_summaries.start()
+    if CHECKSHEET_WRITE_BEHIND:
+        checksheet_writer.start()
+    yield
+    # Write out queued checksheets while the connection is still open
+    await checksheet_writer.stop()
+    await coach_summaries.stop()
+    inspection_events.close()
+    await repository.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="KPA Form Data API (MongoDB)",
     description="API for managing bogie checksheets and wheel specifications",
     version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc"
+    # Served below from the schema built by the lifespan
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -22,9 +80,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated gzip / br / zstd response compression
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Per-route latency and Mongo command metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include API routes
 app.include_router(router, prefix="/api")
 
+# OpenAPI schema and the interactive docs that read it
+@app.get("/openapi.json", include_in_schema=False)
+async def openapi_schema(request: Request):
+    return app.state.openapi.response(request.headers.get("accept-encoding", ""))
+
+@app.get("/docs", include_in_schema=False)
+async def swagger_docs():
+    return get_swagger_ui_html(openapi_url="/openapi.json", title=f"{app.title} - Swagger UI")
+
+@app.get("/redoc", include_in_schema=False)
+async def redoc_docs():
+    return get_redoc_html(openapi_url="/openapi.json", title=f"{app.title} - ReDoc")
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -35,11 +114,29 @@ async def root():
         "endpoints": {
             "docs": "/docs",
             "redoc": "/redoc",
-            "bogie_checksheet": "POST /api/forms/bogie-checksheet",
-            "wheel_specifications": "GET /api/forms/wheel-specifications"
+            "bogie_checksheet": "POST /api/api/forms/bogie-checksheet",
+            "wheel_specifications": "GET /api/api/forms/wheel-specifications"
         }
     }
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body = render_metrics((
+        render_stats(
+            f"{repository.name}_pool", repository.pool_stats(),
+            f"{repository.label} connection pool statistic"
+        ),
+        render_stats("query_cache", query_cache.stats(), "Listing query cache statistic"),
+        render_stats("count_cache", count_cache.stats(), "Listing count cache statistic"),
+        render_stats("listing_flights", listing_flights.stats(), "Coalesced listing query statistic"),
+        render_stats("checksheet_writer", checksheet_writer.stats(), "Write-behind checksheet queue statistic"),
+        render_stats("coach_summary", coach_summaries.stats(), "Coach summary maintenance statistic"),
+        render_stats("inspection_events", inspection_events.stats(), "Live inspection feed statistic"),
+        render_stats("response_compression", compression_stats.stats(), "Response compression statistic"),
+    ))
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
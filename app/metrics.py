@@ -0,0 +1,223 @@
+import bisect
+import contextvars
+import threading
+import time
+
+from pymongo import monitoring
+
+# Prometheus-style request and Mongo command metrics.
+# MetricsMiddleware times every HTTP request by route template and publishes the
+# ASGI scope in a context variable. Motor copies context onto its executor threads,
+# so CommandMetricsListener can attribute each Mongo command to the route that
+# issued it. Everything is rendered in Prometheus text format by render_metrics().
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Route label for Mongo work that happens outside a request (startup, background tasks)
+BACKGROUND_ROUTE = "<background>"
+UNMATCHED_ROUTE = "<unmatched>"
+# Scope key caching a request's route label once routing has picked the route
+ROUTE_LABEL_KEY = "metrics.route"
+
+current_scope = contextvars.ContextVar("current_scope", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency by originating route",
+    ("route", "command")
+)
+mongo_command_failures = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands by originating route", ("route", "command")
+)
+
+checksheet_flush_duration = Histogram(
+    "checksheet_flush_duration_seconds", "Write-behind checksheet batch insert latency"
+)
+checksheet_flush_size = Histogram(
+    "checksheet_flush_batch_size", "Checksheets written per write-behind batch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+
+REGISTRY = [
+    http_requests_total,
+    http_request_duration,
+    mongo_command_duration,
+    mongo_command_failures,
+    checksheet_flush_duration,
+    checksheet_flush_size,
+]
+
+
+# The matched route's path_format under the prefixes it was included with, as
+# in the URL (/api/api/coaches/{coach_number}/summary). scope["route"] can be
+# the route as declared on its APIRouter, without the include_router prefix, so
+# the prefix is taken from the request path: the part before the segments the
+# route's template matches.
+def route_label(scope) -> str:
+    if scope is None:
+        return BACKGROUND_ROUTE
+    label = scope.get(ROUTE_LABEL_KEY)
+    if label is not None:
+        return label
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return UNMATCHED_ROUTE
+    path = scope.get("path", "")
+    start = 0
+    while start > -1 and route.path_regex.match(path[start:]) is None:
+        start = path.find("/", start + 1)
+    label = scope[ROUTE_LABEL_KEY] = path[:start] + path_format if start > 0 else path_format
+    return label
+
+
+# Pure ASGI middleware: no request/response objects are built, and streaming
+# responses are timed until their last body chunk is sent.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = current_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_scope.reset(token)
+            route = route_label(scope)
+            http_request_duration.observe((scope["method"], route), elapsed)
+            http_requests_total.inc((scope["method"], route, str(status["code"])))
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe(
+            (route_label(current_scope.get()), event.command_name), event.duration_micros / 1e6
+        )
+
+    def failed(self, event):
+        labels = (route_label(current_scope.get()), event.command_name)
+        mongo_command_duration.observe(labels, event.duration_micros / 1e6)
+        mongo_command_failures.inc(labels)
+
+
+command_metrics = CommandMetricsListener()
+
+
+# Render a dict of stats (pool, cache) as gauges named <prefix>_<key>.
+# Nested dicts, such as checkout failures, are split by a "reason" label.
+def render_stats(prefix: str, stats: dict, help: str):
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float, dict)):
+            continue
+        name = f"{prefix}_{key}"
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} gauge"
+        if isinstance(value, dict):
+            for reason, count in value.items():
+                yield f'{name}{{reason="{_escape(reason)}"}} {_number(count)}'
+        else:
+            yield f"{name} {_number(value)}"
+
+
+def render_metrics(extra_sections=()) -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for section in extra_sections:
+        lines.extend(section)
+    return "\n".join(lines) + "\n"
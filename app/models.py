@@ -1,74 +1,160 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Date, Integer, JSON, String, DateTime, Text, Float, Boolean, Index
+from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.sql import func
-from app.database import Base
+
+
+class Base(DeclarativeBase):
+    pass
+
 
 class BogieChecksheet(Base):
     __tablename__ = "bogie_checksheets"
-    
-    id = Column(Integer, primary_key=True, index=True)
+
+    id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
-    
+
     # Bogie Details
     bogie_number = Column(String(50), nullable=False)
     coach_number = Column(String(50), nullable=False)
     inspection_date = Column(DateTime, nullable=False)
     inspector_name = Column(String(100), nullable=False)
-    
+
     # Bogie Checksheet Fields
     bogie_frame_condition = Column(String(50))
     bolster = Column(String(50))
     bolster_suspension_bracket = Column(String(50))
     axle_guide = Column(String(50))
     lower_spring_seat = Column(String(50))
-    
+
     # BMBC Checksheet Fields
     adjusting_tube = Column(String(50))
     cylinder_body = Column(String(50))
     piston_trunnion = Column(String(50))
     plunger_spring = Column(String(50))
-    
+
     # Additional fields
     remarks = Column(Text)
     overall_status = Column(String(20), default="PENDING")
 
+    # Listing filters are exact matches, newest inspection first; the
+    # bogie_number index also serves latest_per_bogie (DISTINCT ON)
+    __table_args__ = (
+        Index("ix_bogie_checksheets_bogie_number_inspection_date", "bogie_number", "inspection_date"),
+        Index("ix_bogie_checksheets_coach_number_inspection_date", "coach_number", "inspection_date"),
+        Index("ix_bogie_checksheets_inspector_name_inspection_date", "inspector_name", "inspection_date"),
+        Index("ix_bogie_checksheets_inspection_date_id", "inspection_date", "id"),
+    )
+
+class CollectionVersion(Base):
+    __tablename__ = "collection_versions"
+
+    # Bumped after every API write to the namespace; used for ETags
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+class InspectionDueRollup(Base):
+    __tablename__ = "inspection_due_rollup"
+
+    # ACTIVE wheels per coach falling due on each day, kept current by wheel inserts
+    coach_number = Column(String(50), primary_key=True)
+    due_date = Column(Date, primary_key=True)
+    wheel_count = Column(Integer, nullable=False, default=0)
+
+class CoachSummary(Base):
+    __tablename__ = "coach_summary"
+
+    # Recomputed per coach after wheel and checksheet writes (ACTIVE wheels only)
+    coach_number = Column(String(50), primary_key=True)
+    wheel_count = Column(Integer, nullable=False, default=0)
+    condition_counts = Column(JSON, nullable=False)
+    worst_condition = Column(String(50))
+    cracked_wheels = Column(Integer, nullable=False, default=0)
+    latest_checksheet_id = Column(Integer)
+    latest_bogie_number = Column(String(50))
+    latest_inspection_date = Column(DateTime)
+    latest_overall_status = Column(String(20))
+    updated_at = Column(DateTime, nullable=False)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(300), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer)  # NULL while the first request is still running
+    body = Column(Text)
+    locked_until = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
 class WheelSpecification(Base):
     __tablename__ = "wheel_specifications"
-    
-    id = Column(Integer, primary_key=True, index=True)
+
+    id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
-    
+
     # Wheel identification
     wheel_number = Column(String(50), nullable=False, unique=True)
     axle_number = Column(String(50), nullable=False)
     coach_number = Column(String(50), nullable=False)
     position = Column(String(20))  # LEFT/RIGHT
-    
+
     # Wheel measurements
     wheel_diameter = Column(Float, nullable=False)
     rim_thickness = Column(Float)
     flange_height = Column(Float)
     flange_thickness = Column(Float)
-    
+
     # Wheel condition
     condition = Column(String(50), default="GOOD")
     wear_pattern = Column(String(100))
     cracks_detected = Column(Boolean, default=False)
-    
+
     # Manufacturing details
     manufacturer = Column(String(100))
     manufacture_date = Column(DateTime)
     material_grade = Column(String(50))
-    
+
     # Inspection details
     last_inspection_date = Column(DateTime)
     next_inspection_due = Column(DateTime)
     inspector_name = Column(String(100))
-    
+
     # Additional specifications
     load_capacity = Column(Float)
     speed_rating = Column(String(20))
     remarks = Column(Text)
     status = Column(String(20), default="ACTIVE")
+
+    # Case-insensitive search runs on lower(column); text_pattern_ops lets the
+    # same B-tree serve both exact and prefix (LIKE 'abc%') matches
+    __table_args__ = (
+        Index(
+            "ix_wheel_specifications_wheel_number_lc",
+            func.lower(wheel_number).label("wheel_number_lc"),
+            postgresql_ops={"wheel_number_lc": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_wheel_specifications_coach_number_lc_status_condition",
+            func.lower(coach_number).label("coach_number_lc"), "status", "condition",
+            postgresql_ops={"coach_number_lc": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_wheel_specifications_manufacturer_lc_status",
+            func.lower(manufacturer).label("manufacturer_lc"), "status",
+            postgresql_ops={"manufacturer_lc": "text_pattern_ops"},
+        ),
+        Index("ix_wheel_specifications_status_condition", "status", "condition"),
+        Index("ix_wheel_specifications_axle_number", "axle_number"),
+        Index("ix_wheel_specifications_created_at_id", "created_at", "id"),
+        # Partial indexes for the inspection-due query; only ACTIVE wheels are scheduled
+        Index(
+            "ix_wheel_specifications_due_active", "next_inspection_due", "id",
+            postgresql_where=(status == "ACTIVE"),
+        ),
+        Index(
+            "ix_wheel_specifications_coach_number_due_active", "coach_number", "next_inspection_due", "id",
+            postgresql_where=(status == "ACTIVE"),
+        ),
+    )
@@ -0,0 +1,650 @@
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
+from app import database
+from app.config import COACH_SUMMARY_BATCH_MS, IDEMPOTENCY_LOCK_SECONDS, IDEMPOTENCY_TTL_SECONDS
+from app.pagination import encode_cursor, keyset_filter
+from app.repository import (
+    WEAR_METRICS,
+    WEAR_PERCENTILES,
+    DuplicateWheelError,
+    Repository,
+    coach_summary,
+    due_increments,
+)
+from app.schemas import ConditionEnum, CountModeEnum, MatchModeEnum, StatsGroupEnum
+from app.search import SEARCH_FIELDS, SEARCH_FIELDS_PROJECTION, add_search_fields, match_condition
+
+# MongoDB storage: wheels in "responses", checksheets in "forms" (see app/database.py).
+# Wheels are written with the lowercase search fields from app/search.py.
+# The inspection-due rollup has one document per coach: {"_id": coach_number,
+# "days": {"YYYY-MM-DD": wheels}}. Coach summaries are keyed by coach number too,
+# and the change stream feeding them keeps its resume token in change_stream_state,
+# next to the lease naming the worker that maintains them.
+
+logger = logging.getLogger(__name__)
+
+# change_stream_state document for the coach summary stream
+COACH_STREAM = "coach_summary"
+# Server error when a resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+# Server error for an unknown $group accumulator: $percentile before MongoDB 7.0
+UNKNOWN_GROUP_OPERATOR = 15952
+# Changes handed over in one batch at most
+STREAM_BATCH_EVENTS = 1000
+# Idle streams still advance their token; persist it at most this often
+STREAM_TOKEN_SAVE_SECONDS = 60
+
+
+# Helper function to turn wheel listing filters into a Mongo query
+def wheel_query(filters: dict) -> dict:
+    query = {}
+    match = filters.get("match", MatchModeEnum.PREFIX)
+    for field in SEARCH_FIELDS:
+        if filters.get(field):
+            key, condition_value = match_condition(field, filters[field], match)
+            query[key] = condition_value
+    for field in ("condition", "status"):
+        if filters.get(field):
+            query[field] = filters[field]
+    return query
+
+
+# Helper function to turn checksheet listing filters into a Mongo query
+# (exact matches on bogie_details)
+def checksheet_query(filters: dict) -> dict:
+    query = {}
+    for field in ("bogie_number", "coach_number", "inspector_name"):
+        if filters.get(field):
+            query[f"bogie_details.{field}"] = filters[field]
+    date_range = {}
+    if filters.get("inspection_date_from"):
+        date_range["$gte"] = filters["inspection_date_from"]
+    if filters.get("inspection_date_to"):
+        date_range["$lte"] = filters["inspection_date_to"]
+    if date_range:
+        query["bogie_details.inspection_date"] = date_range
+    if filters.get("overall_status"):
+        query["overall_status"] = filters["overall_status"]
+    return query
+
+
+# Helper function to turn a requested field list into a projection.
+# Returns the projection plus the keys that were only fetched for the keyset
+# cursor and must be dropped from the output.
+def wheel_projection(fields: Optional[list]):
+    if not fields:
+        return SEARCH_FIELDS_PROJECTION, set()
+    projection = {("_id" if f == "id" else f): 1 for f in fields}
+    hidden = set()
+    for key in ("_id", "created_at"):
+        if key not in projection:
+            projection[key] = 1
+            hidden.add(key)
+    return projection, hidden
+
+
+# Helper function to build the $group stage for wheel wear statistics.
+# Condition histogram buckets use positional keys because enum values contain spaces.
+def wear_stats_group(group_by: StatsGroupEnum, with_percentiles: bool) -> dict:
+    group = {"_id": f"${group_by.value}", "count": {"$sum": 1}}
+    for metric in WEAR_METRICS:
+        group[f"{metric}_min"] = {"$min": f"${metric}"}
+        group[f"{metric}_max"] = {"$max": f"${metric}"}
+        group[f"{metric}_mean"] = {"$avg": f"${metric}"}
+        if with_percentiles:
+            group[f"{metric}_pct"] = {"$percentile": {
+                "input": f"${metric}", "p": list(WEAR_PERCENTILES), "method": "approximate"
+            }}
+    for position, condition in enumerate(ConditionEnum):
+        group[f"condition_{position}"] = {
+            "$sum": {"$cond": [{"$eq": ["$condition", condition.value]}, 1, 0]}
+        }
+    return group
+
+
+def and_query(query: dict, extra: dict) -> dict:
+    return {"$and": [query, extra]} if query else extra
+
+
+class MongoRepository(Repository):
+    name = "mongo"
+    label = "MongoDB"
+    errors = (PyMongoError,)
+    # Cleared once the server rejects $percentile, so later stats skip the attempt
+    percentiles = True
+
+    async def connect(self):
+        await database.connect()
+
+    async def warm_up(self):
+        await database.warm_up()
+
+    async def close(self):
+        database.close()
+
+    async def ensure_indexes(self, repair: bool = False) -> dict:
+        report = await database.ensure_indexes(repair=repair)
+        await database.backfill_search_fields()
+        return report
+
+    def pool_stats(self) -> dict:
+        return database.pool_metrics.stats()
+
+    async def create_checksheet(self, data: dict) -> str:
+        result = await database.forms_collection.insert_one(data)
+        return str(result.inserted_id)
+
+    async def new_checksheet_id(self) -> str:
+        return str(ObjectId())
+
+    async def insert_checksheets(self, docs: list):
+        rows = []
+        for doc in docs:
+            row = dict(doc)
+            row["_id"] = ObjectId(row.pop("id"))
+            rows.append(row)
+        try:
+            await database.forms_collection.insert_many(rows, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate ids were written by an earlier attempt of the same batch
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+
+    async def get_checksheet(self, checksheet_id: str) -> Optional[dict]:
+        try:
+            object_id = ObjectId(checksheet_id)
+        except InvalidId:
+            raise ValueError("Invalid checksheet id")
+        doc = await database.forms_collection.find_one({"_id": object_id})
+        if doc is not None:
+            doc["id"] = doc.pop("_id")
+        return doc
+
+    async def list_checksheets(self, filters, *, latest_per_bogie, limit, offset, cursor, count):
+        collection = database.forms_collection
+        query = checksheet_query(filters)
+        page_query = query
+        if cursor:
+            page_query = and_query(
+                query, keyset_filter("bogie_details.inspection_date", cursor, direction=-1)
+            )
+
+        async def fetch_page():
+            if latest_per_bogie:
+                # One pass: newest first within each bogie, keep the first per group.
+                # The $sort is served by bogie_number_inspection_date_id; the
+                # regrouped page is sorted again, so allow spilling to disk.
+                results = collection.aggregate([
+                    {"$match": query},
+                    {"$sort": {
+                        "bogie_details.bogie_number": 1,
+                        "bogie_details.inspection_date": -1,
+                        "_id": -1
+                    }},
+                    {"$group": {"_id": "$bogie_details.bogie_number", "doc": {"$first": "$$ROOT"}}},
+                    {"$replaceRoot": {"newRoot": "$doc"}},
+                    {"$sort": {"bogie_details.bogie_number": 1}},
+                    {"$skip": offset},
+                    {"$limit": limit},
+                ], allowDiskUse=True)
+            else:
+                results = (
+                    collection.find(page_query)
+                    .sort([("bogie_details.inspection_date", -1), ("_id", -1)])
+                    .skip(offset)
+                    .limit(limit)
+                )
+            checksheets = []
+            next_cursor = None
+            async for doc in results:
+                if not latest_per_bogie:
+                    next_cursor = encode_cursor(doc["bogie_details"]["inspection_date"], doc["_id"])
+                doc["id"] = doc.pop("_id")
+                checksheets.append(doc)
+            if len(checksheets) < limit:
+                next_cursor = None
+            return checksheets, next_cursor
+
+        async def count_bogies():
+            rows = await collection.aggregate([
+                {"$match": query},
+                {"$group": {"_id": "$bogie_details.bogie_number"}},
+                {"$count": "total"},
+            ]).to_list(length=1)
+            return rows[0]["total"] if rows else 0
+
+        if count == CountModeEnum.NONE:
+            checksheets, next_cursor = await fetch_page()
+            return checksheets, next_cursor, None
+        if latest_per_bogie:
+            counter = count_bogies()
+        elif count == CountModeEnum.ESTIMATED:
+            counter = self.estimate_count(
+                "checksheets", filters,
+                lambda: collection.count_documents(query), collection.estimated_document_count
+            )
+        else:
+            counter = collection.count_documents(query)
+        (checksheets, next_cursor), total = await asyncio.gather(fetch_page(), counter)
+        return checksheets, next_cursor, total
+
+    async def create_wheel(self, doc: dict) -> str:
+        # Uniqueness is enforced by the wheel_number_unique index
+        try:
+            result = await database.responses_collection.insert_one(add_search_fields(doc))
+        except DuplicateKeyError:
+            raise DuplicateWheelError(doc["wheel_number"])
+        await self.add_to_due_rollup([doc])
+        return str(result.inserted_id)
+
+    async def insert_wheels(self, docs: list, ordered: bool):
+        # Duplicates already stored are rejected by the unique wheel_number index
+        failed = {}
+        try:
+            await database.responses_collection.insert_many(
+                [add_search_fields(doc) for doc in docs], ordered=ordered
+            )
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                if err.get("code") == 11000:
+                    failed[err["index"]] = ("duplicate", "Wheel number already exists")
+                else:
+                    failed[err["index"]] = ("error", err.get("errmsg", "Write failed"))
+
+        last = min(failed) if ordered and failed else len(docs)
+        created = {
+            position: str(doc["_id"])
+            for position, doc in enumerate(docs[:last]) if position not in failed
+        }
+        await self.add_to_due_rollup([docs[position] for position in created])
+        return created, failed
+
+    # Runs after the wheels are stored. Any failure is logged rather than raised:
+    # the write has succeeded, and rebuild_due_rollup (rebuild_rollups.py) heals
+    # the rollup from the wheels.
+    async def add_to_due_rollup(self, docs: list):
+        increments = {}
+        try:
+            for (coach, day), count in due_increments(docs).items():
+                increments.setdefault(coach, {})[f"days.{day.isoformat()}"] = count
+            if not increments:
+                return
+            await database.due_rollup_collection.bulk_write(
+                [UpdateOne({"_id": coach}, {"$inc": inc}, upsert=True) for coach, inc in increments.items()],
+                ordered=False
+            )
+        except Exception as e:
+            logger.error(
+                "Inspection-due rollup update failed for %d wheels, run rebuild_rollups.py --only due: %s",
+                len(docs), e
+            )
+
+    async def list_wheels(self, filters, *, fields, limit, offset, cursor, count):
+        collection = database.responses_collection
+        query = wheel_query(filters)
+        projection, hidden = wheel_projection(fields)
+
+        # Keyset mode: resume after the last (created_at, _id) of the previous page
+        page_query = and_query(query, keyset_filter("created_at", cursor)) if cursor else query
+
+        async def fetch_page():
+            results = (
+                collection.find(page_query, projection)
+                .sort([("created_at", 1), ("_id", 1)])
+                .skip(offset)
+                .limit(limit)
+            )
+            wheels = []
+            next_cursor = None
+            async for doc in results:
+                next_cursor = encode_cursor(doc.get("created_at"), doc["_id"])
+                # ObjectId and datetimes are left for BSONResponse to encode
+                doc_id = doc.pop("_id")
+                if "_id" not in hidden:
+                    doc["id"] = doc_id
+                if "created_at" in hidden:
+                    doc.pop("created_at", None)
+                wheels.append(doc)
+            if len(wheels) < limit:
+                next_cursor = None
+            return wheels, next_cursor
+
+        # The page and the count are independent queries, so run them concurrently
+        if count == CountModeEnum.EXACT:
+            counter = collection.count_documents(query)
+        elif count == CountModeEnum.ESTIMATED:
+            counter = self.estimate_count(
+                "wheels", filters,
+                lambda: collection.count_documents(query), collection.estimated_document_count
+            )
+        else:
+            wheels, next_cursor = await fetch_page()
+            return wheels, next_cursor, None
+        (wheels, next_cursor), total = await asyncio.gather(fetch_page(), counter)
+        return wheels, next_cursor, total
+
+    async def lookup_wheels(self, field, values):
+        results = database.responses_collection.find(
+            {field: {"$in": values}}, SEARCH_FIELDS_PROJECTION
+        ).sort([(field, 1), ("wheel_number", 1)])
+        wheels = []
+        async for doc in results:
+            doc["id"] = doc.pop("_id")
+            wheels.append(doc)
+        return wheels
+
+    async def list_due_wheels(self, due_before, coach_number, *, limit, cursor):
+        # status and the range match the partial due_active indexes
+        query = {"status": "ACTIVE", "next_inspection_due": {"$lte": due_before}}
+        if coach_number:
+            query["coach_number"] = coach_number
+        if cursor:
+            query = and_query(query, keyset_filter("next_inspection_due", cursor))
+        results = (
+            database.responses_collection.find(query, SEARCH_FIELDS_PROJECTION)
+            .sort([("next_inspection_due", 1), ("_id", 1)])
+            .limit(limit)
+        )
+        wheels = []
+        next_cursor = None
+        async for doc in results:
+            next_cursor = encode_cursor(doc["next_inspection_due"], doc["_id"])
+            doc["id"] = doc.pop("_id")
+            wheels.append(doc)
+        if len(wheels) < limit:
+            next_cursor = None
+        return wheels, next_cursor
+
+    async def due_rollup(self, coach_number):
+        query = {"_id": coach_number} if coach_number else {}
+        rollup = {}
+        async for doc in database.due_rollup_collection.find(query).sort("_id", 1):
+            rollup[doc["_id"]] = {
+                date.fromisoformat(day): count for day, count in doc.get("days", {}).items() if count
+            }
+        return rollup
+
+    # Writes racing the rebuild may be lost; run it when wheel writes are quiet
+    async def rebuild_due_rollup(self):
+        pipeline = [
+            {"$match": {"status": "ACTIVE", "next_inspection_due": {"$type": "date"}}},
+            {"$group": {
+                "_id": {
+                    "coach": "$coach_number",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$next_inspection_due"}},
+                },
+                "count": {"$sum": 1},
+            }},
+        ]
+        rollup = {}
+        async for row in database.responses_collection.aggregate(pipeline, allowDiskUse=True):
+            rollup.setdefault(row["_id"]["coach"], {})[row["_id"]["day"]] = row["count"]
+        await database.due_rollup_collection.delete_many({})
+        if rollup:
+            await database.due_rollup_collection.insert_many(
+                [{"_id": coach, "days": days} for coach, days in rollup.items()]
+            )
+        return len(rollup)
+
+    async def compute_coach_summaries(self, coaches: Optional[list]) -> list:
+        wheel_match = {"status": "ACTIVE"}
+        checksheet_match = {}
+        if coaches is not None:
+            wheel_match["coach_number"] = {"$in": coaches}
+            checksheet_match["bogie_details.coach_number"] = {"$in": coaches}
+
+        conditions, cracked = {}, {}
+        wheel_rows = database.responses_collection.aggregate([
+            {"$match": wheel_match},
+            {"$group": {
+                "_id": {"coach": "$coach_number", "condition": "$condition"},
+                "count": {"$sum": 1},
+                "cracked": {"$sum": {"$cond": ["$cracks_detected", 1, 0]}},
+            }},
+        ], allowDiskUse=True)
+        async for row in wheel_rows:
+            coach = row["_id"]["coach"]
+            conditions.setdefault(coach, {})[row["_id"]["condition"]] = row["count"]
+            cracked[coach] = cracked.get(coach, 0) + row["cracked"]
+
+        # Newest inspection per coach, read off the coach_number_inspection_date_id index
+        latest = {}
+        checksheet_rows = database.forms_collection.aggregate([
+            {"$match": checksheet_match},
+            {"$sort": {"bogie_details.coach_number": 1, "bogie_details.inspection_date": -1}},
+            {"$group": {
+                "_id": "$bogie_details.coach_number",
+                "id": {"$first": "$_id"},
+                "bogie_number": {"$first": "$bogie_details.bogie_number"},
+                "inspection_date": {"$first": "$bogie_details.inspection_date"},
+                "overall_status": {"$first": "$overall_status"},
+            }},
+        ], allowDiskUse=True)
+        async for row in checksheet_rows:
+            coach = row.pop("_id")
+            row["id"] = str(row["id"])
+            latest[coach] = row
+
+        if coaches is None:
+            coaches = sorted(set(conditions) | set(latest))
+        return [
+            coach_summary(coach, conditions.get(coach, {}), cracked.get(coach, 0), latest.get(coach))
+            for coach in coaches
+        ]
+
+    async def refresh_coach_summaries(self, coaches):
+        summaries = await self.compute_coach_summaries(list(coaches))
+        if summaries:
+            await database.summary_collection.bulk_write([
+                ReplaceOne({"_id": summary.pop("coach_number")}, summary, upsert=True)
+                for summary in summaries
+            ], ordered=False)
+
+    # Writes racing the rebuild may be lost; run it when writes are quiet
+    async def rebuild_coach_summaries(self):
+        summaries = await self.compute_coach_summaries(None)
+        await database.summary_collection.delete_many({})
+        if summaries:
+            await database.summary_collection.insert_many(
+                [{"_id": summary.pop("coach_number"), **summary} for summary in summaries]
+            )
+        return len(summaries)
+
+    async def get_coach_summary(self, coach_number):
+        doc = await database.summary_collection.find_one({"_id": coach_number})
+        if doc is not None:
+            doc = {"coach_number": doc.pop("_id"), **doc}
+        return doc
+
+    def open_coach_stream(self, resume_token):
+        pipeline = [{"$match": {
+            "operationType": {"$in": ["insert", "update", "replace"]},
+            "ns.coll": {"$in": [database.responses_collection.name, database.forms_collection.name]},
+        }}]
+        return database.db.watch(
+            pipeline, full_document="updateLookup", resume_after=resume_token,
+            max_await_time_ms=COACH_SUMMARY_BATCH_MS
+        )
+
+    async def save_stream_token(self, token):
+        await database.stream_state_collection.update_one(
+            {"_id": COACH_STREAM},
+            {"$set": {"token": token, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    # Yields the writes seen since the last batch; when resuming, the resume
+    # token is saved once the consumer asks for the next batch, i.e. after it
+    # applied this one
+    async def watch_changes(self, resume=False):
+        if not resume:
+            async with self.open_coach_stream(None) as stream:
+                async for changes in self.change_batches(stream, save_token=False):
+                    yield changes
+            return
+        state = await database.stream_state_collection.find_one({"_id": COACH_STREAM})
+        token = state["token"] if state else None
+        try:
+            async with self.open_coach_stream(token) as stream:
+                async for changes in self.change_batches(stream):
+                    yield changes
+        except OperationFailure as e:
+            if token is None or e.code != CHANGE_STREAM_HISTORY_LOST:
+                raise
+            # Changes since the saved token are gone; start over from a full rebuild
+            logger.warning("Coach summary resume token expired; rebuilding all summaries")
+            async with self.open_coach_stream(None) as stream:
+                await self.rebuild_coach_summaries()
+                async for changes in self.change_batches(stream):
+                    yield changes
+
+    async def change_batches(self, stream, save_token=True):
+        yield []
+        saved_at = time.monotonic()
+        while stream.alive:
+            changes = []
+            for _ in range(STREAM_BATCH_EVENTS):
+                change = await stream.try_next()
+                if change is None:
+                    break
+                doc = change.get("fullDocument")
+                if doc is None:
+                    # Updated, then deleted before the lookup
+                    continue
+                doc["id"] = str(doc.pop("_id"))
+                if change["ns"]["coll"] == database.forms_collection.name:
+                    namespace = "checksheets"
+                else:
+                    namespace = "wheels"
+                    for field in SEARCH_FIELDS_PROJECTION:
+                        doc.pop(field, None)
+                changes.append((namespace, change["operationType"], doc))
+            # Empty batches too, so the consumer gets a turn on every poll
+            yield changes
+            if not save_token:
+                continue
+            if changes or time.monotonic() - saved_at > STREAM_TOKEN_SAVE_SECONDS:
+                await self.save_stream_token(stream.resume_token)
+                saved_at = time.monotonic()
+
+    # Leases share change_stream_state with the resume tokens:
+    # {"_id": name, "owner": ..., "expires_at": ...}
+    async def acquire_lease(self, name, owner, seconds):
+        now = datetime.utcnow()
+        try:
+            await database.stream_state_collection.update_one(
+                {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=seconds)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Held by another owner: the upsert collided with its document
+            return False
+        return True
+
+    async def release_lease(self, name, owner):
+        await database.stream_state_collection.delete_one({"_id": name, "owner": owner})
+
+    async def export_wheels(self, filters, fields, batch_size):
+        projection, hidden = wheel_projection(fields)
+        results = database.responses_collection.find(
+            wheel_query(filters), projection, batch_size=batch_size
+        )
+        try:
+            async for doc in results:
+                doc_id = doc.pop("_id")
+                if "_id" not in hidden:
+                    doc["id"] = doc_id
+                if "created_at" in hidden:
+                    doc.pop("created_at", None)
+                yield doc
+        finally:
+            await results.close()
+
+    async def wheel_stats(self, filters, group_by, limit):
+        query = wheel_query(filters)
+
+        async def run(with_percentiles: bool):
+            pipeline = [
+                {"$match": query},
+                {"$group": wear_stats_group(group_by, with_percentiles)},
+                {"$sort": {"_id": 1}},
+                {"$limit": limit},
+            ]
+            return await database.responses_collection.aggregate(pipeline).to_list(length=None)
+
+        # $percentile needs MongoDB 7.0; older servers get min/max/mean only
+        if self.percentiles:
+            try:
+                return await run(with_percentiles=True), True
+            except OperationFailure as e:
+                # The code is the primary signal; the message covers servers
+                # and proxies that report it under another code
+                if e.code != UNKNOWN_GROUP_OPERATOR and "group operator '$percentile'" not in str(e):
+                    raise
+                logger.info("MongoDB has no $percentile; wear statistics omit percentiles")
+                self.percentiles = False
+        return await run(with_percentiles=False), False
+
+    async def claim_idempotency_key(self, key, request_hash):
+        collection = database.idempotency_collection
+        now = datetime.utcnow()
+        record = {
+            "_id": key,
+            "request_hash": request_hash,
+            "status_code": None,
+            "body": None,
+            "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+        }
+        # The _id insert is the lock: exactly one concurrent request wins it
+        try:
+            await collection.insert_one(record)
+            return None
+        except DuplicateKeyError:
+            pass
+        # The TTL monitor runs about once a minute, so expired records can linger;
+        # a placeholder whose request died is taken over once its lock lapses
+        taken = await collection.find_one_and_replace(
+            {"_id": key, "$or": [
+                {"expires_at": {"$lte": now}},
+                {"status_code": None, "request_hash": request_hash, "locked_until": {"$lte": now}},
+            ]},
+            record
+        )
+        if taken is not None:
+            return None
+        existing = await collection.find_one({"_id": key})
+        if existing is None:
+            # Removed by the TTL monitor in between; one more insert settles it
+            try:
+                await collection.insert_one(record)
+                return None
+            except DuplicateKeyError:
+                existing = await collection.find_one({"_id": key})
+        return existing
+
+    async def complete_idempotency_key(self, key, status_code, body):
+        await database.idempotency_collection.update_one(
+            {"_id": key}, {"$set": {"status_code": status_code, "body": body}}
+        )
+
+    async def collection_version(self, namespace):
+        doc = await database.versions_collection.find_one({"_id": namespace})
+        return doc["version"] if doc else 0
+
+    async def bump_collection_version(self, namespace):
+        await database.versions_collection.update_one(
+            {"_id": namespace}, {"$inc": {"version": 1}}, upsert=True
+        )
+
+    async def release_idempotency_key(self, key):
+        await database.idempotency_collection.delete_one({"_id": key, "status_code": None})
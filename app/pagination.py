@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Keyset pagination helpers.
+# A cursor is the sort key of the last row on a page, base64url-encoded so clients
+# treat it as opaque. Pages are fetched with a range condition on (sort field, _id),
+# which an index on those two fields serves without skipping any documents.
+
+
+def encode_cursor(sort_value, doc_id) -> str:
+    if isinstance(sort_value, datetime):
+        payload = {"t": "date", "v": sort_value.isoformat()}
+    else:
+        payload = {"t": "raw", "v": sort_value}
+    payload["i"] = str(doc_id)
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = payload["v"]
+        if payload["t"] == "date":
+            value = datetime.fromisoformat(value)
+        return value, payload["i"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+
+
+def keyset_filter(field: str, cursor: str, direction: int = 1) -> dict:
+    value, doc_id = decode_cursor(cursor)
+    try:
+        doc_id = ObjectId(doc_id)
+    except InvalidId:
+        raise ValueError("Invalid pagination cursor")
+    op = "$gt" if direction == 1 else "$lt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: doc_id}},
+    ]}
@@ -0,0 +1,709 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Optional
+from sqlalchemy import Date, cast, delete, distinct, func, inspect, insert, or_, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import distinct_on, insert as pg_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.config import (
+    IDEMPOTENCY_LOCK_SECONDS,
+    IDEMPOTENCY_TTL_SECONDS,
+    POSTGRES_MAX_OVERFLOW,
+    POSTGRES_POOL_RECYCLE,
+    POSTGRES_POOL_SIZE,
+    POSTGRES_POOL_TIMEOUT,
+    POSTGRES_URL,
+    POSTGRES_WARMUP_CONNECTIONS,
+)
+from app.models import (
+    Base,
+    BogieChecksheet,
+    CoachSummary,
+    CollectionVersion,
+    IdempotencyKey,
+    InspectionDueRollup,
+    WheelSpecification,
+)
+from app.pagination import decode_cursor, encode_cursor
+from app.repository import (
+    WEAR_METRICS,
+    WEAR_PERCENTILES,
+    DuplicateWheelError,
+    Repository,
+    coach_summary,
+    due_increments,
+)
+from app.schemas import (
+    BmbcChecksheetSchema,
+    BogieChecksheetSchema,
+    BogieDetailsSchema,
+    ConditionEnum,
+    CountModeEnum,
+    MatchModeEnum,
+)
+from app.search import SEARCH_FIELDS
+
+# PostgreSQL storage over async SQLAlchemy + asyncpg.
+# Tables and indexes come from app/models.py. Checksheets are stored flat and
+# reshaped into the nested API document on read; ids are the integer primary keys
+# rendered as strings. Bulk wheel uploads are COPYed into a temp staging table and
+# moved over with one INSERT ... ON CONFLICT DO NOTHING.
+
+wheels = WheelSpecification.__table__
+checksheets = BogieChecksheet.__table__
+idempotency_keys = IdempotencyKey.__table__
+collection_versions = CollectionVersion.__table__
+due_rollup = InspectionDueRollup.__table__
+summaries = CoachSummary.__table__
+
+# Checksheet ids reserved from the sequence per round trip (write-behind mode)
+CHECKSHEET_ID_BLOCK = 100
+
+# Expired idempotency records are deleted at most this often
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = 300
+
+# Columns written on insert (id comes from the sequence)
+WHEEL_COLUMNS = tuple(column.name for column in wheels.columns if column.name != "id")
+
+# Checksheet sections of the nested API document
+CHECKSHEET_SECTIONS = {
+    "bogie_details": tuple(BogieDetailsSchema.model_fields),
+    "bogie_checksheet": tuple(BogieChecksheetSchema.model_fields),
+    "bmbc_checksheet": tuple(BmbcChecksheetSchema.model_fields),
+}
+
+
+def plain(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Helper function to build a text filter. Exact and prefix matches compare
+# lower(column), which the functional text_pattern_ops indexes serve.
+def match_clause(column, value: str, mode: MatchModeEnum):
+    if mode == MatchModeEnum.EXACT:
+        return func.lower(column) == value.lower()
+    if mode == MatchModeEnum.PREFIX:
+        return func.lower(column).like(escape_like(value.lower()) + "%", escape="\\")
+    return column.ilike(f"%{escape_like(value)}%", escape="\\")
+
+
+def wheel_conditions(filters: dict) -> list:
+    conditions = []
+    match = filters.get("match", MatchModeEnum.PREFIX)
+    for field in SEARCH_FIELDS:
+        if filters.get(field):
+            conditions.append(match_clause(wheels.c[field], filters[field], match))
+    for field in ("condition", "status"):
+        if filters.get(field):
+            conditions.append(wheels.c[field] == plain(filters[field]))
+    return conditions
+
+
+def checksheet_conditions(filters: dict) -> list:
+    conditions = []
+    for field in ("bogie_number", "coach_number", "inspector_name", "overall_status"):
+        if filters.get(field):
+            conditions.append(checksheets.c[field] == filters[field])
+    if filters.get("inspection_date_from"):
+        conditions.append(checksheets.c.inspection_date >= filters["inspection_date_from"])
+    if filters.get("inspection_date_to"):
+        conditions.append(checksheets.c.inspection_date <= filters["inspection_date_to"])
+    return conditions
+
+
+# Helper function to turn a keyset cursor into a row-value comparison on
+# (sort column, id), served by the composite index on those two columns
+def keyset_clause(sort_column, id_column, cursor: str, direction: int = 1):
+    value, row_id = decode_cursor(cursor)
+    try:
+        row_id = int(row_id)
+    except ValueError:
+        raise ValueError("Invalid pagination cursor")
+    key = tuple_(sort_column, id_column)
+    return key > tuple_(value, row_id) if direction == 1 else key < tuple_(value, row_id)
+
+
+# Helper function to pick the wheel columns for a requested field list.
+# id and created_at are always selected for the keyset cursor; the returned set
+# lists the ones to drop from the output.
+def wheel_columns(fields: Optional[list]):
+    if not fields:
+        return list(wheels.columns), set()
+    hidden = {key for key in ("id", "created_at") if key not in fields}
+    return [wheels.c[name] for name in (*fields, *sorted(hidden))], hidden
+
+
+def wheel_doc(row, hidden: set = frozenset()) -> dict:
+    doc = dict(row)
+    if "id" in hidden:
+        doc.pop("id")
+    else:
+        doc["id"] = str(doc["id"])
+    if "created_at" in hidden:
+        doc.pop("created_at")
+    return doc
+
+
+def checksheet_row(data: dict) -> dict:
+    row = {
+        "remarks": data.get("remarks"),
+        "overall_status": data.get("overall_status"),
+        "created_at": data.get("created_at"),
+    }
+    for section, fields in CHECKSHEET_SECTIONS.items():
+        for field in fields:
+            row[field] = plain(data[section].get(field))
+    return row
+
+
+def checksheet_doc(row) -> dict:
+    doc = {"id": str(row["id"])}
+    for section, fields in CHECKSHEET_SECTIONS.items():
+        doc[section] = {field: row[field] for field in fields}
+    doc["remarks"] = row["remarks"]
+    doc["overall_status"] = row["overall_status"]
+    doc["created_at"] = row["created_at"]
+    return doc
+
+
+# Upsert adding wheels to the inspection-due rollup
+def due_rollup_upsert(increments: dict):
+    statement = pg_insert(due_rollup).values([
+        {"coach_number": coach, "due_date": day, "wheel_count": count}
+        for (coach, day), count in increments.items()
+    ])
+    return statement.on_conflict_do_update(
+        index_elements=[due_rollup.c.coach_number, due_rollup.c.due_date],
+        set_={"wheel_count": due_rollup.c.wheel_count + statement.excluded.wheel_count},
+    )
+
+
+# Helper functions to map a coach summary to its flat row and back
+def summary_row(summary: dict) -> dict:
+    latest = summary["latest_checksheet"] or {}
+    return {
+        "coach_number": summary["coach_number"],
+        "wheel_count": summary["wheel_count"],
+        "condition_counts": summary["condition_counts"],
+        "worst_condition": summary["worst_condition"],
+        "cracked_wheels": summary["cracked_wheels"],
+        "latest_checksheet_id": int(latest["id"]) if latest else None,
+        "latest_bogie_number": latest.get("bogie_number"),
+        "latest_inspection_date": latest.get("inspection_date"),
+        "latest_overall_status": latest.get("overall_status"),
+        "updated_at": summary["updated_at"],
+    }
+
+
+def summary_doc(row) -> dict:
+    latest = None
+    if row["latest_checksheet_id"] is not None:
+        latest = {
+            "id": str(row["latest_checksheet_id"]),
+            "bogie_number": row["latest_bogie_number"],
+            "inspection_date": row["latest_inspection_date"],
+            "overall_status": row["latest_overall_status"],
+        }
+    return {
+        "coach_number": row["coach_number"],
+        "wheel_count": row["wheel_count"],
+        "condition_counts": row["condition_counts"],
+        "worst_condition": row["worst_condition"],
+        "cracked_wheels": row["cracked_wheels"],
+        "any_cracks": row["cracked_wheels"] > 0,
+        "latest_checksheet": latest,
+        "updated_at": row["updated_at"],
+    }
+
+
+# Index names per table, excluding indexes that back unique/primary constraints
+def existing_indexes(sync_conn) -> dict:
+    inspector = inspect(sync_conn)
+    indexes = {}
+    for table in Base.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            indexes[table.name] = {
+                index["name"] for index in inspector.get_indexes(table.name)
+                if not index.get("duplicates_constraint")
+            }
+        else:
+            indexes[table.name] = set()
+    return indexes
+
+
+class PostgresRepository(Repository):
+    name = "postgres"
+    label = "PostgreSQL"
+    errors = (SQLAlchemyError, OSError)
+
+    def __init__(self):
+        self.engine = None
+        self.idempotency_purged_at = 0.0
+        self.checksheet_ids = deque()
+        self.checksheet_ids_lock = asyncio.Lock()
+
+    async def connect(self):
+        self.engine = create_async_engine(
+            POSTGRES_URL,
+            pool_size=POSTGRES_POOL_SIZE,
+            max_overflow=POSTGRES_MAX_OVERFLOW,
+            pool_timeout=POSTGRES_POOL_TIMEOUT,
+            pool_recycle=POSTGRES_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+
+    # Open pooled connections up front so the first requests skip the handshake
+    async def warm_up(self):
+        async def ping():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        await asyncio.gather(*(ping() for _ in range(POSTGRES_WARMUP_CONNECTIONS)))
+
+    async def close(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    # create_all only adds missing tables and indexes; changed definitions are
+    # left for migrations, so repair has nothing to do here
+    async def ensure_indexes(self, repair: bool = False) -> dict:
+        async with self.engine.begin() as conn:
+            before = await conn.run_sync(existing_indexes)
+            await conn.run_sync(Base.metadata.create_all)
+            after = await conn.run_sync(existing_indexes)
+        report = {}
+        for table in Base.metadata.sorted_tables:
+            declared = {index.name for index in table.indexes}
+            report[table.name] = {
+                "created": sorted(after[table.name] - before[table.name]),
+                "drifted": [],
+                "repaired": [],
+                "unmanaged": sorted(after[table.name] - declared),
+                "errors": [],
+            }
+        return report
+
+    def pool_stats(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None
+        return {
+            "pool_size": POSTGRES_POOL_SIZE,
+            "max_overflow": POSTGRES_MAX_OVERFLOW,
+            "connections_open": pool.checkedin() + pool.checkedout() if pool else 0,
+            "checked_out": pool.checkedout() if pool else 0,
+            "overflow": max(pool.overflow(), 0) if pool else 0,
+        }
+
+    async def fetch_all(self, statement) -> list:
+        async with self.engine.connect() as conn:
+            return (await conn.execute(statement)).mappings().all()
+
+    async def fetch_scalar(self, statement):
+        async with self.engine.connect() as conn:
+            return (await conn.execute(statement)).scalar()
+
+    # Planner row estimate from pg_class; -1 until the table is first analyzed
+    async def estimated_rows(self, table) -> int:
+        estimate = await self.fetch_scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:name AS regclass)")
+            .bindparams(name=table.name)
+        )
+        if estimate is None or estimate < 0:
+            return await self.fetch_scalar(select(func.count()).select_from(table))
+        return estimate
+
+    async def count(self, namespace: str, table, filters: dict, conditions: list, mode: CountModeEnum):
+        exact = select(func.count()).select_from(table).where(*conditions)
+        if mode == CountModeEnum.ESTIMATED:
+            return await self.estimate_count(
+                namespace, filters, lambda: self.fetch_scalar(exact), lambda: self.estimated_rows(table)
+            )
+        return await self.fetch_scalar(exact)
+
+    async def create_checksheet(self, data: dict) -> str:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                insert(checksheets).values(**checksheet_row(data)).returning(checksheets.c.id)
+            )
+            return str(result.scalar_one())
+
+    async def new_checksheet_id(self) -> str:
+        async with self.checksheet_ids_lock:
+            if not self.checksheet_ids:
+                rows = await self.fetch_all(
+                    text(
+                        "SELECT nextval(pg_get_serial_sequence('bogie_checksheets', 'id')) AS id "
+                        "FROM generate_series(1, :n)"
+                    ).bindparams(n=CHECKSHEET_ID_BLOCK)
+                )
+                self.checksheet_ids.extend(row["id"] for row in rows)
+            return str(self.checksheet_ids.popleft())
+
+    async def insert_checksheets(self, docs: list):
+        rows = [{"id": int(doc["id"]), **checksheet_row(doc)} for doc in docs]
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                pg_insert(checksheets).values(rows).on_conflict_do_nothing(index_elements=["id"])
+            )
+
+    async def get_checksheet(self, checksheet_id: str) -> Optional[dict]:
+        try:
+            row_id = int(checksheet_id)
+        except ValueError:
+            raise ValueError("Invalid checksheet id")
+        rows = await self.fetch_all(select(checksheets).where(checksheets.c.id == row_id))
+        return checksheet_doc(rows[0]) if rows else None
+
+    async def list_checksheets(self, filters, *, latest_per_bogie, limit, offset, cursor, count):
+        c = checksheets.c
+        conditions = checksheet_conditions(filters)
+        if latest_per_bogie:
+            # DISTINCT ON keeps the first row per bogie: its newest inspection
+            statement = (
+                select(checksheets).where(*conditions)
+                .ext(distinct_on(c.bogie_number))
+                .order_by(c.bogie_number, c.inspection_date.desc(), c.id.desc())
+            )
+        else:
+            page_conditions = list(conditions)
+            if cursor:
+                page_conditions.append(keyset_clause(c.inspection_date, c.id, cursor, direction=-1))
+            statement = (
+                select(checksheets).where(*page_conditions)
+                .order_by(c.inspection_date.desc(), c.id.desc())
+            )
+        statement = statement.offset(offset).limit(limit)
+
+        async def fetch_page():
+            rows = await self.fetch_all(statement)
+            next_cursor = None
+            if rows and len(rows) == limit and not latest_per_bogie:
+                next_cursor = encode_cursor(rows[-1]["inspection_date"], rows[-1]["id"])
+            return [checksheet_doc(row) for row in rows], next_cursor
+
+        if count == CountModeEnum.NONE:
+            page, next_cursor = await fetch_page()
+            return page, next_cursor, None
+        if latest_per_bogie:
+            counter = self.fetch_scalar(select(func.count(distinct(c.bogie_number))).where(*conditions))
+        else:
+            counter = self.count("checksheets", checksheets, filters, conditions, count)
+        (page, next_cursor), total = await asyncio.gather(fetch_page(), counter)
+        return page, next_cursor, total
+
+    async def create_wheel(self, doc: dict) -> str:
+        values = {column: plain(doc.get(column)) for column in WHEEL_COLUMNS}
+        try:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(insert(wheels).values(**values).returning(wheels.c.id))
+                increments = due_increments([values])
+                if increments:
+                    await conn.execute(due_rollup_upsert(increments))
+                return str(result.scalar_one())
+        except IntegrityError:
+            # wheel_number is the only constraint the validated payload can violate
+            raise DuplicateWheelError(doc["wheel_number"])
+
+    async def insert_wheels(self, docs: list, ordered: bool):
+        columns = ", ".join(WHEEL_COLUMNS)
+        records = [
+            (*(plain(doc.get(column)) for column in WHEEL_COLUMNS), position)
+            for position, doc in enumerate(docs)
+        ]
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            async with driver.transaction():
+                await driver.execute(
+                    f"CREATE TEMP TABLE wheel_staging ON COMMIT DROP AS "
+                    f"SELECT {columns} FROM wheel_specifications WITH NO DATA"
+                )
+                await driver.execute("ALTER TABLE wheel_staging ADD COLUMN upload_position integer")
+                await driver.copy_records_to_table(
+                    "wheel_staging", records=records, columns=[*WHEEL_COLUMNS, "upload_position"]
+                )
+                # Ordered uploads stop at the first wheel number that is already stored
+                first_duplicate = None
+                if ordered:
+                    first_duplicate = await driver.fetchval(
+                        "SELECT min(s.upload_position) FROM wheel_staging s "
+                        "JOIN wheel_specifications w USING (wheel_number)"
+                    )
+                last = len(docs) if first_duplicate is None else first_duplicate
+                # The inserted rows feed the inspection-due rollup in the same statement
+                rows = await driver.fetch(
+                    f"WITH inserted AS ("
+                    f"INSERT INTO wheel_specifications ({columns}) "
+                    f"SELECT {columns} FROM wheel_staging WHERE upload_position < $1 ORDER BY upload_position "
+                    f"ON CONFLICT (wheel_number) DO NOTHING "
+                    f"RETURNING id, wheel_number, coach_number, status, next_inspection_due"
+                    f"), rollup AS ("
+                    f"INSERT INTO inspection_due_rollup (coach_number, due_date, wheel_count) "
+                    f"SELECT coach_number, next_inspection_due::date, count(*) FROM inserted "
+                    f"WHERE status = 'ACTIVE' AND next_inspection_due IS NOT NULL GROUP BY 1, 2 "
+                    f"ON CONFLICT (coach_number, due_date) "
+                    f"DO UPDATE SET wheel_count = inspection_due_rollup.wheel_count + EXCLUDED.wheel_count"
+                    f") SELECT id, wheel_number FROM inserted",
+                    last
+                )
+
+        inserted = {row["wheel_number"]: str(row["id"]) for row in rows}
+        created, failed = {}, {}
+        for position, doc in enumerate(docs[:last]):
+            if doc["wheel_number"] in inserted:
+                created[position] = inserted[doc["wheel_number"]]
+            else:
+                failed[position] = ("duplicate", "Wheel number already exists")
+        if first_duplicate is not None:
+            failed[first_duplicate] = ("duplicate", "Wheel number already exists")
+        return created, failed
+
+    async def list_wheels(self, filters, *, fields, limit, offset, cursor, count):
+        c = wheels.c
+        columns, hidden = wheel_columns(fields)
+        conditions = wheel_conditions(filters)
+        page_conditions = list(conditions)
+        if cursor:
+            page_conditions.append(keyset_clause(c.created_at, c.id, cursor))
+        statement = (
+            select(*columns).where(*page_conditions)
+            .order_by(c.created_at, c.id).offset(offset).limit(limit)
+        )
+
+        async def fetch_page():
+            rows = await self.fetch_all(statement)
+            next_cursor = None
+            if rows and len(rows) == limit:
+                next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+            return [wheel_doc(row, hidden) for row in rows], next_cursor
+
+        if count == CountModeEnum.NONE:
+            page, next_cursor = await fetch_page()
+            return page, next_cursor, None
+        (page, next_cursor), total = await asyncio.gather(
+            fetch_page(), self.count("wheels", wheels, filters, conditions, count)
+        )
+        return page, next_cursor, total
+
+    async def lookup_wheels(self, field, values):
+        c = wheels.c
+        rows = await self.fetch_all(
+            select(wheels).where(c[field].in_(values)).order_by(c[field], c.wheel_number)
+        )
+        return [wheel_doc(row) for row in rows]
+
+    async def list_due_wheels(self, due_before, coach_number, *, limit, cursor):
+        c = wheels.c
+        # status and the range match the partial *_due_active indexes
+        conditions = [c.status == "ACTIVE", c.next_inspection_due <= due_before]
+        if coach_number:
+            conditions.append(c.coach_number == coach_number)
+        if cursor:
+            conditions.append(keyset_clause(c.next_inspection_due, c.id, cursor))
+        rows = await self.fetch_all(
+            select(wheels).where(*conditions).order_by(c.next_inspection_due, c.id).limit(limit)
+        )
+        next_cursor = None
+        if rows and len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1]["next_inspection_due"], rows[-1]["id"])
+        return [wheel_doc(row) for row in rows], next_cursor
+
+    async def due_rollup(self, coach_number):
+        c = due_rollup.c
+        statement = select(due_rollup).where(c.wheel_count > 0).order_by(c.coach_number, c.due_date)
+        if coach_number:
+            statement = statement.where(c.coach_number == coach_number)
+        rollup = {}
+        for row in await self.fetch_all(statement):
+            rollup.setdefault(row["coach_number"], {})[row["due_date"]] = row["wheel_count"]
+        return rollup
+
+    async def rebuild_due_rollup(self):
+        c = wheels.c
+        due_date = cast(c.next_inspection_due, Date)
+        recount = (
+            select(c.coach_number, due_date, func.count())
+            .where(c.status == "ACTIVE", c.next_inspection_due.is_not(None))
+            .group_by(c.coach_number, due_date)
+        )
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(due_rollup))
+            await conn.execute(
+                insert(due_rollup).from_select(["coach_number", "due_date", "wheel_count"], recount)
+            )
+            return await conn.scalar(select(func.count(distinct(due_rollup.c.coach_number))))
+
+    async def compute_coach_summaries(self, conn, coaches: Optional[list]) -> list:
+        c = wheels.c
+        wheel_counts = (
+            select(
+                c.coach_number, c.condition, func.count().label("count"),
+                func.count().filter(c.cracks_detected.is_(True)).label("cracked"),
+            )
+            .where(c.status == "ACTIVE")
+            .group_by(c.coach_number, c.condition)
+        )
+        # Newest inspection per coach (DISTINCT ON over the coach/date index)
+        k = checksheets.c
+        latest_checksheets = (
+            select(k.coach_number, k.id, k.bogie_number, k.inspection_date, k.overall_status)
+            .ext(distinct_on(k.coach_number))
+            .order_by(k.coach_number, k.inspection_date.desc(), k.id.desc())
+        )
+        if coaches is not None:
+            wheel_counts = wheel_counts.where(c.coach_number.in_(coaches))
+            latest_checksheets = latest_checksheets.where(k.coach_number.in_(coaches))
+
+        conditions, cracked = {}, {}
+        for row in (await conn.execute(wheel_counts)).mappings():
+            conditions.setdefault(row["coach_number"], {})[row["condition"]] = row["count"]
+            cracked[row["coach_number"]] = cracked.get(row["coach_number"], 0) + row["cracked"]
+        latest = {}
+        for row in (await conn.execute(latest_checksheets)).mappings():
+            latest[row["coach_number"]] = {
+                "id": str(row["id"]),
+                "bogie_number": row["bogie_number"],
+                "inspection_date": row["inspection_date"],
+                "overall_status": row["overall_status"],
+            }
+
+        if coaches is None:
+            coaches = sorted(set(conditions) | set(latest))
+        return [
+            coach_summary(coach, conditions.get(coach, {}), cracked.get(coach, 0), latest.get(coach))
+            for coach in coaches
+        ]
+
+    async def refresh_coach_summaries(self, coaches):
+        async with self.engine.begin() as conn:
+            rows = [summary_row(s) for s in await self.compute_coach_summaries(conn, list(coaches))]
+            if rows:
+                statement = pg_insert(summaries).values(rows)
+                await conn.execute(statement.on_conflict_do_update(
+                    index_elements=[summaries.c.coach_number],
+                    set_={name: statement.excluded[name] for name in rows[0] if name != "coach_number"},
+                ))
+
+    async def rebuild_coach_summaries(self):
+        async with self.engine.begin() as conn:
+            rows = [summary_row(s) for s in await self.compute_coach_summaries(conn, None)]
+            await conn.execute(delete(summaries))
+            if rows:
+                await conn.execute(insert(summaries), rows)
+        return len(rows)
+
+    async def get_coach_summary(self, coach_number):
+        rows = await self.fetch_all(select(summaries).where(summaries.c.coach_number == coach_number))
+        return summary_doc(rows[0]) if rows else None
+
+    async def export_wheels(self, filters, fields, batch_size):
+        columns, hidden = wheel_columns(fields)
+        statement = (
+            select(*columns).where(*wheel_conditions(filters))
+            .execution_options(yield_per=batch_size)
+        )
+        # Server-side cursor: one batch of rows is held in memory at a time
+        async with self.engine.connect() as conn:
+            result = await conn.stream(statement)
+            try:
+                async for row in result.mappings():
+                    yield wheel_doc(row, hidden)
+            finally:
+                await result.close()
+
+    async def wheel_stats(self, filters, group_by, limit):
+        c = wheels.c
+        group_column = c[group_by.value]
+        selected = [group_column.label("_id"), func.count().label("count")]
+        for metric in WEAR_METRICS:
+            column = c[metric]
+            selected += [
+                func.min(column).label(f"{metric}_min"),
+                func.max(column).label(f"{metric}_max"),
+                func.avg(column).label(f"{metric}_mean"),
+            ]
+            selected += [
+                func.percentile_cont(p).within_group(column).label(f"{metric}_p{i}")
+                for i, p in enumerate(WEAR_PERCENTILES)
+            ]
+        for position, condition in enumerate(ConditionEnum):
+            selected.append(
+                func.count().filter(c.condition == condition.value).label(f"condition_{position}")
+            )
+        statement = (
+            select(*selected).where(*wheel_conditions(filters))
+            .group_by(group_column).order_by(group_column).limit(limit)
+        )
+        rows = []
+        for row in await self.fetch_all(statement):
+            row = dict(row)
+            for metric in WEAR_METRICS:
+                row[f"{metric}_pct"] = [row.pop(f"{metric}_p{i}") for i in range(len(WEAR_PERCENTILES))]
+            rows.append(row)
+        return rows, True
+
+    async def claim_idempotency_key(self, key, request_hash):
+        now = datetime.utcnow()
+        record = {
+            "key": key,
+            "request_hash": request_hash,
+            "status_code": None,
+            "body": None,
+            "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+        }
+        c = idempotency_keys.c
+        # Insert, or take over an expired record or a placeholder whose request
+        # died; RETURNING yields a row only when this request now owns the key
+        statement = pg_insert(idempotency_keys).values(**record)
+        statement = statement.on_conflict_do_update(
+            index_elements=[c.key],
+            set_={name: statement.excluded[name] for name in record if name != "key"},
+            where=or_(
+                c.expires_at <= now,
+                (c.status_code.is_(None)) & (c.request_hash == request_hash) & (c.locked_until <= now),
+            ),
+        ).returning(c.key)
+        async with self.engine.begin() as conn:
+            if time.monotonic() - self.idempotency_purged_at > IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+                self.idempotency_purged_at = time.monotonic()
+                await conn.execute(delete(idempotency_keys).where(c.expires_at <= now))
+            if (await conn.execute(statement)).first() is not None:
+                return None
+            row = (await conn.execute(select(idempotency_keys).where(c.key == key))).mappings().first()
+        return dict(row) if row else None
+
+    async def complete_idempotency_key(self, key, status_code, body):
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                update(idempotency_keys).where(idempotency_keys.c.key == key)
+                .values(status_code=status_code, body=body)
+            )
+
+    async def collection_version(self, namespace):
+        version = await self.fetch_scalar(
+            select(collection_versions.c.version).where(collection_versions.c.name == namespace)
+        )
+        return version or 0
+
+    async def bump_collection_version(self, namespace):
+        statement = pg_insert(collection_versions).values(name=namespace, version=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=[collection_versions.c.name],
+            set_={"version": collection_versions.c.version + 1},
+        )
+        async with self.engine.begin() as conn:
+            await conn.execute(statement)
+
+    async def release_idempotency_key(self, key):
+        c = idempotency_keys.c
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(idempotency_keys).where(c.key == key, c.status_code.is_(None)))
@@ -0,0 +1,238 @@
+from datetime import date, datetime
+from typing import AsyncIterator, Optional
+from app.cache import TTLCache, filter_key
+from app.config import COUNT_CACHE_MAX_ENTRIES, COUNT_CACHE_TTL_SECONDS, STORAGE_BACKEND
+from app.schemas import CountModeEnum, StatsGroupEnum
+
+# Storage abstraction used by the routes.
+# Routes pass backend-neutral filters (plain dicts built from query parameters)
+# and get back documents in the API shape: "id" plus the stored fields, with
+# checksheets nested as bogie_details / bogie_checksheet / bmbc_checksheet.
+# STORAGE_BACKEND picks MongoDB (Motor) or PostgreSQL (async SQLAlchemy + asyncpg).
+
+
+class DuplicateWheelError(Exception):
+    pass
+
+
+# Measurements summarised by the wheel stats endpoint
+WEAR_METRICS = ("wheel_diameter", "rim_thickness", "flange_thickness")
+WEAR_PERCENTILES = (0.5, 0.9, 0.95)
+
+# Rollup increments for newly written wheels: {(coach_number, due date): wheels}.
+# Only ACTIVE wheels with a due date are scheduled, matching the due indexes.
+def due_increments(docs) -> dict:
+    increments = {}
+    for doc in docs:
+        due = doc.get("next_inspection_due")
+        if doc.get("status") != "ACTIVE" or due is None:
+            continue
+        key = (doc["coach_number"], due.date())
+        increments[key] = increments.get(key, 0) + 1
+    return increments
+
+
+# Namespaces with a write counter (collection_version). Anything that loads
+# data outside the API must bump both, or clients keep stale ETags.
+NAMESPACES = ("wheels", "checksheets")
+
+
+# Coach a written wheel ("wheels") or checksheet ("checksheets") belongs to
+def coach_number_of(namespace: str, doc: dict) -> Optional[str]:
+    if namespace == "checksheets":
+        return (doc.get("bogie_details") or {}).get("coach_number")
+    return doc.get("coach_number")
+
+
+# Wheel conditions from least to most severe, for a coach summary's worst_condition
+CONDITION_SEVERITY = ("GOOD", "WORN", "WORN OUT", "DAMAGED", "CRACKED")
+
+
+# Helper function to assemble a coach summary from its ACTIVE wheels'
+# {condition: count}, cracked wheel count and latest checksheet (or None)
+def coach_summary(coach_number: str, condition_counts: dict, cracked_wheels: int, latest_checksheet) -> dict:
+    wheel_count = sum(condition_counts.values())
+    # Wheels stored without a condition count towards wheel_count only
+    condition_counts = {condition: count for condition, count in condition_counts.items() if condition}
+    present = [condition for condition, count in condition_counts.items() if count]
+    worst = max(
+        present,
+        key=lambda c: CONDITION_SEVERITY.index(c) if c in CONDITION_SEVERITY else -1,
+        default=None
+    )
+    return {
+        "coach_number": coach_number,
+        "wheel_count": wheel_count,
+        "condition_counts": condition_counts,
+        "worst_condition": worst,
+        "cracked_wheels": cracked_wheels,
+        "any_cracks": cracked_wheels > 0,
+        "latest_checksheet": latest_checksheet,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+# Filtered listing counts served for ?count=estimated
+count_cache = TTLCache(COUNT_CACHE_TTL_SECONDS, COUNT_CACHE_MAX_ENTRIES)
+
+
+class Repository:
+    name = ""
+    label = ""
+    # Connection-level errors the lifespan logs instead of failing startup
+    errors = ()
+
+    async def connect(self):
+        raise NotImplementedError
+
+    async def warm_up(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def ensure_indexes(self, repair: bool = False) -> dict:
+        raise NotImplementedError
+
+    def pool_stats(self) -> dict:
+        raise NotImplementedError
+
+    async def create_checksheet(self, data: dict) -> str:
+        raise NotImplementedError
+
+    # Id for a checksheet written later through insert_checksheets
+    async def new_checksheet_id(self) -> str:
+        raise NotImplementedError
+
+    # Writes checksheets carrying ids from new_checksheet_id; ids already stored
+    # are skipped, so a failed batch can be retried as a whole
+    async def insert_checksheets(self, docs: list):
+        raise NotImplementedError
+
+    # Raises ValueError for ids the backend cannot parse
+    async def get_checksheet(self, checksheet_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    # Returns (checksheets, next_cursor, total)
+    async def list_checksheets(
+        self, filters: dict, *, latest_per_bogie: bool, limit: int, offset: int,
+        cursor: Optional[str], count: CountModeEnum
+    ):
+        raise NotImplementedError
+
+    # Raises DuplicateWheelError when wheel_number is taken
+    async def create_wheel(self, doc: dict) -> str:
+        raise NotImplementedError
+
+    # Returns ({position: id} for inserted docs, {position: (status, error)} for
+    # rejected ones). In ordered mode nothing after the first rejection is written.
+    async def insert_wheels(self, docs: list, ordered: bool):
+        raise NotImplementedError
+
+    # Returns (wheels, next_cursor, total); fields=None returns every field
+    async def list_wheels(
+        self, filters: dict, *, fields: Optional[list], limit: int, offset: int,
+        cursor: Optional[str], count: CountModeEnum
+    ):
+        raise NotImplementedError
+
+    def export_wheels(self, filters: dict, fields: Optional[list], batch_size: int) -> AsyncIterator[dict]:
+        raise NotImplementedError
+
+    # Wheels whose field ("wheel_number" or "axle_number") exactly equals one of values
+    async def lookup_wheels(self, field: str, values: list) -> list:
+        raise NotImplementedError
+
+    # ACTIVE wheels due on or before due_before, earliest first, as (wheels, next_cursor)
+    async def list_due_wheels(
+        self, due_before: datetime, coach_number: Optional[str], *, limit: int, cursor: Optional[str]
+    ):
+        raise NotImplementedError
+
+    # Inspection-due rollup as {coach_number: {due date: wheels}}. create_wheel and
+    # insert_wheels keep it current; rebuild_due_rollup recomputes it from the
+    # wheels (e.g. after loading data outside the API) and returns the coach count.
+    async def due_rollup(self, coach_number: Optional[str]) -> dict[str, dict[date, int]]:
+        raise NotImplementedError
+
+    async def rebuild_due_rollup(self) -> int:
+        raise NotImplementedError
+
+    # Coach summaries (see coach_summary) are stored per coach and recomputed
+    # from its wheels and checksheets, so refreshing a coach twice is harmless
+    async def refresh_coach_summaries(self, coaches: list):
+        raise NotImplementedError
+
+    # Recompute every summary; returns the coach count
+    async def rebuild_coach_summaries(self) -> int:
+        raise NotImplementedError
+
+    async def get_coach_summary(self, coach_number: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    # Batches of wheel and checksheet writes from any process, as
+    # (namespace, operation, doc) with doc in the API shape, starting with an
+    # empty batch once the feed is open and then one batch (maybe empty) per
+    # poll. With resume, the feed continues from the position saved by the
+    # previous resuming reader and saves its own; without, it starts at the
+    # present and saves nothing. Backends without a change feed raise
+    # NotImplementedError and rely on write hooks instead.
+    def watch_changes(self, resume: bool = False) -> AsyncIterator[list]:
+        raise NotImplementedError
+
+    # Time-limited lease shared by all workers: True when owner now holds name
+    # for the next seconds (a fresh claim, or a renewal of its own lease)
+    async def acquire_lease(self, name: str, owner: str, seconds: float) -> bool:
+        raise NotImplementedError
+
+    async def release_lease(self, name: str, owner: str):
+        raise NotImplementedError
+
+    # Returns (rows, percentiles_available); rows use the keys read by format_wear_stats
+    async def wheel_stats(self, filters: dict, group_by: StatsGroupEnum, limit: int):
+        raise NotImplementedError
+
+    # Write counter per namespace ("wheels", "checksheets"); 0 before the first bump
+    async def collection_version(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    async def bump_collection_version(self, namespace: str):
+        raise NotImplementedError
+
+    # Idempotency records are keyed "<scope>:<Idempotency-Key>". claim returns None
+    # when the caller now owns the key (new, expired, or abandoned by a request
+    # that never finished), otherwise the stored record: request_hash, status_code
+    # (None while in progress) and body.
+    async def claim_idempotency_key(self, key: str, request_hash: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def complete_idempotency_key(self, key: str, status_code: int, body: str):
+        raise NotImplementedError
+
+    async def release_idempotency_key(self, key: str):
+        raise NotImplementedError
+
+    # Cheap listing count: table/collection metadata when unfiltered, otherwise
+    # an exact count cached for COUNT_CACHE_TTL_SECONDS per filter
+    async def estimate_count(self, namespace: str, filters: dict, count_exact, count_all):
+        if not filters:
+            return await count_all()
+        key = f"{self.name}:{namespace}:{filter_key(filters)}"
+        total = count_cache.get(key)
+        if total is None:
+            total = await count_exact()
+            count_cache.set(key, total)
+        return total
+
+
+def create_repository(backend: str) -> Repository:
+    if backend == "postgres":
+        from app.postgres_repository import PostgresRepository
+        return PostgresRepository()
+    if backend == "mongo":
+        from app.mongo_repository import MongoRepository
+        return MongoRepository()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+repository = create_repository(STORAGE_BACKEND)
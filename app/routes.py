@@ -1,78 +1,661 @@
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import csv
+import io
+import json
+import logging
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from typing import List, Optional
-from bson import ObjectId
-from datetime import datetime
-from app.database import forms_collection, responses_collection
+from datetime import date, datetime, timedelta
+from enum import Enum
+from app.cache import (
+    coach_query_tags,
+    coach_write_tags,
+    create_query_cache,
+    query_key,
+)
+from app.config import (
+    BULK_CHUNK_SIZE,
+    BULK_MAX_ITEMS,
+    EXPORT_BATCH_SIZE,
+    LOOKUP_MAX_ITEMS,
+    QUERY_CACHE_BACKEND,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_TTL_SECONDS,
+    REDIS_URL,
+)
+from app.events import Broadcaster, SubscriberLimitReached
+from app.etag import etag_matches, make_etag, not_modified
+from app.idempotency import IDEMPOTENCY_HEADER, request_hash, run_idempotent
+from app.ingest import ChecksheetWriter
+from app.repository import (
+    WEAR_METRICS,
+    WEAR_PERCENTILES,
+    DuplicateWheelError,
+    coach_number_of,
+    count_cache,
+    repository,
+)
+from app.serialization import BSONResponse, dumps
+from app.singleflight import SingleFlight
+from app.summary import CoachSummaryWorker
 from app.schemas import (
     BogieChecksheetCreate, 
     WheelSpecificationCreate,
+    WheelLookupRequest,
     APIResponse,
     PaginatedResponse,
+    WheelSpecificationResponse,
     ConditionEnum,
+    CountModeEnum,
+    EventTypeEnum,
+    ExportFormatEnum,
+    MatchModeEnum,
+    StatsGroupEnum,
     StatusEnum
 )
 
 router = APIRouter()
 
-# Helper function to convert ObjectId to string
-def obj_id_str(data):
-    data["id"] = str(data["_id"])
-    del data["_id"]
-    return data
+logger = logging.getLogger(__name__)
+
+# Listing pages, invalidated by coach number on writes
+query_cache = create_query_cache(
+    QUERY_CACHE_BACKEND, QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_MAX_ENTRIES, REDIS_URL
+)
+
+# Identical listing requests that miss the cache at the same time share one query
+listing_flights = SingleFlight()
+
+
+# Live inspection feed (GET /api/api/events/inspections), one per worker
+inspection_events = Broadcaster()
+
+# Coach summaries; the lifespan starts the change-stream follower when available.
+# New wheels and checksheets are relayed to the live feed from the same source.
+coach_summaries = CoachSummaryWorker(on_insert=inspection_events.publish)
+
+
+# Helper function run after every write with the created documents (each with
+# its "id"): drop cached listings that may include the touched coaches, move the
+# namespace's ETag version on, and refresh the coach summaries and publish the
+# documents when no change stream is doing so. The write has already succeeded,
+# so each step is best-effort: failures are logged and never turn the response
+# into an error (which would also release an Idempotency-Key for a stored write).
+async def record_writes(namespace: str, docs: list):
+    tags = set()
+    for doc in docs:
+        tags.update(coach_write_tags(namespace, coach_number_of(namespace, doc)))
+    if not tags:
+        return
+    for step, update in (
+        ("listing cache invalidation", lambda: query_cache.invalidate_tags(tuple(tags))),
+        ("collection version bump", lambda: repository.bump_collection_version(namespace)),
+        ("coach summary update", lambda: coach_summaries.written(namespace, docs)),
+    ):
+        try:
+            await update()
+        except Exception as e:
+            logger.error("%s failed after writing %d %s: %s", step.capitalize(), len(docs), namespace, e)
+
+
+# Queued checksheets reach the listings once written, so caches and ETags are
+# updated after each flush rather than at submission
+async def invalidate_flushed_checksheets(batch: list):
+    await record_writes("checksheets", batch)
+
+
+# Write-behind checksheet queue; started by the lifespan when CHECKSHEET_WRITE_BEHIND is on
+checksheet_writer = ChecksheetWriter(on_flush=invalidate_flushed_checksheets)
+
+# Helper function to split a bulk upload into raw items.
+# Accepts a JSON array or NDJSON (one object per line); NDJSON lines that fail
+# to parse are returned as ValueError instances so they can be reported per item.
+def parse_bulk_payload(body: bytes, content_type: str):
+    text = body.decode("utf-8").strip()
+    if not text:
+        return []
+    is_ndjson = "ndjson" in content_type or "jsonl" in content_type
+    if not is_ndjson and text.startswith("["):
+        try:
+            items = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON array: {e}")
+        if not isinstance(items, list):
+            raise ValueError("Expected a JSON array of wheel specifications")
+        return items
+    items = []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(ValueError(f"Line {line_no}: {e}"))
+    return items
+
+# Helper function to build the filters shared by wheel listing endpoints
+def build_wheel_filters(
+    wheel_number: Optional[str],
+    coach_number: Optional[str],
+    condition: Optional[ConditionEnum],
+    manufacturer: Optional[str],
+    status: Optional[StatusEnum],
+    match: MatchModeEnum
+) -> dict:
+    filters = {}
+    for field, value in (
+        ("wheel_number", wheel_number),
+        ("coach_number", coach_number),
+        ("manufacturer", manufacturer),
+    ):
+        if value:
+            filters[field] = value
+    if filters:
+        filters["match"] = match
+    if condition:
+        filters["condition"] = condition
+    if status:
+        filters["status"] = status
+    return filters
+
+
+# Helper function to validate ?fields=a,b,c against WheelSpecificationResponse.
+# Returns the sorted field list, or None for all fields.
+def parse_wheel_fields(fields: Optional[str]):
+    if not fields:
+        return None
+    requested = sorted({f.strip() for f in fields.split(",") if f.strip()})
+    unknown = [f for f in requested if f not in WheelSpecificationResponse.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
 
-@router.post("/api/forms/bogie-checksheet", response_model=APIResponse)
-async def create_bogie_checksheet(checksheet_data: BogieChecksheetCreate):
+
+# Helper function to reshape a grouped stats row into the stats response format
+def format_wear_stats(row: dict) -> dict:
+    metrics = {}
+    for metric in WEAR_METRICS:
+        percentiles = row.get(f"{metric}_pct") or [None] * len(WEAR_PERCENTILES)
+        metrics[metric] = {
+            "min": row[f"{metric}_min"],
+            "max": row[f"{metric}_max"],
+            "mean": row[f"{metric}_mean"],
+            **{f"p{int(p * 100)}": value for p, value in zip(WEAR_PERCENTILES, percentiles)}
+        }
+    return {
+        "group": row["_id"],
+        "count": row["count"],
+        "metrics": metrics,
+        "conditions": {
+            condition.value: row[f"condition_{position}"]
+            for position, condition in enumerate(ConditionEnum)
+        }
+    }
+
+
+# Helper function for write-behind mode: queue the checksheet and answer 202 with
+# the id it will be stored under
+async def enqueue_checksheet(data: dict) -> BSONResponse:
+    data["id"] = await repository.new_checksheet_id()
     try:
-        data = {
-            "bogie_details": checksheet_data.bogie_details.dict(),
-            "bogie_checksheet": checksheet_data.bogie_checksheet.dict(),
-            "bmbc_checksheet": checksheet_data.bmbc_checksheet.dict(),
-            "remarks": checksheet_data.remarks,
-            "overall_status": "COMPLETED",
-            "created_at": datetime.utcnow()
+        checksheet_writer.submit(data)
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Checksheet queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    response = APIResponse(
+        success=True,
+        message="Bogie checksheet accepted",
+        data={
+            "id": data["id"],
+            "bogie_number": data["bogie_details"]["bogie_number"],
+            "coach_number": data["bogie_details"]["coach_number"],
+            "created_at": data["created_at"].isoformat(),
+            "status": "queued"
         }
-        result = await forms_collection.insert_one(data)
-        return APIResponse(
-            success=True,
-            message="Bogie checksheet created successfully",
-            data={
-                "id": str(result.inserted_id),
-                "bogie_number": data["bogie_details"]["bogie_number"],
-                "coach_number": data["bogie_details"]["coach_number"],
-                "created_at": data["created_at"].isoformat()
+    )
+    return BSONResponse(response.model_dump(mode="json"), status_code=202)
+
+
+@router.post(
+    "/api/forms/bogie-checksheet",
+    response_model=APIResponse,
+    responses={202: {"model": APIResponse, "description": "Queued (CHECKSHEET_WRITE_BEHIND)"}}
+)
+async def create_bogie_checksheet(
+    checksheet_data: BogieChecksheetCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
+    async def create():
+        try:
+            data = {
+                "bogie_details": checksheet_data.bogie_details.dict(),
+                "bogie_checksheet": checksheet_data.bogie_checksheet.dict(),
+                "bmbc_checksheet": checksheet_data.bmbc_checksheet.dict(),
+                "remarks": checksheet_data.remarks,
+                "overall_status": "COMPLETED",
+                "created_at": datetime.utcnow()
             }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create checksheet: {str(e)}")
+            if checksheet_writer.running:
+                return await enqueue_checksheet(data)
+            checksheet_id = await repository.create_checksheet(data)
+            await record_writes("checksheets", [{**data, "id": checksheet_id}])
+            return APIResponse(
+                success=True,
+                message="Bogie checksheet created successfully",
+                data={
+                    "id": checksheet_id,
+                    "bogie_number": data["bogie_details"]["bogie_number"],
+                    "coach_number": data["bogie_details"]["coach_number"],
+                    "created_at": data["created_at"].isoformat()
+                }
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create checksheet: {str(e)}")
 
+    return await run_idempotent(
+        "bogie-checksheet", idempotency_key, request_hash(checksheet_data), create
+    )
+
+
+# Helper function to build the checksheet listing filters (exact matches on bogie details)
+def build_checksheet_filters(
+    bogie_number: Optional[str],
+    coach_number: Optional[str],
+    inspector_name: Optional[str],
+    inspection_date_from: Optional[datetime],
+    inspection_date_to: Optional[datetime],
+    overall_status: Optional[str]
+) -> dict:
+    filters = {
+        "bogie_number": bogie_number,
+        "coach_number": coach_number,
+        "inspector_name": inspector_name,
+        "inspection_date_from": inspection_date_from,
+        "inspection_date_to": inspection_date_to,
+        "overall_status": overall_status,
+    }
+    return {key: value for key, value in filters.items() if value}
+
+
+@router.get("/api/forms/bogie-checksheet", response_model=PaginatedResponse)
+async def get_bogie_checksheets(
+    bogie_number: Optional[str] = Query(None),
+    coach_number: Optional[str] = Query(None),
+    inspector_name: Optional[str] = Query(None),
+    inspection_date_from: Optional[datetime] = Query(None),
+    inspection_date_to: Optional[datetime] = Query(None),
+    overall_status: Optional[str] = Query(None),
+    latest_per_bogie: bool = Query(False, description="Only the latest inspection of each bogie"),
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    count: CountModeEnum = Query(CountModeEnum.EXACT, description="How to compute total"),
+    if_none_match: Optional[str] = Header(None)
+):
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="offset cannot be combined with cursor")
+    if cursor and latest_per_bogie:
+        raise HTTPException(status_code=400, detail="cursor is not supported with latest_per_bogie")
 
-@router.post("/api/forms/wheel-specifications", response_model=APIResponse)
-async def create_wheel_specification(wheel_data: WheelSpecificationCreate):
     try:
-        existing = await responses_collection.find_one({"wheel_number": wheel_data.wheel_number})
-        if existing:
-            raise HTTPException(status_code=400, detail="Wheel number already exists")
-        
-        wheel_doc = wheel_data.dict()
-        wheel_doc["created_at"] = datetime.utcnow()
-        wheel_doc["updated_at"] = datetime.utcnow()
-        
-        result = await responses_collection.insert_one(wheel_doc)
-        
-        return APIResponse(
-            success=True,
-            message="Wheel specification created successfully",
-            data={
-                "id": str(result.inserted_id),
-                "wheel_number": wheel_data.wheel_number,
-                "coach_number": wheel_data.coach_number,
-                "created_at": wheel_doc["created_at"].isoformat()
+        filters = build_checksheet_filters(
+            bogie_number, coach_number, inspector_name,
+            inspection_date_from, inspection_date_to, overall_status
+        )
+        # The write version is part of the key, so pages cached before a write are
+        # never served after it and the ETag is known before any query runs
+        version = await repository.collection_version("checksheets")
+        cache_key = query_key(
+            "checksheets", filters, latest=latest_per_bogie, limit=limit, offset=offset,
+            cursor=cursor, count=count, version=version
+        )
+        etag = make_etag(version, cache_key)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        cached = await query_cache.get(cache_key)
+        if cached is not None:
+            return BSONResponse(cached, headers={"X-Cache": "HIT", "ETag": etag})
+
+        async def load():
+            checksheets, next_cursor, total = await repository.list_checksheets(
+                filters, latest_per_bogie=latest_per_bogie, limit=limit, offset=offset,
+                cursor=cursor, count=count
+            )
+            payload = {
+                "success": True,
+                "message": f"Retrieved {len(checksheets)} bogie checksheets",
+                "data": checksheets,
+                "total": total,
+                "total_is_estimate": count == CountModeEnum.ESTIMATED and not latest_per_bogie,
+                "limit": limit,
+                "offset": offset,
+                "next_cursor": next_cursor
             }
+            await query_cache.set(
+                cache_key, payload, tags=coach_query_tags("checksheets", coach_number, exact=True)
+            )
+            return payload
+
+        try:
+            payload, shared = await listing_flights.do(cache_key, load)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return BSONResponse(
+            payload, headers={"X-Cache": "COALESCED" if shared else "MISS", "ETag": etag}
         )
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create wheel spec: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch checksheets: {str(e)}")
+
+
+@router.get("/api/forms/bogie-checksheet/{checksheet_id}", response_model=APIResponse)
+async def get_bogie_checksheet(
+    checksheet_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
+    try:
+        etag = make_etag(
+            await repository.collection_version("checksheets"), f"checksheet:{checksheet_id}"
+        )
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        doc = await repository.get_checksheet(checksheet_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch checksheet: {str(e)}")
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Bogie checksheet not found")
+    return BSONResponse({
+        "success": True,
+        "message": "Bogie checksheet retrieved successfully",
+        "data": doc
+    }, headers={"ETag": etag})
+
+
+@router.post("/api/forms/wheel-specifications", response_model=APIResponse)
+async def create_wheel_specification(
+    wheel_data: WheelSpecificationCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
+    async def create():
+        try:
+            wheel_doc = wheel_data.dict()
+            wheel_doc["created_at"] = datetime.utcnow()
+            wheel_doc["updated_at"] = datetime.utcnow()
+
+            # Uniqueness is enforced by the storage backend's wheel_number index
+            try:
+                wheel_id = await repository.create_wheel(wheel_doc)
+            except DuplicateWheelError:
+                raise HTTPException(status_code=400, detail="Wheel number already exists")
+            await record_writes("wheels", [{**wheel_doc, "id": wheel_id}])
+
+            return APIResponse(
+                success=True,
+                message="Wheel specification created successfully",
+                data={
+                    "id": wheel_id,
+                    "wheel_number": wheel_data.wheel_number,
+                    "coach_number": wheel_data.coach_number,
+                    "created_at": wheel_doc["created_at"].isoformat()
+                }
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create wheel spec: {str(e)}")
+
+    return await run_idempotent(
+        "wheel-specification", idempotency_key, request_hash(wheel_data), create
+    )
+
+
+@router.post("/api/forms/wheel-specifications/bulk", response_model=APIResponse)
+async def create_wheel_specifications_bulk(
+    request: Request,
+    ordered: bool = Query(False, description="Stop at the first rejected item"),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
+    body = await request.body()
+
+    async def create():
+        try:
+            items = parse_bulk_payload(body, request.headers.get("content-type", ""))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if len(items) > BULK_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Bulk upload limited to {BULK_MAX_ITEMS} items, got {len(items)}"
+            )
+
+        try:
+            results = [None] * len(items)
+            pending = []
+            now = datetime.utcnow()
+            for index, item in enumerate(items):
+                if isinstance(item, ValueError):
+                    results[index] = {"index": index, "status": "invalid", "errors": [str(item)]}
+                    continue
+                if not isinstance(item, dict):
+                    results[index] = {"index": index, "status": "invalid", "errors": ["Expected a JSON object"]}
+                    continue
+                try:
+                    wheel_data = WheelSpecificationCreate(**item)
+                except ValidationError as e:
+                    results[index] = {
+                        "index": index,
+                        "wheel_number": item.get("wheel_number"),
+                        "status": "invalid",
+                        "errors": e.errors(include_url=False, include_input=False)
+                    }
+                    continue
+                wheel_doc = wheel_data.dict()
+                wheel_doc["created_at"] = now
+                wheel_doc["updated_at"] = now
+                pending.append((index, wheel_doc))
+
+            # In ordered mode nothing after the first invalid item is written
+            if ordered and len(pending) < len(items):
+                first_invalid = next(i for i, r in enumerate(results) if r is not None)
+                pending = [(i, doc) for i, doc in pending if i < first_invalid]
+
+            seen = set()
+            created_docs = []
+            stopped = False
+            for start in range(0, len(pending), BULK_CHUNK_SIZE):
+                if stopped:
+                    break
+                chunk = pending[start:start + BULK_CHUNK_SIZE]
+
+                to_insert = []
+                for index, doc in chunk:
+                    if doc["wheel_number"] in seen:
+                        results[index] = {
+                            "index": index,
+                            "wheel_number": doc["wheel_number"],
+                            "status": "duplicate",
+                            "errors": ["Wheel number already exists"]
+                        }
+                        if ordered:
+                            stopped = True
+                            break
+                        continue
+                    seen.add(doc["wheel_number"])
+                    to_insert.append((index, doc))
+                if not to_insert:
+                    continue
+
+                # Duplicates already stored are rejected by the backend's unique wheel_number index
+                created, failed = await repository.insert_wheels(
+                    [doc for _, doc in to_insert], ordered=ordered
+                )
+                if ordered and failed:
+                    stopped = True
+
+                for position, (index, doc) in enumerate(to_insert):
+                    if position in failed:
+                        status, error = failed[position]
+                        results[index] = {
+                            "index": index,
+                            "wheel_number": doc["wheel_number"],
+                            "status": status,
+                            "errors": [error]
+                        }
+                    elif position in created:
+                        results[index] = {
+                            "index": index,
+                            "wheel_number": doc["wheel_number"],
+                            "status": "created",
+                            "id": created[position]
+                        }
+                        created_docs.append({**doc, "id": created[position]})
+
+            for index, result in enumerate(results):
+                if result is None:
+                    results[index] = {"index": index, "status": "skipped"}
+
+            await record_writes("wheels", created_docs)
+
+            counts = {status: 0 for status in ("created", "duplicate", "invalid", "error", "skipped")}
+            for result in results:
+                counts[result["status"]] += 1
+
+            return APIResponse(
+                success=counts["created"] == len(items),
+                message=f"Inserted {counts['created']} of {len(items)} wheel specifications",
+                data={"total": len(items), **counts, "results": results}
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to bulk create wheel specs: {str(e)}")
+
+    return await run_idempotent(
+        "wheel-specifications-bulk", idempotency_key, request_hash(body, ordered), create
+    )
+
+
+# Rollup buckets: wheels falling due within this many days from today (cumulative)
+DUE_BUCKET_DAYS = (7, 30, 90)
+
+
+# Helper function to fold a coach's {due date: wheels} rollup into buckets
+# relative to today; the rollup stores dates so it never goes stale as days pass
+def due_buckets(days: dict, today: date) -> dict:
+    buckets = {"overdue": 0, **{f"due_within_{n}_days": 0 for n in DUE_BUCKET_DAYS}, "later": 0}
+    for day, count in days.items():
+        remaining = (day - today).days
+        if remaining < 0:
+            buckets["overdue"] += count
+        elif remaining > DUE_BUCKET_DAYS[-1]:
+            buckets["later"] += count
+        for n in DUE_BUCKET_DAYS:
+            if 0 <= remaining <= n:
+                buckets[f"due_within_{n}_days"] += count
+    buckets["total"] = sum(days.values())
+    buckets["next_due"] = min(days).isoformat() if days else None
+    return buckets
+
+
+@router.get("/api/forms/wheel-specifications/due", response_model=PaginatedResponse)
+async def get_due_wheel_specifications(
+    within_days: int = Query(30, ge=0, le=3650, description="Include wheels due within this many days"),
+    coach_number: Optional[str] = Query(None, description="Exact coach number"),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    # Overdue wheels are always included; results are ordered by due date
+    due_before = datetime.utcnow() + timedelta(days=within_days)
+    try:
+        wheels, next_cursor = await repository.list_due_wheels(
+            due_before, coach_number, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch due wheels: {str(e)}")
+    return BSONResponse({
+        "success": True,
+        "message": f"Retrieved {len(wheels)} wheel specifications due by {due_before.date().isoformat()}",
+        "data": wheels,
+        "total": None,
+        "total_is_estimate": False,
+        "limit": limit,
+        "offset": 0,
+        "next_cursor": next_cursor
+    })
+
+
+@router.get("/api/forms/wheel-specifications/due/rollup", response_model=APIResponse)
+async def get_due_rollup(coach_number: Optional[str] = Query(None, description="Exact coach number")):
+    try:
+        rollup = await repository.due_rollup(coach_number)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch due rollup: {str(e)}")
+    today = datetime.utcnow().date()
+    return APIResponse(
+        success=True,
+        message=f"Inspection-due rollup for {len(rollup)} coaches",
+        data={
+            "as_of": today.isoformat(),
+            "coaches": [
+                {"coach_number": coach, **due_buckets(days, today)} for coach, days in rollup.items()
+            ]
+        }
+    )
+
+
+# One indexed $in / IN query for a whole rake instead of a filtered listing per wheel.
+# Results are keyed by the requested number: a wheel (or null) per wheel_number,
+# a list of wheels per axle_number; numbers with no match are also listed in "missing".
+@router.post("/api/forms/wheel-specifications/lookup", response_model=APIResponse)
+async def lookup_wheel_specifications(lookup: WheelLookupRequest):
+    if (lookup.wheel_numbers is None) == (lookup.axle_numbers is None):
+        raise HTTPException(status_code=400, detail="Send exactly one of wheel_numbers or axle_numbers")
+    if lookup.wheel_numbers is not None:
+        field, numbers = "wheel_number", lookup.wheel_numbers
+    else:
+        field, numbers = "axle_number", lookup.axle_numbers
+    requested = list(dict.fromkeys(numbers))
+    if len(requested) > LOOKUP_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lookup limited to {LOOKUP_MAX_ITEMS} {field}s, got {len(requested)}"
+        )
+
+    try:
+        found = await repository.lookup_wheels(field, requested) if requested else []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to look up wheel specs: {str(e)}")
+
+    if field == "wheel_number":
+        results = {number: None for number in requested}
+        for wheel in found:
+            results[wheel["wheel_number"]] = wheel
+    else:
+        results = {number: [] for number in requested}
+        for wheel in found:
+            results[wheel["axle_number"]].append(wheel)
+    missing = [number for number, match in results.items() if not match]
+
+    return BSONResponse({
+        "success": True,
+        "message": f"Found {len(requested) - len(missing)} of {len(requested)} {field}s",
+        "data": {
+            "key": field,
+            "found": len(requested) - len(missing),
+            "missing": missing,
+            "results": results
+        }
+    })
 
 
 @router.get("/api/forms/wheel-specifications", response_model=PaginatedResponse)
@@ -82,41 +665,264 @@ async def get_wheel_specifications(
     condition: Optional[ConditionEnum] = Query(None),
     manufacturer: Optional[str] = Query(None),
     status: Optional[StatusEnum] = Query(None),
+    match: MatchModeEnum = Query(
+        MatchModeEnum.PREFIX,
+        description="How wheel_number, coach_number and manufacturer are matched"
+    ),
     limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    count: CountModeEnum = Query(CountModeEnum.EXACT, description="How to compute total"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated WheelSpecificationResponse fields to return"
+    ),
+    if_none_match: Optional[str] = Header(None)
 ):
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="offset cannot be combined with cursor")
+    try:
+        requested = parse_wheel_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        filters = {}
-        if wheel_number:
-            filters["wheel_number"] = {"$regex": wheel_number, "$options": "i"}
-        if coach_number:
-            filters["coach_number"] = {"$regex": coach_number, "$options": "i"}
-        if condition:
-            filters["condition"] = condition
-        if manufacturer:
-            filters["manufacturer"] = {"$regex": manufacturer, "$options": "i"}
-        if status:
-            filters["status"] = status
-
-        cursor = responses_collection.find(filters).skip(offset).limit(limit)
-        wheels = []
-        async for doc in cursor:
-            doc = obj_id_str(doc)
-            if "created_at" in doc:
-                doc["created_at"] = doc["created_at"].isoformat()
-            if "updated_at" in doc:
-                doc["updated_at"] = doc["updated_at"].isoformat()
-            wheels.append(doc)
-        
-        total = await responses_collection.count_documents(filters)
-        
-        return PaginatedResponse(
-            success=True,
-            message=f"Retrieved {len(wheels)} wheel specifications",
-            data=wheels,
-            total=total,
-            limit=limit,
-            offset=offset
+        filters = build_wheel_filters(
+            wheel_number, coach_number, condition, manufacturer, status, match
+        )
+        # Polling clients that already hold this version get 304 without a query
+        version = await repository.collection_version("wheels")
+        cache_key = query_key(
+            "wheels", filters, limit=limit, offset=offset, cursor=cursor, count=count,
+            fields=requested, version=version
+        )
+        etag = make_etag(version, cache_key)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        cached = await query_cache.get(cache_key)
+        if cached is not None:
+            return BSONResponse(cached, headers={"X-Cache": "HIT", "ETag": etag})
+
+        # Keyset mode: resume after the last (created_at, id) of the previous page
+        async def load():
+            wheels, next_cursor, total = await repository.list_wheels(
+                filters, fields=requested, limit=limit, offset=offset, cursor=cursor, count=count
+            )
+            payload = {
+                "success": True,
+                "message": f"Retrieved {len(wheels)} wheel specifications",
+                "data": wheels,
+                "total": total,
+                "total_is_estimate": count == CountModeEnum.ESTIMATED,
+                "limit": limit,
+                "offset": offset,
+                "next_cursor": next_cursor
+            }
+            await query_cache.set(
+                cache_key,
+                payload,
+                tags=coach_query_tags("wheels", coach_number, exact=match == MatchModeEnum.EXACT)
+            )
+            return payload
+
+        # Concurrent identical requests wait on the first one's query
+        try:
+            payload, shared = await listing_flights.do(cache_key, load)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return BSONResponse(
+            payload, headers={"X-Cache": "COALESCED" if shared else "MISS", "ETag": etag}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch data: {str(e)}")
+
+
+@router.get("/api/forms/wheel-specifications/export")
+async def export_wheel_specifications(
+    format: ExportFormatEnum = Query(ExportFormatEnum.NDJSON),
+    wheel_number: Optional[str] = Query(None),
+    coach_number: Optional[str] = Query(None),
+    condition: Optional[ConditionEnum] = Query(None),
+    manufacturer: Optional[str] = Query(None),
+    status: Optional[StatusEnum] = Query(None),
+    match: MatchModeEnum = Query(MatchModeEnum.PREFIX),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated WheelSpecificationResponse fields to export"
+    )
+):
+    try:
+        requested = parse_wheel_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filters = build_wheel_filters(
+        wheel_number, coach_number, condition, manufacturer, status, match
+    )
+    if requested:
+        columns = [f for f in WheelSpecificationResponse.model_fields if f in requested]
+    else:
+        columns = list(WheelSpecificationResponse.model_fields)
+
+    def encode_csv(rows) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row)
+        return buffer.getvalue().encode("utf-8")
+
+    def csv_value(value):
+        if value is None:
+            return ""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, Enum):
+            return value.value
+        return str(value)
+
+    # One batch of documents is held in memory at a time; the next batch is only
+    # fetched once the previous chunk has been handed to the client (and to
+    # CompressionMiddleware, which compresses each chunk as it passes).
+    async def stream():
+        results = repository.export_wheels(filters, requested, EXPORT_BATCH_SIZE)
+        try:
+            batch = []
+            if format == ExportFormatEnum.CSV:
+                batch.append(encode_csv([columns]))
+            rows = []
+            async for doc in results:
+                if format == ExportFormatEnum.CSV:
+                    rows.append([csv_value(doc.get(column)) for column in columns])
+                else:
+                    batch.append(dumps(doc) + b"\n")
+                if len(rows) + len(batch) >= EXPORT_BATCH_SIZE:
+                    if rows:
+                        batch.append(encode_csv(rows))
+                        rows = []
+                    chunk = b"".join(batch)
+                    batch = []
+                    yield chunk
+            if rows:
+                batch.append(encode_csv(rows))
+            chunk = b"".join(batch)
+            if chunk:
+                yield chunk
+        finally:
+            await results.aclose()
+
+    media_type = "text/csv" if format == ExportFormatEnum.CSV else "application/x-ndjson"
+    headers = {
+        "Content-Disposition": f'attachment; filename="wheel-specifications.{format.value}"',
+    }
+    return StreamingResponse(stream(), media_type=media_type, headers=headers)
+
+
+@router.get("/api/forms/wheel-specifications/stats", response_model=APIResponse)
+async def get_wheel_specification_stats(
+    group_by: StatsGroupEnum = Query(StatsGroupEnum.COACH_NUMBER),
+    wheel_number: Optional[str] = Query(None),
+    coach_number: Optional[str] = Query(None),
+    condition: Optional[ConditionEnum] = Query(None),
+    manufacturer: Optional[str] = Query(None),
+    status: Optional[StatusEnum] = Query(None),
+    match: MatchModeEnum = Query(MatchModeEnum.PREFIX),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of groups")
+):
+    try:
+        filters = build_wheel_filters(
+            wheel_number, coach_number, condition, manufacturer, status, match
+        )
+        cache_key = query_key("wheel-stats", filters, group_by=group_by, limit=limit)
+        cached = await query_cache.get(cache_key)
+        if cached is not None:
+            return BSONResponse(cached, headers={"X-Cache": "HIT"})
+
+        rows, percentiles_available = await repository.wheel_stats(filters, group_by, limit)
+
+        payload = {
+            "success": True,
+            "message": f"Computed wheel statistics for {len(rows)} groups",
+            "data": {
+                "group_by": group_by.value,
+                "percentiles_available": percentiles_available,
+                "groups": [format_wear_stats(row) for row in rows]
+            }
+        }
+        await query_cache.set(
+            cache_key,
+            payload,
+            tags=coach_query_tags("wheels", coach_number, exact=match == MatchModeEnum.EXACT)
+        )
+        return BSONResponse(payload, headers={"X-Cache": "MISS"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute stats: {str(e)}")
+
+
+# One keyed read of the materialized summary
+@router.get("/api/coaches/{coach_number}/summary", response_model=APIResponse)
+async def get_coach_summary(coach_number: str):
+    try:
+        summary = await repository.get_coach_summary(coach_number)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch coach summary: {str(e)}")
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Coach summary not found")
+    return BSONResponse({
+        "success": True,
+        "message": "Coach summary retrieved successfully",
+        "data": summary
+    })
+
+
+# Server-Sent Events for newly created wheel specifications ("wheel") and bogie
+# checksheets ("checksheet"), optionally filtered by coach; a condition filter
+# selects wheels in that condition. Events are not replayed on reconnect.
+@router.get("/api/events/inspections", response_class=StreamingResponse)
+async def stream_inspection_events(
+    event_type: Optional[EventTypeEnum] = Query(None, alias="type"),
+    coach_number: Optional[str] = Query(None),
+    condition: Optional[ConditionEnum] = Query(None)
+):
+    try:
+        subscription = inspection_events.subscribe(
+            event_type=event_type.value if event_type else None,
+            coach_number=coach_number,
+            condition=condition.value if condition else None
+        )
+    except SubscriberLimitReached:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many event subscribers, retry shortly",
+            headers={"Retry-After": "5"}
+        )
+
+    async def stream():
+        try:
+            async for chunk in subscription.stream():
+                yield chunk
+        finally:
+            inspection_events.unsubscribe(subscription)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+
+@router.get("/api/cache/stats", response_model=APIResponse)
+async def get_cache_stats():
+    return APIResponse(
+        success=True,
+        message="Cache statistics",
+        data={
+            "query_cache": query_cache.stats(),
+            "count_cache": count_cache.stats(),
+            "listing_flights": listing_flights.stats()
+        }
+    )
+
+
+@router.get("/api/db/pool", response_model=APIResponse)
+async def get_pool_stats():
+    return APIResponse(
+        success=True,
+        message=f"{repository.label} connection pool statistics",
+        data=repository.pool_stats()
+    )
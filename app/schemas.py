@@ -20,6 +20,29 @@ class StatusEnum(str, Enum):
     INACTIVE = "INACTIVE"
     RETIRED = "RETIRED"
 
+class CountModeEnum(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    NONE = "none"
+
+class MatchModeEnum(str, Enum):
+    EXACT = "exact"
+    PREFIX = "prefix"
+    CONTAINS = "contains"
+
+class ExportFormatEnum(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class StatsGroupEnum(str, Enum):
+    COACH_NUMBER = "coach_number"
+    MANUFACTURER = "manufacturer"
+    MATERIAL_GRADE = "material_grade"
+
+class EventTypeEnum(str, Enum):
+    WHEEL = "wheel"
+    CHECKSHEET = "checksheet"
+
 # Bogie Checksheet Schemas
 class BogieDetailsSchema(BaseModel):
     bogie_number: str = Field(..., min_length=1, max_length=50)
@@ -115,6 +138,11 @@ class WheelSpecificationResponse(BaseModel):
     remarks: Optional[str]
     status: Optional[str]
 
+# Batch lookup by exact wheel or axle number; send one of the two lists
+class WheelLookupRequest(BaseModel):
+    wheel_numbers: Optional[List[str]] = None
+    axle_numbers: Optional[List[str]] = None
+
 # Filters for query
 class WheelSpecificationFilters(BaseModel):
     wheel_number: Optional[str] = None
@@ -135,6 +163,8 @@ class PaginatedResponse(BaseModel):
     success: bool
     message: str
     data: List[dict]
-    total: int
+    total: Optional[int] = None
+    total_is_estimate: bool = False
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
@@ -0,0 +1,33 @@
+import re
+from app.schemas import MatchModeEnum
+
+# Text filters on wheel listings.
+# Each searchable field gets a lowercase "<field>_lc" shadow copy on write, so exact
+# and prefix matches become case-sensitive equality / anchored-regex lookups that an
+# index can serve. Contains-matching keeps the old case-insensitive scan as an opt-in.
+# User input is always escaped before it reaches $regex.
+
+SEARCH_FIELDS = ("wheel_number", "coach_number", "manufacturer")
+
+# Projection that keeps the shadow fields out of API responses
+SEARCH_FIELDS_PROJECTION = {f"{field}_lc": 0 for field in SEARCH_FIELDS}
+
+
+def shadow_field(field: str) -> str:
+    return f"{field}_lc"
+
+
+def add_search_fields(doc: dict) -> dict:
+    for field in SEARCH_FIELDS:
+        value = doc.get(field)
+        if isinstance(value, str):
+            doc[shadow_field(field)] = value.lower()
+    return doc
+
+
+def match_condition(field: str, value: str, mode: MatchModeEnum):
+    if mode == MatchModeEnum.EXACT:
+        return shadow_field(field), value.lower()
+    if mode == MatchModeEnum.PREFIX:
+        return shadow_field(field), {"$regex": "^" + re.escape(value.lower())}
+    return field, {"$regex": re.escape(value), "$options": "i"}
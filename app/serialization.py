@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import Response
+
+# One-pass JSON encoding for documents straight out of Mongo.
+# orjson handles dicts, lists, datetimes and enums natively; the default hook only
+# sees the BSON types it does not know, so documents need no pre-conversion.
+
+
+def bson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=bson_default)
+
+
+# Response that renders BSON documents directly. Returning it from a route also
+# skips FastAPI's response_model validation, which stays in place for the docs.
+class BSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,45 @@
+import asyncio
+
+# In-process request coalescing.
+# Concurrent calls with the same key share one in-flight task: the first caller
+# (the leader) starts it and everyone arriving before it finishes awaits the same
+# result. Waiters are shielded, so a client disconnecting does not cancel the
+# query for the others. Nothing is kept once the task completes; caching the
+# result is left to the caller.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    # Returns (result, shared); shared is True when another caller's task was reused
+    async def do(self, key: str, fn):
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key: str, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception so it is not reported as unhandled when every
+        # waiter has gone away
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+        }
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from app.config import COACH_SUMMARY_BATCH_MS, COACH_SUMMARY_CHANGE_STREAM
+from app.repository import coach_number_of, repository
+
+logger = logging.getLogger(__name__)
+
+# Keeps the per-coach summaries (GET /api/api/coaches/{coach_number}/summary) current.
+# With COACH_SUMMARY_CHANGE_STREAM on, every worker follows the backend's change
+# feed (a MongoDB change stream) from the present to publish new wheels and
+# checksheets to on_insert (the live inspection feed), so each write is published
+# once per worker whichever process made it. The summaries themselves are kept by
+# one elected worker: the holder of the SUMMARY_LEASE lease follows a second,
+# resumable stream, refreshes the coaches it touches and saves its position, and
+# a worker that takes the lease over resumes from there. The write hook called
+# from the routes queues the coaches a worker wrote, except on the maintainer
+# while its stream is open, and a background task refreshes them every
+# COACH_SUMMARY_BATCH_MS; so summaries stay current while no maintainer is
+# running, or when the backend has no change feed (standalone MongoDB,
+# PostgreSQL). The hook also publishes the documents until the worker's feed is
+# open. Refreshes recompute a coach from its wheels and checksheets, so overlap
+# is harmless.
+
+# Seconds before reopening a change stream that failed after it was running;
+# the summary maintainer doubles it per consecutive failure up to the maximum
+RETRY_DELAY_SECONDS = 5
+RETRY_MAX_DELAY_SECONDS = 300
+# Lease naming the worker that maintains the summaries from the change stream
+SUMMARY_LEASE = "coach_summary_maintainer"
+# A maintainer renews its lease this often; another worker takes it over once it
+# has gone LEASE_SECONDS without renewal
+LEASE_RENEW_SECONDS = 10
+LEASE_SECONDS = 30
+
+
+class CoachSummaryWorker:
+    def __init__(self, on_insert=None):
+        # Called with (namespace, docs) for newly written wheels and checksheets
+        self.on_insert = on_insert
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.feed_open = False
+        self.maintaining = False
+        # Coaches written through the hook, waiting for the next batch
+        self.pending = set()
+        self.wake = asyncio.Event()
+        self.tasks = []
+        self.refreshes = 0
+        self.coaches_refreshed = 0
+        self.failures = 0
+
+    def start(self):
+        self.tasks.append(asyncio.create_task(self._refresh_pending()))
+        if COACH_SUMMARY_CHANGE_STREAM:
+            self.tasks.append(asyncio.create_task(self._follow()))
+            self.tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        for task in self.tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.tasks = []
+        self.feed_open = False
+        # Coaches queued since the last batch, including by writes flushed at shutdown
+        if self.pending:
+            coaches, self.pending = self.pending, set()
+            await self._refresh(coaches)
+        if self.maintaining:
+            self.maintaining = False
+            try:
+                await repository.release_lease(SUMMARY_LEASE, self.owner)
+            except Exception as e:
+                logger.warning("Could not release the coach summary lease: %s", e)
+
+    # Every worker: new documents from any process, for the live feed
+    async def _follow(self):
+        opened = False
+        while True:
+            try:
+                async for changes in repository.watch_changes():
+                    opened = self.feed_open = True
+                    for namespace, docs in self._inserts(changes).items():
+                        self._inserted(namespace, docs)
+                self.feed_open = False
+                return
+            except NotImplementedError:
+                logger.info("%s has no change feed; coach summaries follow local writes", repository.label)
+                return
+            except Exception as e:
+                self.feed_open = False
+                if not opened:
+                    # e.g. MongoDB is not a replica set
+                    logger.warning("Change stream unavailable, using write hooks: %s", e)
+                    return
+                logger.error("Change stream for the live feed failed, reopening: %s", e)
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+
+    # Every worker competes for the lease; its holder maintains the summaries.
+    # Failures, including a lease or stream that cannot be had at startup, are
+    # retried with backoff; write hooks cover the coaches in the meantime.
+    async def _maintain(self):
+        delay = RETRY_DELAY_SECONDS
+        while True:
+            try:
+                if await repository.acquire_lease(SUMMARY_LEASE, self.owner, LEASE_SECONDS):
+                    await self._maintain_summaries()
+                    delay = RETRY_DELAY_SECONDS
+                self.maintaining = False
+                await asyncio.sleep(LEASE_RENEW_SECONDS)
+                continue
+            except NotImplementedError:
+                return
+            except Exception as e:
+                if self.maintaining:
+                    delay = RETRY_DELAY_SECONDS
+                self.maintaining = False
+                logger.error("Coach summary change stream failed, retrying in %ss: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_DELAY_SECONDS)
+
+    # Follows the resumable stream while this worker holds the lease
+    async def _maintain_summaries(self):
+        renew_at = time.monotonic() + LEASE_RENEW_SECONDS
+        async for changes in repository.watch_changes(resume=True):
+            self.maintaining = True
+            coaches = {coach_number_of(namespace, doc) for namespace, _, doc in changes}
+            coaches.discard(None)
+            if coaches:
+                await self._refresh(coaches)
+            if time.monotonic() >= renew_at:
+                if not await repository.acquire_lease(SUMMARY_LEASE, self.owner, LEASE_SECONDS):
+                    logger.warning("Lost the coach summary lease; another worker maintains summaries")
+                    return
+                renew_at = time.monotonic() + LEASE_RENEW_SECONDS
+
+    async def _refresh_pending(self):
+        while True:
+            await self.wake.wait()
+            await asyncio.sleep(COACH_SUMMARY_BATCH_MS / 1000)
+            self.wake.clear()
+            coaches, self.pending = self.pending, set()
+            if coaches:
+                await self._refresh(coaches)
+
+    @staticmethod
+    def _inserts(changes) -> dict:
+        inserted = {}
+        for namespace, operation, doc in changes:
+            if operation == "insert":
+                inserted.setdefault(namespace, []).append(doc)
+        return inserted
+
+    def _inserted(self, namespace, docs):
+        if self.on_insert is None:
+            return
+        try:
+            self.on_insert(namespace, docs)
+        except Exception as e:
+            logger.error("Insert hook failed for %d %s: %s", len(docs), namespace, e)
+
+    async def _refresh(self, coaches):
+        try:
+            await repository.refresh_coach_summaries(coaches)
+        except Exception as e:
+            # Summaries are derived data: log, and let the next write or a rebuild fix them
+            self.failures += 1
+            logger.error("Coach summary refresh failed for %d coaches: %s", len(coaches), e)
+            return
+        self.refreshes += 1
+        self.coaches_refreshed += len(coaches)
+
+    # Write hook: called by the routes with the wheels or checksheets they
+    # created. Only queues the coaches, so requests never wait on a refresh;
+    # the maintainer skips that, as its stream brings the same writes.
+    async def written(self, namespace, docs):
+        if not docs:
+            return
+        if not self.maintaining:
+            coaches = {coach_number_of(namespace, doc) for doc in docs}
+            coaches.discard(None)
+            if coaches:
+                self.pending.update(coaches)
+                self.wake.set()
+        if not self.feed_open:
+            self._inserted(namespace, docs)
+
+    def stats(self) -> dict:
+        return {
+            "change_stream": int(self.feed_open),
+            "maintainer": int(self.maintaining),
+            "pending_coaches": len(self.pending),
+            "refreshes": self.refreshes,
+            "coaches_refreshed": self.coaches_refreshed,
+            "failures": self.failures,
+        }
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Serialization microbenchmark for the wheel listing
+Compares the previous response path (obj_id_str + isoformat, PaginatedResponse,
+FastAPI response_model validation, json.dumps) with BSONResponse.
+
+Usage: python benchmarks/bench_serialization.py [--docs 100] [--repeat 2000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.schemas import PaginatedResponse
+from app.serialization import BSONResponse
+
+
+def obj_id_str(data):
+    """The routes' former ObjectId-to-string helper, kept here for the baseline"""
+    data["id"] = str(data["_id"])
+    del data["_id"]
+    return data
+
+
+def make_page(count: int):
+    """Build a page of wheel documents shaped like Motor returns them"""
+    now = datetime(2025, 7, 13, 10, 0, 0, 123000)
+    return [
+        {
+            "_id": ObjectId(),
+            "wheel_number": f"WH{i:06d}",
+            "axle_number": f"AX{i // 2:06d}",
+            "coach_number": f"CH{i // 8:04d}",
+            "position": "LEFT" if i % 2 else "RIGHT",
+            "wheel_diameter": 915.0 - i % 50,
+            "rim_thickness": 28.0,
+            "flange_height": 25.0,
+            "flange_thickness": 32.0,
+            "condition": "GOOD",
+            "wear_pattern": "Normal wear",
+            "cracks_detected": False,
+            "manufacturer": "ABC Wheels Ltd",
+            "manufacture_date": datetime(2024, 1, 15),
+            "material_grade": "R7",
+            "last_inspection_date": now - timedelta(days=30),
+            "next_inspection_due": now + timedelta(days=60),
+            "inspector_name": "John Doe",
+            "load_capacity": 22500.0,
+            "speed_rating": "200 km/h",
+            "remarks": "Wheel in excellent condition, no visible defects on tread or flange",
+            "status": "ACTIVE",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+def previous_path(page):
+    """Dict conversion, PaginatedResponse, response_model validation, json.dumps"""
+    wheels = []
+    for doc in page:
+        doc = obj_id_str(dict(doc))
+        doc["created_at"] = doc["created_at"].isoformat()
+        doc["updated_at"] = doc["updated_at"].isoformat()
+        wheels.append(doc)
+    model = PaginatedResponse(
+        success=True, message="ok", data=wheels, total=len(wheels), limit=len(wheels), offset=0
+    )
+    adapter = PAGINATED_ADAPTER
+    content = adapter.dump_python(adapter.validate_python(model.model_dump()), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def bson_path(page):
+    """Rename _id and let BSONResponse encode everything in one pass"""
+    wheels = []
+    for doc in page:
+        doc = dict(doc)
+        doc["id"] = doc.pop("_id")
+        wheels.append(doc)
+    return BSONResponse({
+        "success": True, "message": "ok", "data": wheels, "total": len(wheels),
+        "total_is_estimate": False, "limit": len(wheels), "offset": 0, "next_cursor": None
+    }).body
+
+
+PAGINATED_ADAPTER = TypeAdapter(PaginatedResponse)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100, help="documents per page")
+    parser.add_argument("--repeat", type=int, default=2000, help="pages serialized per run")
+    args = parser.parse_args()
+
+    page = make_page(args.docs)
+    # Both paths copy each document, as the real routes consume fresh cursor output
+    results = {}
+    for name, fn in (("previous", previous_path), ("bson_response", bson_path)):
+        fn(page)
+        best = min(timeit.repeat(lambda: fn(page), number=args.repeat, repeat=3))
+        results[name] = best / args.repeat * 1e6
+
+    print(f"📊 Serializing {args.docs} wheel documents per page")
+    for name, micros in results.items():
+        print(f"   - {name:<14} {micros:10.1f} µs/page")
+    print(f"   - speedup        {results['previous'] / results['bson_response']:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Load-test harness for the KPA Form Data API
+Seeds MongoDB (or the in-process mongomock stand-in from mongomock_backend.py) with
+wheel specifications and bogie checksheets, drives every endpoint in app/routes.py
+under concurrency and reports p50/p95/p99 latency and requests per second per
+scenario. Results are written as JSON so runs can be compared across commits.
+
+Usage:
+    python benchmarks/load_test.py --wheels 1000000 --checksheets 200000
+    python benchmarks/load_test.py --backend mongomock --wheels 20000 --checksheets 4000
+    python benchmarks/load_test.py --base-url http://localhost:8000 --skip-seed
+    python benchmarks/load_test.py --compare results/abc123.json results/def456.json
+
+Data comes from the generators in seed_data.py; for millions of documents seed with
+`python seed_data.py --drop` first (multiprocess) and pass --skip-seed here.
+
+Repeated listing requests are served by the query cache; run with
+QUERY_CACHE_BACKEND=none to measure the underlying MongoDB queries.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import seed_data
+from app import database
+from mongomock_backend import use_mongomock
+
+# Router paths start with /api and main.py includes the router under /api
+API = "/api/api"
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit() -> str:
+    """Short hash of the checked-out commit, or 'unknown' outside git"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def seed(collection, target: int, generate, batch_size: int = 5000, align: int = 1):
+    """Top the collection up to `target` documents from a seed_data generator"""
+    existing = await collection.estimated_document_count()
+    if existing >= target:
+        print(f"   - {collection.name}: {existing} documents present, skipping")
+        return
+    started = time.perf_counter()
+    # Generators start on whole coaches; overlap is rejected by the unique index
+    for start in range(existing - existing % align, target, batch_size):
+        docs = list(generate(start, min(start + batch_size, target)))
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError:
+            pass
+    print(f"   - {collection.name}: inserted {target - existing} documents "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+def build_scenarios(args, state):
+    """Scenario name -> (request factory, number of requests, concurrency)"""
+    rng = random.Random(args.seed)
+    coaches = max(args.wheels // seed_data.WHEELS_PER_COACH, 1)
+    bogies = max(min(args.checksheets, coaches * seed_data.BOGIES_PER_COACH), 1)
+    counter = {"wheel": 0, "bulk": 0}
+
+    def new_wheel_number():
+        counter["wheel"] += 1
+        return f"LT{state['run_id']}{counter['wheel']:08d}"
+
+    def wheel_body():
+        return {
+            "wheel_number": new_wheel_number(),
+            "axle_number": "AXLT",
+            "coach_number": f"CH{rng.randrange(coaches):06d}",
+            "wheel_diameter": 900.0,
+            "condition": "GOOD",
+        }
+
+    def listing(**params):
+        return lambda: ("GET", f"{API}/forms/wheel-specifications", params, None)
+
+    n, c = args.requests, args.concurrency
+    scenarios = {
+        "list_offset_0": (listing(limit=100), n, c),
+        "list_offset_1000": (listing(limit=100, offset=1000), n, c),
+        "list_offset_100000": (listing(limit=100, offset=min(100000, args.wheels)), n // 4, c),
+        "list_cursor_deep": (listing(limit=100, cursor=state.get("deep_cursor")), n, c),
+        "list_count_none": (listing(limit=100, count="none"), n, c),
+        "list_coach_exact": (
+            lambda: ("GET", f"{API}/forms/wheel-specifications",
+                     {"coach_number": f"CH{rng.randrange(coaches):06d}", "match": "exact"}, None),
+            n, c
+        ),
+        "list_manufacturer_prefix": (listing(manufacturer="abc", limit=100), n, c),
+        "list_fields_sparse": (listing(limit=100, fields="wheel_number,wheel_diameter,condition"), n, c),
+        "create_wheel": (
+            lambda: ("POST", f"{API}/forms/wheel-specifications", None, wheel_body()), n, c
+        ),
+        "create_wheels_bulk_100": (
+            lambda: ("POST", f"{API}/forms/wheel-specifications/bulk", None,
+                     [wheel_body() for _ in range(100)]),
+            max(n // 10, 1), c
+        ),
+        "create_checksheet": (
+            lambda: ("POST", f"{API}/forms/bogie-checksheet", None, {
+                "bogie_details": {
+                    "bogie_number": f"BG{rng.randrange(bogies):07d}",
+                    "coach_number": f"CH{rng.randrange(coaches):06d}",
+                    "inspection_date": datetime.utcnow().isoformat(),
+                    "inspector_name": "Load Test",
+                },
+                "bogie_checksheet": {"bogie_frame_condition": "GOOD"},
+                "bmbc_checksheet": {"cylinder_body": "GOOD"},
+            }),
+            n, c
+        ),
+        "list_checksheets_bogie": (
+            lambda: ("GET", f"{API}/forms/bogie-checksheet",
+                     {"bogie_number": f"BG{rng.randrange(bogies):07d}"}, None),
+            n, c
+        ),
+        "list_checksheets_latest": (
+            lambda: ("GET", f"{API}/forms/bogie-checksheet",
+                     {"coach_number": f"CH{rng.randrange(coaches):06d}", "latest_per_bogie": "true"}, None),
+            n, c
+        ),
+        "get_checksheet": (
+            lambda: ("GET", f"{API}/forms/bogie-checksheet/{state.get('checksheet_id')}", None, None),
+            n, c
+        ),
+        "wheel_stats_by_manufacturer": (
+            lambda: ("GET", f"{API}/forms/wheel-specifications/stats",
+                     {"group_by": "manufacturer", "status": "ACTIVE"}, None),
+            max(n // 20, 1), min(c, 4)
+        ),
+        "export_ndjson_coach_prefix": (
+            lambda: ("GET", f"{API}/forms/wheel-specifications/export",
+                     {"coach_number": "CH0000", "format": "ndjson"}, None),
+            max(n // 20, 1), min(c, 4)
+        ),
+    }
+    if args.only:
+        scenarios = {name: s for name, s in scenarios.items() if name in args.only}
+    return scenarios
+
+
+async def run_scenario(client, factory, requests: int, concurrency: int) -> dict:
+    """Fire `requests` requests with `concurrency` workers and summarise latencies"""
+    latencies = []
+    errors = {}
+    remaining = {"count": requests}
+
+    async def worker():
+        while remaining["count"] > 0:
+            remaining["count"] -= 1
+            method, path, params, body = factory()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body)
+                await response.aread()
+                if not (200 <= response.status_code < 300 or response.status_code == 304):
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+async def prepare_state(client, args) -> dict:
+    """Look up ids the scenarios need: a deep keyset cursor and a checksheet id"""
+    state = {"run_id": f"{int(time.time()) % 100000:05d}"}
+    depth = min(100000, max(args.wheels - 100, 0))
+    response = await client.get(
+        f"{API}/forms/wheel-specifications", params={"limit": 100, "offset": depth, "count": "none"}
+    )
+    state["deep_cursor"] = response.json().get("next_cursor")
+    response = await client.get(f"{API}/forms/bogie-checksheet", params={"limit": 1, "count": "none"})
+    data = response.json().get("data") or [{}]
+    state["checksheet_id"] = data[0].get("id", "0" * 24)
+    return state
+
+
+async def run(args):
+    if args.backend == "mongomock":
+        use_mongomock()
+
+    from app.main import app
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        lifespan = None
+    else:
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+
+    try:
+        if not args.skip_seed:
+            if args.base_url:
+                await database.connect()
+            print(f"🌱 Seeding {args.wheels} wheels and {args.checksheets} checksheets...")
+            coaches = -(-args.wheels // seed_data.WHEELS_PER_COACH)
+            await seed(database.responses_collection, args.wheels,
+                       lambda start, stop: seed_data.generate_wheels(start, stop, args.seed),
+                       align=seed_data.WHEELS_PER_COACH)
+            await seed(database.forms_collection, args.checksheets,
+                       lambda start, stop: seed_data.generate_checksheets(start, stop, args.seed, coaches))
+
+        state = await prepare_state(client, args)
+        results = {}
+        for name, (factory, requests, concurrency) in build_scenarios(args, state).items():
+            for _ in range(args.warmup):
+                method, path, params, body = factory()
+                await client.request(method, path, params=params, json=body)
+            results[name] = await run_scenario(client, factory, requests, concurrency)
+            r = results[name]
+            print(f"   - {name:<30} p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  "
+                  f"p99 {r['p99_ms']:8.1f} ms  {r['rps']:8.1f} req/s  errors {sum(r['errors'].values())}")
+        failed = {name: r["errors"] for name, r in results.items() if r["errors"]}
+        return results, failed
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+
+def compare(baseline_path: str, candidate_path: str):
+    """Print per-scenario latency and throughput changes between two result files"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+    print(f"📊 {baseline['meta']['commit']} -> {candidate['meta']['commit']}")
+    print(f"   {'scenario':<30} {'p50 ms':>18} {'p95 ms':>18} {'req/s':>18}")
+    for name, new in candidate["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            print(f"   {name:<30} (new scenario)")
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "rps"):
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{old[key]:7.1f}->{new[key]:7.1f} {change:+4.0f}%")
+        print(f"   {name:<30} " + " ".join(f"{cell:>18}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the KPA Form Data API")
+    parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--backend", choices=["mongo", "mongomock"], default="mongo",
+                        help="in-process runs only: real MongoDB (MONGO_URI) or mongomock-motor")
+    parser.add_argument("--wheels", type=int, default=1_000_000)
+    parser.add_argument("--checksheets", type=int, default=200_000)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and requests")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", help="result file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    print(f"🚄 Load test against {args.base_url or 'in-process app'} ({args.backend})")
+    results, failed = asyncio.run(run(args))
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "target": args.base_url or f"in-process/{args.backend}",
+            "wheels": args.wheels,
+            "checksheets": args.checksheets,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    if failed:
+        print(f"\n❌ Results written to {output}, but {len(failed)} scenarios had failed requests:")
+        for name, errors in failed.items():
+            print(f"   - {name}: {errors}")
+        sys.exit(1)
+    print(f"\n✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+In-process MongoDB stand-in built on mongomock-motor
+Used by `load_test.py --backend mongomock` and by the API tests in tests/.
+mongomock differs from a real server in ways the API notices, so it is patched
+to answer like MongoDB 6.0:
+
+- pymongo's ReplaceOne / UpdateOne pass a `sort=` keyword (pymongo 4.11+) that
+  mongomock's bulk builders do not accept; it is dropped
+- a $group using $percentile (MongoDB 7.0+) fails with OperationFailure code
+  15952, "unknown group operator", instead of mongomock's NotImplementedError
+- str enums are stored as their values, as BSON encoding does, instead of as
+  the Enum objects themselves
+"""
+
+from enum import Enum
+
+from pymongo.errors import OperationFailure
+
+from app import database
+
+# Server error for an unknown $group accumulator
+UNKNOWN_GROUP_OPERATOR = 15952
+
+_patched = False
+
+
+def _uses_percentile(value) -> bool:
+    if isinstance(value, dict):
+        return "$percentile" in value or any(_uses_percentile(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_uses_percentile(v) for v in value)
+    return False
+
+
+def patch_mongomock():
+    """Make mongomock answer like a MongoDB 6.0 server (idempotent)"""
+    global _patched
+    if _patched:
+        return
+    import mongomock.collection
+    import mongomock.helpers
+
+    builder = mongomock.collection.BulkOperationBuilder
+    add_update, add_replace = builder.add_update, builder.add_replace
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    def add_replace_without_sort(self, *args, sort=None, **kwargs):
+        return add_replace(self, *args, **kwargs)
+
+    builder.add_update = add_update_without_sort
+    builder.add_replace = add_replace_without_sort
+
+    aggregate = mongomock.collection.Collection.aggregate
+
+    def aggregate_without_percentile(self, pipeline, *args, **kwargs):
+        for stage in pipeline:
+            if "$group" in stage and _uses_percentile(stage["$group"]):
+                raise OperationFailure(
+                    "Invalid $group :: caused by :: unknown group operator '$percentile'",
+                    code=UNKNOWN_GROUP_OPERATOR
+                )
+        return aggregate(self, pipeline, *args, **kwargs)
+
+    mongomock.collection.Collection.aggregate = aggregate_without_percentile
+
+    # Called recursively on every stored document (and query), leaf by leaf
+    normalize = mongomock.helpers.patch_datetime_awareness_in_document
+
+    def normalize_like_bson(value):
+        value = normalize(value)
+        return value.value if isinstance(value, Enum) else value
+
+    mongomock.helpers.patch_datetime_awareness_in_document = normalize_like_bson
+    _patched = True
+
+
+def new_client():
+    """A fresh, empty in-process client"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    patch_mongomock()
+    return AsyncMongoMockClient()
+
+
+def use_mongomock():
+    """Replace the Motor client with an in-process mongomock stand-in"""
+    async def connect():
+        return database.bind(new_client())
+
+    async def warm_up(connections: int = 0):
+        pass
+
+    database.connect = connect
+    database.warm_up = warm_up
+    database.close = lambda: None
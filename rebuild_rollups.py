@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Rebuild the derived data the API keeps current on its own writes
+Recomputes the inspection-due rollup and the per-coach summaries from the stored
+wheels and checksheets, on the backend selected by STORAGE_BACKEND, then bumps
+the collection versions behind the API's ETags so cached listings are not
+revalidated against the old data. Run it after loading data outside the API, or
+whenever a rollup looks stale. Writes made while a rebuild runs may be missed,
+so prefer a quiet moment.
+
+Usage:
+    python rebuild_rollups.py
+    python rebuild_rollups.py --only summaries
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.repository import NAMESPACES, repository
+
+REBUILDS = {
+    "due": ("inspection-due rollup", repository.rebuild_due_rollup),
+    "summaries": ("coach summaries", repository.rebuild_coach_summaries),
+}
+
+
+async def rebuild(names):
+    await repository.connect()
+    try:
+        for name in names:
+            label, run = REBUILDS[name]
+            started = time.perf_counter()
+            coaches = await run()
+            print(f"📅 Rebuilt the {label} for {coaches} coaches in {time.perf_counter() - started:.1f}s")
+        for namespace in NAMESPACES:
+            await repository.bump_collection_version(namespace)
+        print(f"🏷  Bumped the {' and '.join(NAMESPACES)} versions; clients will refetch")
+    finally:
+        await repository.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the API's rollups from stored data")
+    parser.add_argument("--only", choices=sorted(REBUILDS), help="rebuild just one of them")
+    args = parser.parse_args()
+
+    print(f"🔄 Rebuilding rollups on {repository.label}...")
+    asyncio.run(rebuild([args.only] if args.only else list(REBUILDS)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,366 +1,302 @@
 #!/usr/bin/env python3
 """
-Database seeding script for KPA Form Data API
-Populates the database with sample data for testing and demonstration
+Synthetic data generator for KPA Form Data API
+Writes realistic wheel specifications and bogie checksheets straight into MongoDB
+with batched insert_many calls spread over worker processes. Output is fully
+determined by --seed, so two runs with the same arguments produce the same data.
+
+Fleet model:
+    coach -> 2 bogies -> 2 axles each -> 2 wheels (LEFT/RIGHT) = 8 wheels per coach
+    Wheel diameters wear down from 915 mm with months in service and are reprofiled
+    in ~5 mm steps; rim and flange dimensions follow the diameter, and condition,
+    cracks and status are drawn from the remaining wear margin.
+
+Usage:
+    python seed_data.py --wheels 1000000 --checksheets 200000 --drop
+    python seed_data.py --wheels 8000 --checksheets 1000 --seed 7 --workers 2
 """
 
+import argparse
+import asyncio
+import math
 import os
-import sys
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-
-# Add the app directory to the path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
-
-from app.database import SessionLocal, engine
-from app.models import Base, BogieChecksheet, WheelSpecification
-
-def create_tables():
-    """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully")
-
-def seed_bogie_checksheets(db: Session):
-    """Seed bogie checksheet data"""
-    print("🚂 Seeding bogie checksheet data...")
-    
-    bogie_checksheets = [
-        {
-            "bogie_number": "BG001",
-            "coach_number": "CH001",
-            "inspection_date": datetime.now() - timedelta(days=1),
-            "inspector_name": "John Doe",
-            "bogie_frame_condition": "GOOD",
-            "bolster": "GOOD",
-            "bolster_suspension_bracket": "WORN",
-            "axle_guide": "GOOD",
-            "lower_spring_seat": "GOOD",
-            "adjusting_tube": "GOOD",
-            "cylinder_body": "GOOD",
-            "piston_trunnion": "WORN",
-            "plunger_spring": "GOOD",
-            "remarks": "Regular inspection completed. Minor wear on suspension bracket.",
-            "overall_status": "COMPLETED"
-        },
-        {
-            "bogie_number": "BG002",
-            "coach_number": "CH002",
-            "inspection_date": datetime.now() - timedelta(days=2),
-            "inspector_name": "Jane Smith",
-            "bogie_frame_condition": "GOOD",
-            "bolster": "WORN",
-            "bolster_suspension_bracket": "CRACKED",
-            "axle_guide": "DAMAGED",
-            "lower_spring_seat": "GOOD",
-            "adjusting_tube": "WORN OUT",
-            "cylinder_body": "GOOD",
-            "piston_trunnion": "GOOD",
-            "plunger_spring": "DAMAGED",
-            "remarks": "Multiple issues found. Requires immediate maintenance.",
-            "overall_status": "NEEDS_REPAIR"
-        },
-        {
-            "bogie_number": "BG003",
-            "coach_number": "CH003",
-            "inspection_date": datetime.now() - timedelta(days=3),
-            "inspector_name": "Mike Johnson",
-            "bogie_frame_condition": "GOOD",
-            "bolster": "GOOD",
-            "bolster_suspension_bracket": "GOOD",
-            "axle_guide": "GOOD",
-            "lower_spring_seat": "WORN",
-            "adjusting_tube": "GOOD",
-            "cylinder_body": "WORN",
-            "piston_trunnion": "GOOD",
-            "plunger_spring": "GOOD",
-            "remarks": "Minor wear on spring seat and cylinder body. Scheduled for next maintenance cycle.",
-            "overall_status": "COMPLETED"
-        },
-        {
-            "bogie_number": "BG004",
-            "coach_number": "CH004",
-            "inspection_date": datetime.now() - timedelta(days=5),
-            "inspector_name": "Sarah Wilson",
-            "bogie_frame_condition": "WORN",
-            "bolster": "GOOD",
-            "bolster_suspension_bracket": "GOOD",
-            "axle_guide": "GOOD",
-            "lower_spring_seat": "GOOD",
-            "adjusting_tube": "GOOD",
-            "cylinder_body": "GOOD",
-            "piston_trunnion": "GOOD",
-            "plunger_spring": "GOOD",
-            "remarks": "Bogie frame showing wear patterns. Monitor for next inspection.",
-            "overall_status": "COMPLETED"
-        },
-        {
-            "bogie_number": "BG005",
-            "coach_number": "CH005",
-            "inspection_date": datetime.now() - timedelta(hours=6),
-            "inspector_name": "David Brown",
-            "bogie_frame_condition": "GOOD",
-            "bolster": "GOOD",
-            "bolster_suspension_bracket": "GOOD",
-            "axle_guide": "GOOD",
-            "lower_spring_seat": "GOOD",
-            "adjusting_tube": "GOOD",
-            "cylinder_body": "GOOD",
-            "piston_trunnion": "GOOD",
-            "plunger_spring": "GOOD",
-            "remarks": "Excellent condition. All components within specifications.",
-            "overall_status": "COMPLETED"
+
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+from app.config import MONGO_DB_NAME, MONGO_URI
+from app.search import add_search_fields
+
+WHEELS_PER_COACH = 8
+BOGIES_PER_COACH = 2
+NEW_DIAMETER = 915.0
+CONDEMNING_DIAMETER = 845.0
+REPROFILE_STEP = 5.0
+
+MANUFACTURERS = [
+    ("ABC Wheels Ltd", 0.35), ("XYZ Rail Components", 0.25),
+    ("Premier Rail Works", 0.25), ("Old Rail Co", 0.15),
+]
+MATERIAL_GRADES = [("R7", 0.6), ("R8", 0.3), ("R6", 0.1)]
+WEAR_PATTERNS = ["Normal wear", "Even wear", "Minimal wear", "Uneven wear", "Hollow tread", "Flat spot"]
+INSPECTORS = [f"{first} {last}" for first in ("John", "Jane", "Mike", "Sarah", "David", "Priya", "Arjun", "Meera")
+              for last in ("Doe", "Smith", "Johnson", "Wilson", "Brown", "Rao", "Singh", "Nair")]
+COMPONENT_CONDITIONS = [("GOOD", 0.78), ("WORN", 0.14), ("WORN OUT", 0.04), ("DAMAGED", 0.03), ("CRACKED", 0.01)]
+
+# Reference "now" so generated dates do not depend on when the generator runs
+EPOCH = datetime(2025, 7, 1)
+
+
+def weighted(rng: random.Random, choices):
+    """Pick a value from (value, weight) pairs"""
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def chunk_rng(seed: int, kind: str, start: int) -> random.Random:
+    """Independent, reproducible random stream for one chunk of documents"""
+    return random.Random(f"{seed}:{kind}:{start}")
+
+
+def generate_wheels(start: int, stop: int, seed: int):
+    """Yield wheel documents for wheel indices [start, stop); start must be coach-aligned"""
+    rng = chunk_rng(seed, "wheels", start)
+    for coach in range(start // WHEELS_PER_COACH, math.ceil(stop / WHEELS_PER_COACH)):
+        # Coach-level history shared by its eight wheels
+        months_in_service = rng.uniform(0, 240)
+        commissioned = EPOCH - timedelta(days=months_in_service * 30.4)
+        manufacturer = weighted(rng, MANUFACTURERS)
+        grade = weighted(rng, MATERIAL_GRADES)
+        last_inspection = EPOCH - timedelta(days=rng.uniform(0, 120))
+        inspector = rng.choice(INSPECTORS)
+        retired_coach = rng.random() < 0.02
+
+        for slot in range(WHEELS_PER_COACH):
+            index = coach * WHEELS_PER_COACH + slot
+            if index < start or index >= stop:
+                continue
+            bogie, axle, side = slot // 4, (slot // 2) % 2, slot % 2
+
+            # Tread wear ~0.3 mm/month with per-wheel variation; reprofiling removes
+            # material in steps once the flange is worn, until the wheel is condemned
+            wear = months_in_service * max(rng.gauss(0.3, 0.08), 0.05)
+            reprofiles = int(wear // 12)
+            diameter = max(NEW_DIAMETER - wear - reprofiles * REPROFILE_STEP * 0.4, CONDEMNING_DIAMETER - 5)
+            margin = (diameter - CONDEMNING_DIAMETER) / (NEW_DIAMETER - CONDEMNING_DIAMETER)
+            since_reprofile = wear % 12
+
+            cracked = rng.random() < 0.012
+            if cracked:
+                condition = "CRACKED"
+            elif rng.random() < 0.02:
+                condition = "DAMAGED"
+            elif margin < 0.1:
+                condition = "WORN OUT"
+            elif margin < 0.45 or since_reprofile > 9:
+                condition = "WORN"
+            else:
+                condition = "GOOD"
+
+            if retired_coach or diameter <= CONDEMNING_DIAMETER:
+                status = "RETIRED"
+            elif cracked or rng.random() < 0.03:
+                status = "INACTIVE"
+            else:
+                status = "ACTIVE"
+
+            next_due = last_inspection + timedelta(days=rng.choice((60, 90, 90, 120)))
+            remarks = None
+            if condition != "GOOD":
+                remarks = f"{condition.title()} on inspection; margin {max(margin, 0) * 100:.0f}%"
+
+            doc = {
+                "wheel_number": f"WH{index:08d}",
+                "axle_number": f"AX{coach * 4 + bogie * 2 + axle:08d}",
+                "coach_number": f"CH{coach:06d}",
+                "position": "LEFT" if side == 0 else "RIGHT",
+                "wheel_diameter": round(diameter, 1),
+                "rim_thickness": round(max(30.0 - (NEW_DIAMETER - diameter) / 2 * 0.4, 18.0), 1),
+                "flange_height": round(28.5 + since_reprofile * 0.35 + rng.uniform(-0.3, 0.3), 1),
+                "flange_thickness": round(max(28.5 - since_reprofile * 0.55 + rng.uniform(-0.3, 0.3), 22.0), 1),
+                "condition": condition,
+                "wear_pattern": rng.choice(WEAR_PATTERNS),
+                "cracks_detected": cracked,
+                "manufacturer": manufacturer,
+                "manufacture_date": commissioned - timedelta(days=rng.uniform(30, 365)),
+                "material_grade": grade,
+                "last_inspection_date": last_inspection,
+                "next_inspection_due": next_due,
+                "inspector_name": inspector,
+                "load_capacity": 22500.0 if grade != "R6" else 20000.0,
+                "speed_rating": "160 km/h" if grade == "R6" else "200 km/h",
+                "remarks": remarks,
+                "status": status,
+                "created_at": last_inspection,
+                "updated_at": last_inspection,
+            }
+            yield add_search_fields(doc)
+
+
+def generate_checksheets(start: int, stop: int, seed: int, coaches: int):
+    """Yield checksheets [start, stop): bogies are inspected round-robin, ~monthly"""
+    rng = chunk_rng(seed, "checksheets", start)
+    bogies = max(coaches, 1) * BOGIES_PER_COACH
+    for index in range(start, stop):
+        bogie = index % bogies
+        round_number = index // bogies
+        inspected = EPOCH - timedelta(days=round_number * 30 + rng.uniform(0, 25))
+        bogie_checksheet = {
+            field: weighted(rng, COMPONENT_CONDITIONS)
+            for field in ("bogie_frame_condition", "bolster", "bolster_suspension_bracket",
+                          "axle_guide", "lower_spring_seat")
+        }
+        bmbc_checksheet = {
+            field: weighted(rng, COMPONENT_CONDITIONS)
+            for field in ("adjusting_tube", "cylinder_body", "piston_trunnion", "plunger_spring")
         }
-    ]
-    
-    for checksheet_data in bogie_checksheets:
-        checksheet = BogieChecksheet(**checksheet_data)
-        db.add(checksheet)
-    
-    db.commit()
-    print(f"✅ Added {len(bogie_checksheets)} bogie checksheet records")
-
-def seed_wheel_specifications(db: Session):
-    """Seed wheel specification data"""
-    print("🎡 Seeding wheel specification data...")
-    
-    wheel_specifications = [
-        {
-            "wheel_number": "WH001",
-            "axle_number": "AX001",
-            "coach_number": "CH001",
-            "position": "LEFT",
-            "wheel_diameter": 915.0,
-            "rim_thickness": 28.0,
-            "flange_height": 25.0,
-            "flange_thickness": 32.0,
-            "condition": "GOOD",
-            "wear_pattern": "Normal wear",
-            "cracks_detected": False,
-            "manufacturer": "ABC Wheels Ltd",
-            "manufacture_date": datetime(2024, 1, 15),
-            "material_grade": "R7",
-            "last_inspection_date": datetime.now() - timedelta(days=30),
-            "next_inspection_due": datetime.now() + timedelta(days=60),
-            "inspector_name": "John Doe",
-            "load_capacity": 22500.0,
-            "speed_rating": "200 km/h",
-            "remarks": "Wheel in excellent condition",
-            "status": "ACTIVE"
-        },
-        {
-            "wheel_number": "WH002",
-            "axle_number": "AX001",
-            "coach_number": "CH001",
-            "position": "RIGHT",
-            "wheel_diameter": 913.5,
-            "rim_thickness": 27.5,
-            "flange_height": 24.8,
-            "flange_thickness": 31.5,
-            "condition": "WORN",
-            "wear_pattern": "Even wear",
-            "cracks_detected": False,
-            "manufacturer": "ABC Wheels Ltd",
-            "manufacture_date": datetime(2024, 1, 15),
-            "material_grade": "R7",
-            "last_inspection_date": datetime.now() - timedelta(days=30),
-            "next_inspection_due": datetime.now() + timedelta(days=30),
-            "inspector_name": "John Doe",
-            "load_capacity": 22500.0,
-            "speed_rating": "200 km/h",
-            "remarks": "Minor wear detected, within acceptable limits",
-            "status": "ACTIVE"
-        },
-        {
-            "wheel_number": "WH003",
-            "axle_number": "AX002",
-            "coach_number": "CH002",
-            "position": "LEFT",
-            "wheel_diameter": 910.0,
-            "rim_thickness": 26.0,
-            "flange_height": 23.5,
-            "flange_thickness": 30.0,
-            "condition": "WORN OUT",
-            "wear_pattern": "Irregular wear",
-            "cracks_detected": True,
-            "manufacturer": "XYZ Rail Components",
-            "manufacture_date": datetime(2023, 6, 10),
-            "material_grade": "R8",
-            "last_inspection_date": datetime.now() - timedelta(days=15),
-            "next_inspection_due": datetime.now() + timedelta(days=7),
-            "inspector_name": "Jane Smith",
-            "load_capacity": 22500.0,
-            "speed_rating": "200 km/h",
-            "remarks": "Immediate replacement required due to cracks",
-            "status": "INACTIVE"
-        },
-        {
-            "wheel_number": "WH004",
-            "axle_number": "AX002",
-            "coach_number": "CH002",
-            "position": "RIGHT",
-            "wheel_diameter": 912.0,
-            "rim_thickness": 27.0,
-            "flange_height": 24.2,
-            "flange_thickness": 31.0,
-            "condition": "GOOD",
-            "wear_pattern": "Minimal wear",
-            "cracks_detected": False,
-            "manufacturer": "XYZ Rail Components",
-            "manufacture_date": datetime(2023, 6, 10),
-            "material_grade": "R8",
-            "last_inspection_date": datetime.now() - timedelta(days=15),
-            "next_inspection_due": datetime.now() + timedelta(days=75),
-            "inspector_name": "Jane Smith",
-            "load_capacity": 22500.0,
-            "speed_rating": "200 km/h",
-            "remarks": "Good condition, continue monitoring",
-            "status": "ACTIVE"
-        },
-        {
-            "wheel_number": "WH005",
-            "axle_number": "AX003",
-            "coach_number": "CH003",
-            "position": "LEFT",
-            "wheel_diameter": 914.0,
-            "rim_thickness": 27.8,
-            "flange_height": 24.9,
-            "flange_thickness": 31.8,
-            "condition": "GOOD",
-            "wear_pattern": "Normal wear",
-            "cracks_detected": False,
-            "manufacturer": "Premier Rail Works",
-            "manufacture_date": datetime(2024, 3, 20),
-            "material_grade": "R7",
-            "last_inspection_date": datetime.now() - timedelta(days=45),
-            "next_inspection_due": datetime.now() + timedelta(days=45),
-            "inspector_name": "Mike Johnson",
-            "load_capacity": 22500.0,
-            "speed_rating": "200 km/h",
-            "remarks": "New wheel performing well",
-            "status": "ACTIVE"
-        },
-        {
-            "wheel_number": "WH006",
-            "axle_number": "AX003",
-            "coach_number": "CH003",
-            "position": "RIGHT",
-            "wheel_diameter": 914.2,
-            "rim_thickness": 28.0,
-            "flange_height": 25.0,
-            "flange_thickness": 32.0,
-            "condition": "GOOD",
-            "wear_pattern": "Normal wear",
-            "cracks_detected": False,
-            "manufacturer": "Premier Rail Works",
-            "manufacture_date": datetime(2024, 3, 20),
-            "material_grade": "R7",
-            "last_inspection_date": datetime.now() - timedelta(days=45),
-            "next_inspection_due": datetime.now() + timedelta(days=45),
-            "inspector_name": "Mike Johnson",
-            "load_capacity": 22500.0,
-            "speed_rating": "200 km/h",
-            "remarks": "New wheel performing excellently",
-            "status": "ACTIVE"
-        },
-        {
-            "wheel_number": "WH007",
-            "axle_number": "AX004",
-            "coach_number": "CH004",
-            "position": "LEFT",
-            "wheel_diameter": 908.0,
-            "rim_thickness": 25.0,
-            "flange_height": 22.5,
-            "flange_thickness": 29.0,
-            "condition": "DAMAGED",
-            "wear_pattern": "Severe wear",
-            "cracks_detected": True,
-            "manufacturer": "Old Rail Co",
-            "manufacture_date": datetime(2022, 8, 5),
-            "material_grade": "R6",
-            "last_inspection_date": datetime.now() - timedelta(days=10),
-            "next_inspection_due": datetime.now() - timedelta(days=5),
-            "inspector_name": "Sarah Wilson",
-            "load_capacity": 22500.0,
-            "speed_rating": "200 km/h",
-            "remarks": "Critical condition - immediate replacement required",
-            "status": "RETIRED"
-        },
-        {
-            "wheel_number": "WH008",
-            "axle_number": "AX004",
-            "coach_number": "CH004",
-            "position": "RIGHT",
-            "wheel_diameter": 911.0,
-            "rim_thickness": 26.5,
-            "flange_height": 23.8,
-            "flange_thickness": 30.5,
-            "condition": "WORN",
-            "wear_pattern": "Uneven wear",
-            "cracks_detected": False,
-            "manufacturer": "Old Rail Co",
-            "manufacture_date": datetime(2022, 8, 5),
-            "material_grade": "R6",
-            "last_inspection_date": datetime.now() - timedelta(days=10),
-            "next_inspection_due": datetime.now() + timedelta(days=20),
-            "inspector_name": "Sarah Wilson",
-            "load_capacity": 22500.0,
-            "speed_rating": "200 km/h",
-            "remarks": "Showing wear patterns, monitor closely",
-            "status": "ACTIVE"
+        defects = [v for v in (*bogie_checksheet.values(), *bmbc_checksheet.values()) if v != "GOOD"]
+        yield {
+            "bogie_details": {
+                "bogie_number": f"BG{bogie:07d}",
+                "coach_number": f"CH{bogie // BOGIES_PER_COACH:06d}",
+                "inspection_date": inspected,
+                "inspector_name": rng.choice(INSPECTORS),
+            },
+            "bogie_checksheet": bogie_checksheet,
+            "bmbc_checksheet": bmbc_checksheet,
+            "remarks": f"{len(defects)} components need attention" if defects else "All components good",
+            "overall_status": "COMPLETED",
+            "created_at": inspected,
         }
-    ]
-    
-    for wheel_data in wheel_specifications:
-        wheel = WheelSpecification(**wheel_data)
-        db.add(wheel)
-    
-    db.commit()
-    print(f"✅ Added {len(wheel_specifications)} wheel specification records")
+
+
+# One client per worker process, created by the pool initializer
+_client = None
+
+
+def _init_worker(uri: str):
+    global _client
+    _client = MongoClient(uri, compressors="zlib")
+
+
+def insert_chunk(kind: str, start: int, stop: int, seed: int, db_name: str,
+                 batch_size: int, coaches: int) -> int:
+    """Generate one chunk and write it with unordered insert_many batches"""
+    collection = _client[db_name]["responses" if kind == "wheels" else "forms"]
+    if kind == "wheels":
+        docs = generate_wheels(start, stop, seed)
+    else:
+        docs = generate_checksheets(start, stop, seed, coaches)
+    inserted = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            inserted += _insert(collection, batch)
+            batch = []
+    if batch:
+        inserted += _insert(collection, batch)
+    return inserted
+
+
+def _insert(collection, batch) -> int:
+    try:
+        return len(collection.insert_many(batch, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        # Re-running without --drop hits the unique wheel_number index; skip those
+        return e.details.get("nInserted", 0)
+
+
+def seed(uri: str, db_name: str, wheels: int, checksheets: int, seed_value: int,
+         workers: int, batch_size: int, chunk_size: int = 20000) -> dict:
+    """Fan chunk inserts out over worker processes; returns documents inserted per kind"""
+    chunk_size -= chunk_size % WHEELS_PER_COACH
+    coaches = math.ceil(wheels / WHEELS_PER_COACH)
+    tasks = [("wheels", s, min(s + chunk_size, wheels)) for s in range(0, wheels, chunk_size)]
+    tasks += [("checksheets", s, min(s + chunk_size, checksheets)) for s in range(0, checksheets, chunk_size)]
+    totals = {"wheels": 0, "checksheets": 0}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(uri,)) as pool:
+        futures = {
+            pool.submit(insert_chunk, kind, start, stop, seed_value, db_name, batch_size, coaches): kind
+            for kind, start, stop in tasks
+        }
+        for future in as_completed(futures):
+            totals[futures[future]] += future.result()
+    return totals
+
+
+async def build_indexes():
+    """Build the API's indexes once the bulk load is done"""
+    from app import database
+    await database.connect()
+    try:
+        await database.ensure_indexes()
+    finally:
+        database.close()
+
+
+async def rebuild_rollups():
+    """Recompute the inspection-due rollup and coach summaries, which bulk loads bypass,
+    and move the ETag versions on so clients stop getting 304 for the old data"""
+    from app.mongo_repository import MongoRepository
+    from app.repository import NAMESPACES
+    repository = MongoRepository()
+    await repository.connect()
+    try:
+        rollups = await repository.rebuild_due_rollup(), await repository.rebuild_coach_summaries()
+        for namespace in NAMESPACES:
+            await repository.bump_collection_version(namespace)
+        return rollups
+    finally:
+        await repository.close()
+
 
 def main():
     """Main seeding function"""
+    parser = argparse.ArgumentParser(description="Generate synthetic KPA form data in MongoDB")
+    parser.add_argument("--wheels", type=int, default=8000)
+    parser.add_argument("--checksheets", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=5000, help="documents per insert_many")
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=MONGO_DB_NAME)
+    parser.add_argument("--drop", action="store_true",
+                        help="drop both collections first and build indexes after loading")
+    args = parser.parse_args()
+
     print("🌱 Starting database seeding process...")
-    
-    # Create database session
-    db = SessionLocal()
-    
-    try:
-        # Create tables if they don't exist
-        create_tables()
-        
-        # Check if data already exists
-        existing_bogies = db.query(BogieChecksheet).count()
-        existing_wheels = db.query(WheelSpecification).count()
-        
-        if existing_bogies > 0 or existing_wheels > 0:
-            print(f"⚠️  Existing data found: {existing_bogies} bogie checksheets, {existing_wheels} wheel specifications")
-            response = input("Do you want to continue and add more sample data? (y/N): ")
-            if response.lower() != 'y':
-                print("❌ Seeding cancelled")
-                return
-        
-        # Seed the data
-        seed_bogie_checksheets(db)
-        seed_wheel_specifications(db)
-        
-        # Print summary
-        total_bogies = db.query(BogieChecksheet).count()
-        total_wheels = db.query(WheelSpecification).count()
-        
-        print("\n🎉 Database seeding completed successfully!")
-        print(f"📊 Total records in database:")
-        print(f"   - Bogie Checksheets: {total_bogies}")
-        print(f"   - Wheel Specifications: {total_wheels}")
-        print(f"\n🚀 You can now start the API server and test the endpoints!")
-        print(f"   - Start server: python -m app.main")
-        print(f"   - API Docs: http://localhost:8000/docs")
-        print(f"   - Health Check: http://localhost:8000/")
-        
-    except Exception as e:
-        print(f"❌ Error during seeding: {str(e)}")
-        db.rollback()
-    finally:
-        db.close()
+    if args.drop:
+        client = MongoClient(args.uri)
+        client[args.db].drop_collection("responses")
+        client[args.db].drop_collection("forms")
+        client.close()
+        print("🧹 Dropped existing wheel specifications and checksheets")
+
+    started = time.perf_counter()
+    totals = seed(args.uri, args.db, args.wheels, args.checksheets, args.seed,
+                  args.workers, args.batch_size)
+    elapsed = time.perf_counter() - started
+    inserted = totals["wheels"] + totals["checksheets"]
+    print(f"✅ Added {totals['wheels']} wheel specifications and {totals['checksheets']} bogie checksheets")
+    print(f"   - {elapsed:.1f}s with {args.workers} workers ({inserted / elapsed * 60:,.0f} docs/min)")
+
+    if args.drop:
+        index_started = time.perf_counter()
+        asyncio.run(build_indexes())
+        print(f"🗂  Built indexes in {time.perf_counter() - index_started:.1f}s")
+
+    due_coaches, summary_coaches = asyncio.run(rebuild_rollups())
+    print(f"📅 Rebuilt the inspection-due rollup ({due_coaches} coaches) and {summary_coaches} coach summaries")
+
+    print("\n🚀 You can now start the API server and test the endpoints!")
+    print("   - Start server: uvicorn app.main:app --reload")
+    print("   - API Docs: http://localhost:8000/docs")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+# Contract tests run against real servers: MONGO_URI and the PostgreSQL server in
+# POSTGRES_URL (see app/config.py). A backend that cannot be reached is skipped.
+# They never touch the application's databases: each run uses its own
+# kpa_test_<id> database on both servers and drops it at the end. Set
+# TEST_MONGO_DB_NAME / TEST_POSTGRES_URL to use a database of your own instead
+# (kept afterwards); pointing those at the application's databases is refused
+# unless TEST_ALLOW_APP_DB=1. Every test works under its own random coach number.
+# API tests run the app in process on the mongomock stand-in from
+# benchmarks/mongomock_backend.py, with a fresh in-memory database per test.
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app import config
+
+TEST_DB_NAME = f"kpa_test_{uuid.uuid4().hex[:8]}"
+
+app_postgres_url = make_url(config.POSTGRES_URL)
+test_mongo_db = os.getenv("TEST_MONGO_DB_NAME", TEST_DB_NAME)
+test_postgres_url = make_url(os.getenv("TEST_POSTGRES_URL", app_postgres_url.set(database=TEST_DB_NAME)))
+
+if os.getenv("TEST_ALLOW_APP_DB", "").lower() not in ("1", "true", "yes"):
+    if test_mongo_db == config.MONGO_DB_NAME:
+        raise pytest.UsageError(
+            f"Refusing to run tests in the application database {config.MONGO_DB_NAME!r}; "
+            "set TEST_MONGO_DB_NAME to another database or TEST_ALLOW_APP_DB=1"
+        )
+    if (test_postgres_url.host, test_postgres_url.port, test_postgres_url.database) == (
+        app_postgres_url.host, app_postgres_url.port, app_postgres_url.database
+    ):
+        raise pytest.UsageError(
+            f"Refusing to run tests in the application database {app_postgres_url.database!r}; "
+            "set TEST_POSTGRES_URL to another database or TEST_ALLOW_APP_DB=1"
+        )
+
+# Read by app.database and app.postgres_repository when they are imported below
+config.MONGO_DB_NAME = test_mongo_db
+config.POSTGRES_URL = test_postgres_url.render_as_string(hide_password=False)
+
+from app.repository import create_repository
+
+BACKENDS = ("mongo", "postgres")
+
+# Backends that already failed to connect, so later tests skip without waiting
+unreachable = {}
+
+
+async def create_postgres_database():
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(test_postgres_url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f'CREATE DATABASE "{test_postgres_url.database}"'))
+    finally:
+        await engine.dispose()
+
+
+async def drop_postgres_database():
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(test_postgres_url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{test_postgres_url.database}" WITH (FORCE)'))
+    finally:
+        await engine.dispose()
+
+
+async def drop_mongo_database():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(config.MONGO_URI, serverSelectionTimeoutMS=5000)
+    try:
+        await client.drop_database(test_mongo_db)
+    finally:
+        client.close()
+
+
+# Per backend, the coroutine function that drops the run's database at the end;
+# only databases this run named itself are dropped
+@pytest.fixture(scope="session")
+def created_databases():
+    created = {}
+    yield created
+    for drop in created.values():
+        asyncio.run(drop())
+
+
+# One event loop for the session: the app's module-level workers keep asyncio
+# primitives that stay bound to the loop they first ran on
+@pytest.fixture(scope="session")
+def run():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(params=BACKENDS)
+def repo(request, run, created_databases):
+    if request.param in unreachable:
+        pytest.skip(unreachable[request.param])
+    repository = create_repository(request.param)
+    try:
+        if request.param == "postgres" and "postgres" not in created_databases and "TEST_POSTGRES_URL" not in os.environ:
+            run(create_postgres_database())
+            created_databases["postgres"] = drop_postgres_database
+        run(repository.connect())
+        run(asyncio.wait_for(repository.warm_up(), 10))
+        if request.param == "mongo" and "TEST_MONGO_DB_NAME" not in os.environ:
+            created_databases["mongo"] = drop_mongo_database
+        run(repository.ensure_indexes())
+    except Exception as e:
+        run(repository.close())
+        unreachable[request.param] = f"{repository.label} unreachable: {e}"
+        pytest.skip(unreachable[request.param])
+    yield repository
+    run(repository.close())
+
+
+@pytest.fixture
+def coach():
+    return f"T{uuid.uuid4().hex[:10].upper()}"
+
+
+# httpx client for the app, started through its lifespan on an empty stand-in
+# database. Fixtures that patch app internals must run before this one.
+@pytest.fixture
+def api(run, monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    pytest.importorskip("mongomock_motor")
+    from mongomock_backend import new_client
+
+    from app import database
+    from app.main import app
+    from app.repository import repository
+    from app.routes import query_cache
+
+    if repository.name != "mongo":
+        pytest.skip("API tests run on the MongoDB backend (STORAGE_BACKEND=mongo)")
+    client = new_client()
+
+    async def connect():
+        return database.bind(client)
+
+    async def warm_up(connections: int = 0):
+        pass
+
+    monkeypatch.setattr(database, "connect", connect)
+    monkeypatch.setattr(database, "warm_up", warm_up)
+    monkeypatch.setattr(database, "close", lambda: None)
+    run(query_cache.clear())
+    lifespan = app.router.lifespan_context(app)
+    run(lifespan.__aenter__())
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    yield http
+    run(http.aclose())
+    run(lifespan.__aexit__(None, None, None))
@@ -0,0 +1,112 @@
+import json
+
+from app import routes
+
+# Bulk wheel upload through the API, on the mongomock stand-in
+
+API = "/api/api"
+WHEELS = f"{API}/forms/wheel-specifications"
+BULK = f"{WHEELS}/bulk"
+
+
+def wheel(coach, number):
+    return {
+        "wheel_number": f"{coach}-{number}",
+        "axle_number": f"{coach}-AX",
+        "coach_number": coach,
+        "wheel_diameter": 900.0,
+    }
+
+
+def statuses(response):
+    return [result["status"] for result in response.json()["data"]["results"]]
+
+
+def stored(api, run, coach):
+    response = run(api.get(WHEELS, params={"coach_number": coach, "match": "exact"}))
+    return response.json()["total"]
+
+
+def test_every_item_gets_a_result(api, run, coach):
+    response = run(api.post(BULK, json=[wheel(coach, n) for n in range(3)]))
+    body = response.json()
+
+    assert response.status_code == 200
+    assert body["success"] is True
+    assert body["data"]["total"] == body["data"]["created"] == 3
+    assert [(r["index"], r["wheel_number"]) for r in body["data"]["results"]] == [
+        (n, f"{coach}-{n}") for n in range(3)
+    ]
+    assert all(r["id"] for r in body["data"]["results"])
+    assert stored(api, run, coach) == 3
+
+
+def test_partial_failure_stores_the_valid_items(api, run, coach):
+    invalid = {**wheel(coach, 1), "wheel_diameter": "wide"}
+    response = run(api.post(BULK, json=[wheel(coach, 0), invalid, "not a wheel", wheel(coach, 3)]))
+    body = response.json()
+
+    assert response.status_code == 200
+    assert body["success"] is False
+    assert statuses(response) == ["created", "invalid", "invalid", "created"]
+    assert body["data"]["results"][1]["errors"][0]["loc"] == ["wheel_diameter"]
+    assert body["data"]["invalid"] == 2
+    assert stored(api, run, coach) == 2
+
+
+def test_duplicates_in_the_upload_and_already_stored(api, run, coach):
+    run(api.post(WHEELS, json=wheel(coach, 0)))
+
+    response = run(api.post(BULK, json=[wheel(coach, 0), wheel(coach, 1), wheel(coach, 1)]))
+
+    assert statuses(response) == ["duplicate", "created", "duplicate"]
+    assert response.json()["data"]["duplicate"] == 2
+    assert stored(api, run, coach) == 2
+
+
+def test_ordered_upload_stops_at_the_first_rejected_item(api, run, coach):
+    run(api.post(WHEELS, json=wheel(coach, 1)))
+
+    response = run(api.post(
+        BULK, params={"ordered": "true"}, json=[wheel(coach, n) for n in range(4)]
+    ))
+
+    assert statuses(response) == ["created", "duplicate", "skipped", "skipped"]
+    assert stored(api, run, coach) == 2
+
+
+def test_ndjson_upload_reports_bad_lines(api, run, coach):
+    lines = [json.dumps(wheel(coach, 0)), "{not json", json.dumps(wheel(coach, 2))]
+
+    response = run(api.post(
+        BULK, content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"}
+    ))
+
+    assert statuses(response) == ["created", "invalid", "created"]
+    assert response.json()["data"]["results"][1]["errors"][0].startswith("Line 2:")
+
+
+def test_uploads_over_the_limit_are_refused(monkeypatch, api, run, coach):
+    monkeypatch.setattr(routes, "BULK_MAX_ITEMS", 2)
+
+    response = run(api.post(BULK, json=[wheel(coach, n) for n in range(3)]))
+
+    assert response.status_code == 413
+    assert "limited to 2 items, got 3" in response.json()["detail"]
+    assert stored(api, run, coach) == 0
+
+
+def test_chunks_are_written_in_turn(monkeypatch, api, run, coach):
+    monkeypatch.setattr(routes, "BULK_CHUNK_SIZE", 2)
+
+    response = run(api.post(BULK, json=[wheel(coach, n) for n in (0, 1, 2, 0, 4)]))
+
+    assert statuses(response) == ["created", "created", "created", "duplicate", "created"]
+    assert stored(api, run, coach) == 4
+
+
+def test_malformed_array_is_rejected(api, run):
+    response = run(api.post(BULK, content=b"[1, 2", headers={"Content-Type": "application/json"}))
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid JSON array")
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app import summary
+from app.repository import repository
+
+# Coach summary maintenance through the API, on the mongomock stand-in
+
+API = "/api/api"
+
+
+def wheel(coach, number, condition="GOOD"):
+    return {
+        "wheel_number": f"{coach}-{number}",
+        "axle_number": f"{coach}-AX",
+        "coach_number": coach,
+        "wheel_diameter": 900.0,
+        "condition": condition,
+    }
+
+
+# Every worker's live feed opens, but the maintainer's resumable stream fails
+@pytest.fixture
+def failing_maintainer_stream(monkeypatch):
+    calls = {"resume": 0}
+
+    async def watch_changes(resume=False):
+        if resume:
+            calls["resume"] += 1
+            raise RuntimeError("change stream unavailable")
+        yield []
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(summary, "COACH_SUMMARY_CHANGE_STREAM", True)
+    monkeypatch.setattr(summary, "RETRY_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(repository, "watch_changes", watch_changes, raising=False)
+    return calls
+
+
+def get_summary(api, run, coach):
+    for _ in range(50):
+        response = run(api.get(f"{API}/coaches/{coach}/summary"))
+        if response.status_code == 200:
+            return response.json()["data"]
+        run(asyncio.sleep(0.05))
+    return None
+
+
+def test_summary_updates_when_the_maintainer_stream_fails(failing_maintainer_stream, api, run, coach):
+    from app.routes import coach_summaries
+
+    response = run(api.post(f"{API}/forms/wheel-specifications", json=wheel(coach, 1, "WORN")))
+    assert response.status_code == 200
+
+    data = get_summary(api, run, coach)
+    assert data is not None
+    assert data["wheel_count"] == 1
+    assert data["condition_counts"] == {"WORN": 1}
+
+    stats = coach_summaries.stats()
+    assert stats["change_stream"] == 1
+    assert stats["maintainer"] == 0
+    # Still retrying rather than given up
+    assert failing_maintainer_stream["resume"] > 1
+    assert not any(task.done() for task in coach_summaries.tasks)
+
+
+def test_summary_refreshes_are_batched_off_the_request(api, run, coach):
+    from app.routes import coach_summaries
+
+    response = run(api.post(
+        f"{API}/forms/wheel-specifications/bulk",
+        json=[wheel(coach, n) for n in range(3)]
+    ))
+    assert response.status_code == 200
+    # Queued by the write hook, not refreshed inside the request
+    assert coach in coach_summaries.pending
+
+    data = get_summary(api, run, coach)
+    assert data["wheel_count"] == 3
+    assert coach not in coach_summaries.pending
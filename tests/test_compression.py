@@ -0,0 +1,138 @@
+import gzip
+
+import pytest
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+
+# Content negotiation and the compression middleware, driven directly over ASGI
+
+CODINGS = ("zstd", "br", "gzip")
+BODY = b'{"data": "' + b"x" * 4096 + b'"}'
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("gzip, br", "br"),  # ties go to server order
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("gzip;q=0.5, br;q=0.8, zstd;q=0.1", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("identity;q=0, gzip", "gzip"),
+    ("identity;q=0", None),
+    ("identity", None),
+    ("*", "zstd"),
+    ("zstd;q=0, *", "br"),
+    ("*;q=0", None),
+    ("gzip;q=abc", None),
+    ("compress, deflate", None),
+    ("", None),
+])
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, CODINGS) == expected
+
+
+# A one-route ASGI app sending `chunks` as the body of one response
+def asgi_app(chunks, content_type="application/json", headers=()):
+    async def app(scope, receive, send):
+        raw = [(b"content-type", content_type.encode())]
+        raw += [(name.lower().encode(), value.encode()) for name, value in headers]
+        if len(chunks) == 1:
+            raw.append((b"content-length", str(len(chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": raw})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def request(run, app, accept_encoding=None, minimum_size=1024):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    run(CompressionMiddleware(app, minimum_size)(scope, receive, send))
+    start, body = messages[0], messages[1:]
+    headers = {}
+    for name, value in start["headers"]:
+        headers.setdefault(name.decode().lower(), []).append(value.decode())
+    return headers, b"".join(m.get("body", b"") for m in body)
+
+
+# The configured codings, whatever COMPRESSION_ENABLED / COMPRESSION_ENCODINGS say
+@pytest.fixture
+def codings(monkeypatch):
+    monkeypatch.setattr(compression, "CODINGS", CODINGS)
+    monkeypatch.setattr(negotiate, "__defaults__", (CODINGS,))
+
+
+def test_compresses_negotiated_response(codings, run):
+    headers, body = request(run, asgi_app([BODY]), "gzip")
+
+    assert headers["content-encoding"] == ["gzip"]
+    assert headers["vary"] == ["Accept-Encoding"]
+    assert headers["content-length"] == [str(len(body))]
+    assert gzip.decompress(body) == BODY
+
+
+def test_streamed_response_is_compressed_without_length(codings, run):
+    headers, body = request(run, asgi_app([BODY[:100], BODY[100:]]), "gzip")
+
+    assert headers["content-encoding"] == ["gzip"]
+    assert "content-length" not in headers
+    assert gzip.decompress(body) == BODY
+
+
+def test_small_response_is_sent_as_is_with_vary(codings, run):
+    headers, body = request(run, asgi_app([b'{"ok": true}']), "gzip")
+
+    assert "content-encoding" not in headers
+    assert headers["vary"] == ["Accept-Encoding"]
+    assert body == b'{"ok": true}'
+
+
+@pytest.mark.parametrize("accept_encoding", [None, "identity", "identity;q=0", "gzip;q=0"])
+def test_uncompressed_response_still_varies(codings, run, accept_encoding):
+    headers, body = request(run, asgi_app([BODY]), accept_encoding)
+
+    assert "content-encoding" not in headers
+    assert headers["vary"] == ["Accept-Encoding"]
+    assert body == BODY
+
+
+def test_vary_is_merged_with_the_apps_own(codings, run):
+    headers, _ = request(run, asgi_app([BODY], headers=[("Vary", "Origin")]), "gzip")
+
+    assert headers["vary"] == ["Origin, Accept-Encoding"]
+
+
+def test_already_encoded_response_passes_through(codings, run):
+    encoded = gzip.compress(BODY)
+    headers, body = request(run, asgi_app([encoded], headers=[("Content-Encoding", "gzip")]), "gzip")
+
+    assert headers["content-encoding"] == ["gzip"]
+    assert "vary" not in headers
+    assert body == encoded
+
+
+@pytest.mark.parametrize("content_type", ["text/event-stream", "image/png", "application/octet-stream"])
+def test_other_content_types_pass_through(codings, run, content_type):
+    headers, body = request(run, asgi_app([BODY], content_type), "gzip")
+
+    assert "content-encoding" not in headers
+    assert "vary" not in headers
+    assert body == BODY
+
+
+def test_disabled_when_no_coding_is_available(monkeypatch, run):
+    monkeypatch.setattr(compression, "CODINGS", ())
+    headers, body = request(run, asgi_app([BODY]), "gzip")
+
+    assert "content-encoding" not in headers
+    assert "vary" not in headers
+    assert body == BODY
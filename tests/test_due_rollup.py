@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from app import database
+
+# Inspection-due rollup maintenance through the API, on the mongomock stand-in
+
+API = "/api/api"
+
+
+def test_rollup_failure_does_not_fail_a_stored_wheel(api, run, coach, monkeypatch):
+    async def failing_bulk_write(*args, **kwargs):
+        raise TypeError("rollup update broke")
+
+    monkeypatch.setattr(database.due_rollup_collection, "bulk_write", failing_bulk_write)
+    body = {
+        "wheel_number": f"{coach}-1",
+        "axle_number": f"{coach}-AX",
+        "coach_number": coach,
+        "wheel_diameter": 900.0,
+        "next_inspection_due": (datetime.utcnow() + timedelta(days=3)).isoformat(),
+    }
+
+    response = run(api.post(f"{API}/forms/wheel-specifications", json=body))
+    assert response.status_code == 200
+
+    bulk = run(api.post(f"{API}/forms/wheel-specifications/bulk", json=[{**body, "wheel_number": f"{coach}-2"}]))
+    assert bulk.status_code == 200
+
+    listing = run(api.get(f"{API}/forms/wheel-specifications", params={"coach_number": coach, "match": "exact"}))
+    assert listing.json()["total"] == 2
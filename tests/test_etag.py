@@ -0,0 +1,106 @@
+from app.etag import etag_matches, make_etag
+
+# Conditional GETs: ETags follow the per-namespace write version. Route tests run
+# in process on the mongomock stand-in.
+
+API = "/api/api"
+
+
+def wheel(coach, number):
+    return {
+        "wheel_number": f"{coach}-{number}",
+        "axle_number": f"{coach}-AX",
+        "coach_number": coach,
+        "wheel_diameter": 900.0,
+    }
+
+
+def checksheet(coach, bogie="B1"):
+    return {
+        "bogie_details": {
+            "bogie_number": bogie,
+            "coach_number": coach,
+            "inspection_date": "2025-07-01T00:00:00",
+            "inspector_name": "ETag Test",
+        },
+        "bogie_checksheet": {},
+        "bmbc_checksheet": {},
+    }
+
+
+def list_wheels(api, run, coach, etag=None, **params):
+    headers = {"If-None-Match": etag} if etag else {}
+    return run(api.get(
+        f"{API}/forms/wheel-specifications",
+        params={"coach_number": coach, "match": "exact", **params}, headers=headers
+    ))
+
+
+def test_etag_weak_comparison():
+    etag = make_etag(3, "wheels:key")
+
+    assert etag.startswith('W/"3-')
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag.removeprefix("W/"), etag)
+    assert etag_matches(f'W/"0-other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag(4, "wheels:key"), etag)
+    assert make_etag(3, "wheels:other") != etag
+
+
+def test_listing_if_none_match_gets_304(api, run, coach):
+    run(api.post(f"{API}/forms/wheel-specifications", json=wheel(coach, 1)))
+
+    first = list_wheels(api, run, coach)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    again = list_wheels(api, run, coach, etag=etag)
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.content == b""
+
+    assert list_wheels(api, run, coach, etag='W/"0-stale"').status_code == 200
+    # Another query has its own tag
+    assert list_wheels(api, run, coach, limit=5).headers["ETag"] != etag
+
+
+def test_write_changes_the_etag_of_its_namespace_only(api, run, coach):
+    run(api.post(f"{API}/forms/wheel-specifications", json=wheel(coach, 1)))
+    wheels_etag = list_wheels(api, run, coach).headers["ETag"]
+
+    # A checksheet write leaves wheel listings current
+    created = run(api.post(f"{API}/forms/bogie-checksheet", json=checksheet(coach)))
+    assert list_wheels(api, run, coach, etag=wheels_etag).status_code == 304
+    checksheet_id = created.json()["data"]["id"]
+    record = run(api.get(f"{API}/forms/bogie-checksheet/{checksheet_id}"))
+    record_etag = record.headers["ETag"]
+    assert record.status_code == 200
+
+    # and a wheel write leaves checksheet reads current
+    run(api.post(f"{API}/forms/wheel-specifications", json=wheel(coach, 2)))
+    unchanged = run(api.get(
+        f"{API}/forms/bogie-checksheet/{checksheet_id}", headers={"If-None-Match": record_etag}
+    ))
+    assert unchanged.status_code == 304
+
+    # but invalidates wheel listings, which now include the new wheel
+    changed = list_wheels(api, run, coach, etag=wheels_etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != wheels_etag
+    assert changed.json()["total"] == 2
+
+
+def test_checksheet_write_changes_record_etag(api, run, coach):
+    created = run(api.post(f"{API}/forms/bogie-checksheet", json=checksheet(coach)))
+    checksheet_id = created.json()["data"]["id"]
+    etag = run(api.get(f"{API}/forms/bogie-checksheet/{checksheet_id}")).headers["ETag"]
+
+    run(api.post(f"{API}/forms/bogie-checksheet", json=checksheet(coach, "B2")))
+
+    response = run(api.get(
+        f"{API}/forms/bogie-checksheet/{checksheet_id}", headers={"If-None-Match": etag}
+    ))
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
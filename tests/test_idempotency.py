@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.repository import repository
+
+# Idempotency-Key handling on the create endpoints, on the mongomock stand-in
+
+API = "/api/api"
+WHEELS = f"{API}/forms/wheel-specifications"
+
+
+def wheel(coach, number, diameter=900.0):
+    return {
+        "wheel_number": f"{coach}-{number}",
+        "axle_number": f"{coach}-AX",
+        "coach_number": coach,
+        "wheel_diameter": diameter,
+    }
+
+
+def post(api, body, key, path=WHEELS):
+    return api.post(path, json=body, headers={"Idempotency-Key": key})
+
+
+def stored(api, run, coach):
+    response = run(api.get(WHEELS, params={"coach_number": coach, "match": "exact"}))
+    return response.json()["total"]
+
+
+# create_wheel held open on a gate, optionally failing once released
+@pytest.fixture
+def gated_create(monkeypatch):
+    create_wheel = repository.create_wheel
+    state = {"calls": 0, "error": None, "started": asyncio.Event(), "gate": asyncio.Event()}
+
+    async def gated(*args, **kwargs):
+        state["calls"] += 1
+        state["started"].set()
+        await state["gate"].wait()
+        if state["error"] is not None:
+            error, state["error"] = state["error"], None
+            raise error
+        return await create_wheel(*args, **kwargs)
+
+    monkeypatch.setattr(repository, "create_wheel", gated)
+    return state
+
+
+def test_retry_replays_the_stored_response(api, run, coach):
+    first = run(post(api, wheel(coach, 1), "replay-1"))
+    retry = run(post(api, wheel(coach, 1), "replay-1"))
+
+    assert first.status_code == retry.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert stored(api, run, coach) == 1
+
+
+def test_key_is_scoped_per_endpoint(api, run, coach):
+    run(post(api, wheel(coach, 1), "scoped-1"))
+    bulk = run(post(api, [wheel(coach, 2)], "scoped-1", path=f"{WHEELS}/bulk"))
+
+    assert bulk.status_code == 200
+    assert "Idempotent-Replayed" not in bulk.headers
+    assert stored(api, run, coach) == 2
+
+
+def test_reused_key_with_a_different_body_is_rejected(api, run, coach):
+    run(post(api, wheel(coach, 1), "reused-1"))
+    response = run(post(api, wheel(coach, 1, diameter=880.0), "reused-1"))
+
+    assert response.status_code == 422
+    assert "different request" in response.json()["detail"]
+    assert stored(api, run, coach) == 1
+
+
+def test_retry_during_the_first_request_gets_409(gated_create, api, run, coach):
+    async def scenario():
+        first = asyncio.ensure_future(post(api, wheel(coach, 1), "in-flight-1"))
+        try:
+            await asyncio.wait_for(gated_create["started"].wait(), 5)
+            retry = await post(api, wheel(coach, 1), "in-flight-1")
+        finally:
+            gated_create["gate"].set()
+        return await first, retry
+
+    first, retry = run(scenario())
+
+    assert retry.status_code == 409
+    assert "still in progress" in retry.json()["detail"]
+    assert first.status_code == 200
+    assert gated_create["calls"] == 1
+    # Once complete, the same retry replays
+    assert run(post(api, wheel(coach, 1), "in-flight-1")).headers["Idempotent-Replayed"] == "true"
+
+
+def test_server_error_releases_the_key(gated_create, api, run, coach):
+    gated_create["gate"].set()
+    gated_create["error"] = RuntimeError("primary stepped down")
+
+    failed = run(post(api, wheel(coach, 1), "released-1"))
+    retry = run(post(api, wheel(coach, 1), "released-1"))
+
+    assert failed.status_code == 500
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+    assert gated_create["calls"] == 2
+
+
+def test_client_error_is_replayed(api, run, coach):
+    run(api.post(WHEELS, json=wheel(coach, 1)))
+
+    duplicate = run(post(api, wheel(coach, 1), "client-error-1"))
+    retry = run(post(api, wheel(coach, 1), "client-error-1"))
+
+    assert duplicate.status_code == retry.status_code == 400
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == duplicate.json()
+
+
+@pytest.mark.parametrize("key", ["", "k" * 256])
+def test_key_length_is_checked(api, run, coach, key):
+    response = run(post(api, wheel(coach, 1), key))
+
+    assert response.status_code == 400
+    assert stored(api, run, coach) == 0
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+
+from app.schemas import ConditionEnum, EventTypeEnum
+
+# The live inspection feed's filters. Writes go through the API on the mongomock
+# stand-in; the endpoint's stream is read directly, since it never ends.
+
+API = "/api/api"
+
+
+def wheel(coach, number, condition="GOOD"):
+    return {
+        "wheel_number": f"{coach}-{number}",
+        "axle_number": f"{coach}-AX",
+        "coach_number": coach,
+        "wheel_diameter": 900.0,
+        "condition": condition,
+    }
+
+
+def checksheet(coach):
+    return {
+        "bogie_details": {
+            "bogie_number": f"{coach}-B1",
+            "coach_number": coach,
+            "inspection_date": "2025-07-01T00:00:00",
+            "inspector_name": "Feed Test",
+        },
+        "bogie_checksheet": {},
+        "bmbc_checksheet": {},
+    }
+
+
+def subscribe(run, event_type=None, coach_number=None, condition=None):
+    from app.routes import stream_inspection_events
+
+    response = run(stream_inspection_events(
+        event_type=EventTypeEnum(event_type) if event_type else None,
+        coach_number=coach_number,
+        condition=ConditionEnum(condition) if condition else None
+    ))
+    assert response.media_type == "text/event-stream"
+    assert run(anext(response.body_iterator)) == b"retry: 3000\n\n"
+    return response.body_iterator
+
+
+# (event, wheel_number or bogie_number) of everything the stream has delivered
+def received(run, stream):
+    async def read():
+        events = []
+        while True:
+            try:
+                chunk = await asyncio.wait_for(anext(stream), 0.2)
+            except asyncio.TimeoutError:
+                return events
+            for message in chunk.decode().strip().split("\n\n"):
+                fields = dict(line.split(": ", 1) for line in message.split("\n"))
+                data = json.loads(fields["data"])
+                events.append((
+                    fields["event"],
+                    data.get("wheel_number") or data["bogie_details"]["bogie_number"]
+                ))
+
+    return run(read())
+
+
+@pytest.fixture
+def other_coach(coach):
+    return f"{coach}X"
+
+
+def test_subscribers_receive_only_matching_events(api, run, coach, other_coach):
+    from app.routes import inspection_events
+
+    everything = subscribe(run)
+    wheels = subscribe(run, event_type="wheel")
+    checksheets = subscribe(run, event_type="checksheet", coach_number=coach)
+    one_coach = subscribe(run, coach_number=coach)
+    worn = subscribe(run, condition="WORN")
+    worn_elsewhere = subscribe(run, coach_number=other_coach, condition="WORN")
+    assert inspection_events.stats()["subscribers"] == 6
+
+    for body in (wheel(coach, 1, "WORN"), wheel(other_coach, 2, "WORN"), wheel(coach, 3)):
+        assert run(api.post(f"{API}/forms/wheel-specifications", json=body)).status_code == 200
+    assert run(api.post(f"{API}/forms/bogie-checksheet", json=checksheet(coach))).status_code == 200
+
+    w1, w2, w3 = ("wheel", f"{coach}-1"), ("wheel", f"{other_coach}-2"), ("wheel", f"{coach}-3")
+    sheet = ("checksheet", f"{coach}-B1")
+    assert received(run, everything) == [w1, w2, w3, sheet]
+    assert received(run, wheels) == [w1, w2, w3]
+    assert received(run, checksheets) == [sheet]
+    assert received(run, one_coach) == [w1, w3, sheet]
+    # A condition filter never matches checksheets
+    assert received(run, worn) == [w1, w2]
+    assert received(run, worn_elsewhere) == [w2]
+
+    # received() cancels each stream once it goes quiet, which unsubscribes it
+    assert inspection_events.stats()["subscribers"] == 0
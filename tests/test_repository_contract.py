@@ -0,0 +1,217 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.repository import DuplicateWheelError
+from app.schemas import (
+    BogieChecksheetCreate,
+    CountModeEnum,
+    MatchModeEnum,
+    StatsGroupEnum,
+    WheelSpecificationCreate,
+)
+
+# One behavioural suite for every storage backend: each test runs once per
+# backend (see conftest.py) and asserts only what the routes rely on.
+
+
+def wheel(coach, number, **fields):
+    doc = WheelSpecificationCreate(
+        wheel_number=f"{coach}-{number}",
+        axle_number=fields.pop("axle_number", f"{coach}-AX{number // 2}"),
+        coach_number=coach,
+        wheel_diameter=fields.pop("wheel_diameter", 900.0 - number),
+        **fields
+    ).dict()
+    doc["created_at"] = doc["updated_at"] = datetime.utcnow()
+    return doc
+
+
+def checksheet(coach, bogie, inspection_date):
+    data = BogieChecksheetCreate(
+        bogie_details={
+            "bogie_number": bogie,
+            "coach_number": coach,
+            "inspection_date": inspection_date,
+            "inspector_name": "Contract Test",
+        },
+        bogie_checksheet={},
+        bmbc_checksheet={},
+    )
+    return {
+        "bogie_details": data.bogie_details.dict(),
+        "bogie_checksheet": data.bogie_checksheet.dict(),
+        "bmbc_checksheet": data.bmbc_checksheet.dict(),
+        "remarks": None,
+        "overall_status": "COMPLETED",
+        "created_at": datetime.utcnow(),
+    }
+
+
+def coach_filter(coach):
+    return {"coach_number": coach, "match": MatchModeEnum.EXACT}
+
+
+def test_create_wheel_and_duplicate(repo, run, coach):
+    wheel_id = run(repo.create_wheel(wheel(coach, 1)))
+    assert wheel_id
+
+    with pytest.raises(DuplicateWheelError):
+        run(repo.create_wheel(wheel(coach, 1)))
+
+    wheels, _, total = run(repo.list_wheels(
+        coach_filter(coach), fields=None, limit=10, offset=0, cursor=None, count=CountModeEnum.EXACT
+    ))
+    assert total == 1
+    assert str(wheels[0]["id"]) == wheel_id
+    assert wheels[0]["wheel_number"] == f"{coach}-1"
+    assert "wheel_number_lc" not in wheels[0]
+
+
+def test_insert_wheels_unordered_skips_duplicates(repo, run, coach):
+    run(repo.create_wheel(wheel(coach, 2)))
+    docs = [wheel(coach, n) for n in (1, 2, 3)]
+
+    created, failed = run(repo.insert_wheels(docs, ordered=False))
+
+    assert sorted(created) == [0, 2]
+    assert failed[1][0] == "duplicate"
+
+
+def test_insert_wheels_ordered_stops_at_first_rejection(repo, run, coach):
+    run(repo.create_wheel(wheel(coach, 2)))
+    docs = [wheel(coach, n) for n in (1, 2, 3)]
+
+    created, failed = run(repo.insert_wheels(docs, ordered=True))
+
+    assert sorted(created) == [0]
+    assert failed[1][0] == "duplicate"
+    _, _, total = run(repo.list_wheels(
+        coach_filter(coach), fields=None, limit=10, offset=0, cursor=None, count=CountModeEnum.EXACT
+    ))
+    assert total == 2
+
+
+def test_list_wheels_cursor_pages_and_fields(repo, run, coach):
+    created, failed = run(repo.insert_wheels([wheel(coach, n) for n in range(5)], ordered=True))
+    assert not failed and len(created) == 5
+
+    seen, cursor = [], None
+    for _ in range(3):
+        page, cursor, _ = run(repo.list_wheels(
+            coach_filter(coach), fields=["wheel_number", "condition"], limit=2, offset=0,
+            cursor=cursor, count=CountModeEnum.NONE
+        ))
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert cursor is None
+    assert sorted(doc["wheel_number"] for doc in seen) == sorted(f"{coach}-{n}" for n in range(5))
+    assert all(set(doc) <= {"id", "wheel_number", "condition"} for doc in seen)
+
+
+def test_lookup_wheels(repo, run, coach):
+    run(repo.insert_wheels([wheel(coach, n, axle_number=f"{coach}-AX") for n in range(3)], ordered=True))
+
+    by_number = run(repo.lookup_wheels("wheel_number", [f"{coach}-0", f"{coach}-9"]))
+    assert [doc["wheel_number"] for doc in by_number] == [f"{coach}-0"]
+
+    by_axle = run(repo.lookup_wheels("axle_number", [f"{coach}-AX"]))
+    assert len(by_axle) == 3
+
+
+def test_due_wheels_and_rollup(repo, run, coach):
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    run(repo.create_wheel(wheel(coach, 0, next_inspection_due=today - timedelta(days=1))))
+    run(repo.insert_wheels([
+        wheel(coach, 1, next_inspection_due=today + timedelta(days=3)),
+        wheel(coach, 2, next_inspection_due=today + timedelta(days=3)),
+        wheel(coach, 3, next_inspection_due=today + timedelta(days=60)),
+        wheel(coach, 4, next_inspection_due=today, status="RETIRED"),
+    ], ordered=True))
+
+    due, cursor = run(repo.list_due_wheels(today + timedelta(days=7), coach, limit=2, cursor=None))
+    assert [doc["wheel_number"] for doc in due] == [f"{coach}-0", f"{coach}-1"]
+    rest, cursor = run(repo.list_due_wheels(today + timedelta(days=7), coach, limit=2, cursor=cursor))
+    assert [doc["wheel_number"] for doc in rest] == [f"{coach}-2"]
+    assert cursor is None
+
+    expected = {
+        (today - timedelta(days=1)).date(): 1,
+        (today + timedelta(days=3)).date(): 2,
+        (today + timedelta(days=60)).date(): 1,
+    }
+    assert run(repo.due_rollup(coach)) == {coach: expected}
+    run(repo.rebuild_due_rollup())
+    assert run(repo.due_rollup(coach)) == {coach: expected}
+
+
+def test_checksheets_latest_per_bogie(repo, run, coach):
+    first = run(repo.create_checksheet(checksheet(coach, "B1", datetime(2025, 1, 1))))
+    latest = run(repo.create_checksheet(checksheet(coach, "B1", datetime(2025, 3, 1))))
+    other = run(repo.create_checksheet(checksheet(coach, "B2", datetime(2025, 2, 1))))
+
+    rows, _, total = run(repo.list_checksheets(
+        {"coach_number": coach}, latest_per_bogie=True, limit=10, offset=0,
+        cursor=None, count=CountModeEnum.EXACT
+    ))
+    assert [str(row["id"]) for row in rows] == [latest, other]
+    assert total == 2
+
+    doc = run(repo.get_checksheet(first))
+    assert doc["bogie_details"]["coach_number"] == coach
+
+
+def test_insert_checksheets_is_retry_safe(repo, run, coach):
+    docs = []
+    for bogie in ("B1", "B2"):
+        doc = checksheet(coach, bogie, datetime(2025, 1, 1))
+        doc["id"] = run(repo.new_checksheet_id())
+        docs.append(doc)
+
+    run(repo.insert_checksheets(docs))
+    run(repo.insert_checksheets(docs))
+
+    _, _, total = run(repo.list_checksheets(
+        {"coach_number": coach}, latest_per_bogie=False, limit=10, offset=0,
+        cursor=None, count=CountModeEnum.EXACT
+    ))
+    assert total == 2
+
+
+def test_wheel_stats(repo, run, coach):
+    run(repo.insert_wheels([wheel(coach, n, wheel_diameter=900.0 + n) for n in range(5)], ordered=True))
+
+    rows, _ = run(repo.wheel_stats(coach_filter(coach), StatsGroupEnum.COACH_NUMBER, 10))
+
+    assert len(rows) == 1
+    row = rows[0]
+    assert row["_id"] == coach
+    assert row["count"] == 5
+    assert (row["wheel_diameter_min"], row["wheel_diameter_max"]) == (900.0, 904.0)
+    assert row["wheel_diameter_mean"] == pytest.approx(902.0)
+
+
+def test_idempotency_claim_complete_release(repo, run, coach):
+    key = f"contract:{coach}"
+
+    assert run(repo.claim_idempotency_key(key, "hash-a")) is None
+    pending = run(repo.claim_idempotency_key(key, "hash-a"))
+    assert pending["status_code"] is None
+
+    run(repo.release_idempotency_key(key))
+    assert run(repo.claim_idempotency_key(key, "hash-a")) is None
+
+    run(repo.complete_idempotency_key(key, 201, '{"ok":true}'))
+    record = run(repo.claim_idempotency_key(key, "hash-b"))
+    assert record["request_hash"] == "hash-a"
+    assert record["status_code"] == 201
+    assert record["body"] == '{"ok":true}'
+
+
+def test_collection_version(repo, run, coach):
+    namespace = f"contract-{coach}"
+    assert run(repo.collection_version(namespace)) == 0
+    run(repo.bump_collection_version(namespace))
+    run(repo.bump_collection_version(namespace))
+    assert run(repo.collection_version(namespace)) == 2
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.repository import repository
+
+# Request coalescing on the wheel listing, in process on the mongomock stand-in.
+# list_wheels is held open on a gate so requests provably overlap.
+
+API = "/api/api"
+
+
+@pytest.fixture
+def gated_listing(monkeypatch):
+    list_wheels = repository.list_wheels
+    state = {"calls": 0, "error": None, "started": asyncio.Event(), "gate": asyncio.Event()}
+
+    async def gated(*args, **kwargs):
+        state["calls"] += 1
+        state["started"].set()
+        await state["gate"].wait()
+        if state["error"] is not None:
+            raise state["error"]
+        return await list_wheels(*args, **kwargs)
+
+    monkeypatch.setattr(repository, "list_wheels", gated)
+    return state
+
+
+def listing(api, coach):
+    return api.get(f"{API}/forms/wheel-specifications", params={"coach_number": coach, "match": "exact"})
+
+
+async def wait_for_waiters(count):
+    from app.routes import listing_flights
+
+    async def joined():
+        # Followers register as coalesced before they block on the shared task
+        while listing_flights.coalesced < count:
+            await asyncio.sleep(0.001)
+
+    await asyncio.wait_for(joined(), 5)
+
+
+def test_concurrent_identical_listings_run_one_query(gated_listing, api, run, coach):
+    from app.routes import listing_flights
+
+    coalesced = listing_flights.coalesced
+
+    async def scenario():
+        requests = [asyncio.ensure_future(listing(api, coach)) for _ in range(5)]
+        try:
+            await wait_for_waiters(coalesced + 4)
+        finally:
+            gated_listing["gate"].set()
+        return await asyncio.gather(*requests)
+
+    responses = run(scenario())
+
+    assert gated_listing["calls"] == 1
+    assert [r.status_code for r in responses] == [200] * 5
+    assert sorted(r.headers["X-Cache"] for r in responses) == ["COALESCED"] * 4 + ["MISS"]
+    assert len({r.content for r in responses}) == 1
+
+
+def test_leader_error_reaches_every_waiter(gated_listing, api, run, coach):
+    from app.routes import listing_flights
+
+    coalesced = listing_flights.coalesced
+    gated_listing["error"] = RuntimeError("listing query failed")
+
+    async def scenario():
+        requests = [asyncio.ensure_future(listing(api, coach)) for _ in range(3)]
+        try:
+            await wait_for_waiters(coalesced + 2)
+        finally:
+            gated_listing["gate"].set()
+        return await asyncio.gather(*requests)
+
+    responses = run(scenario())
+
+    assert gated_listing["calls"] == 1
+    assert [r.status_code for r in responses] == [500] * 3
+    assert all("listing query failed" in r.json()["detail"] for r in responses)
+
+
+def test_cancelled_leader_does_not_strand_followers(gated_listing, api, run, coach):
+    from app.routes import listing_flights
+
+    coalesced = listing_flights.coalesced
+
+    async def scenario():
+        leader = asyncio.ensure_future(listing(api, coach))
+        await gated_listing["started"].wait()
+        followers = [asyncio.ensure_future(listing(api, coach)) for _ in range(2)]
+        try:
+            await wait_for_waiters(coalesced + 2)
+            # The leader's client goes away while the shared query is still running
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+        finally:
+            gated_listing["gate"].set()
+        return await asyncio.gather(*followers)
+
+    responses = run(scenario())
+
+    assert gated_listing["calls"] == 1
+    assert [r.status_code for r in responses] == [200, 200]
+    assert listing_flights.stats()["in_flight"] == 0
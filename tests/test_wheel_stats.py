@@ -0,0 +1,68 @@
+import pytest
+from pymongo.errors import OperationFailure
+
+from app.repository import repository
+from app.schemas import StatsGroupEnum
+
+# Wear statistics through the API, on the mongomock stand-in, which answers
+# $percentile like MongoDB before 7.0
+
+API = "/api/api"
+
+
+def wheels(coach):
+    return [
+        {
+            "wheel_number": f"{coach}-{n}",
+            "axle_number": f"{coach}-AX",
+            "coach_number": coach,
+            "wheel_diameter": 900.0 + n,
+            "manufacturer": "Stats Works",
+        }
+        for n in range(4)
+    ]
+
+
+@pytest.fixture
+def percentiles_supported(monkeypatch):
+    monkeypatch.setattr(repository, "percentiles", True)
+
+
+def test_stats_fall_back_without_percentile(percentiles_supported, api, run, coach):
+    run(api.post(f"{API}/forms/wheel-specifications/bulk", json=wheels(coach)))
+
+    response = run(api.get(
+        f"{API}/forms/wheel-specifications/stats",
+        params={"coach_number": coach, "group_by": "coach_number"}
+    ))
+
+    assert response.status_code == 200
+    assert repository.percentiles is False
+
+
+@pytest.mark.parametrize("error, falls_back", [
+    (OperationFailure("unknown group operator '$percentile'", code=15952), True),
+    (OperationFailure("Invalid $group :: caused by :: unknown group operator '$percentile'", code=40237), True),
+    (OperationFailure("percentile field exceeds limit", code=2), False),
+])
+def test_percentile_detection(percentiles_supported, api, run, coach, monkeypatch, error, falls_back):
+    from app import database
+
+    aggregate = database.responses_collection.aggregate
+    attempts = []
+
+    def failing_aggregate(pipeline, *args, **kwargs):
+        attempts.append(pipeline)
+        if len(attempts) == 1:
+            raise error
+        return aggregate(pipeline, *args, **kwargs)
+
+    monkeypatch.setattr(database.responses_collection, "aggregate", failing_aggregate)
+
+    if falls_back:
+        rows, with_percentiles = run(repository.wheel_stats({}, StatsGroupEnum.COACH_NUMBER, 10))
+        assert with_percentiles is False
+        assert len(attempts) == 2
+    else:
+        with pytest.raises(OperationFailure):
+            run(repository.wheel_stats({}, StatsGroupEnum.COACH_NUMBER, 10))